@@ -1,5 +1,4 @@
 from typing import TypedDict, Annotated, List, Dict, Any
-import asyncio
 import logging
 
 from langchain_openai import ChatOpenAI
@@ -8,11 +7,12 @@ from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
 from langgraph.prebuilt import ToolNode
 from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import ToolException
 
 # App imports
 from app.core.config import settings
-from app.services.embedding_service import embedding_service
-from app.core.qdrant_service import qdrant_service
+from app.services.retrieval import retrieve
 
 logger = logging.getLogger(__name__)
 
@@ -24,7 +24,7 @@ class AgentState(TypedDict):
 
 
 @tool
-def search_documents(query: str, top_k: int = 5) -> str:
+async def search_documents(query: str, config: RunnableConfig, top_k: int = 5) -> str:
     """Search for relevant documents based on the query.
     
     Args:
@@ -37,24 +37,9 @@ def search_documents(query: str, top_k: int = 5) -> str:
     logger.info(f"Searching documents with query: {query}, top_k: {top_k}")
     
     try:
-        # Helper to run async code from this synchronous tool
-        def run_async(coro):
-            try:
-                loop = asyncio.get_running_loop()
-                return loop.run_until_complete(coro)
-            except RuntimeError:
-                # No running loop, create a new one
-                return asyncio.run(coro)
-        
-        # 1. Generate Embedding
-        query_embedding = run_async(embedding_service.generate_query_embedding(query))
-        
-        # 2. Search Qdrant
-        results = run_async(qdrant_service.search(
-            query_vector=query_embedding,
-            limit=top_k,
-            score_threshold=0.3
-        ))
+        # Embed, search and optionally diversify with the request's retrieval options
+        options = config.get("configurable", {}).get("retrieval", {})
+        results = await retrieve(query, top_k=top_k, score_threshold=0.3, **options)
         
         if not results:
             return "No relevant documents found."
@@ -78,10 +63,15 @@ def search_documents(query: str, top_k: int = 5) -> str:
             )
         
         return "\n---\n".join(context_parts)
-        
+    
     except Exception as e:
         logger.error(f"Error searching documents: {e}", exc_info=True)
-        return "I encountered an error while searching the documents."
+        # Becomes a tool message with status "error", so the run's answer is not cached
+        raise ToolException("I encountered an error while searching the documents.") from e
+
+
+# ToolExceptions are returned to the LLM as the tool's output instead of aborting the run
+search_documents.handle_tool_error = True
 
 
 def create_llm():
@@ -116,13 +106,13 @@ REGOLE:
 - Sii conciso e preciso"""
     
     # Define nodes
-    def llm_node(state: AgentState) -> dict:
+    async def llm_node(state: AgentState) -> dict:
         """LLM decides whether to call tools or respond directly."""
         messages = [SystemMessage(content=system_prompt)] + state["messages"]
-        response = llm_with_tools.invoke(messages)
+        response = await llm_with_tools.ainvoke(messages)
         return {"messages": [response]}
     
-    # Use LangGraph's built-in ToolNode
+    # Use LangGraph's built-in ToolNode, which awaits the async tool when the graph runs with ainvoke
     tool_node = ToolNode(tools)
     
     def should_continue(state: AgentState) -> str:
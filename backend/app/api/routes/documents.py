@@ -1,72 +1,78 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, status
-from typing import List, Dict, Any
-from datetime import datetime
-import uuid
+from fastapi import APIRouter, UploadFile, File, HTTPException, Response, Query, status
+from typing import List, Dict, Any, Optional
 import logging
 
-from app.services.document_processor import document_processor
-from app.services.chunking import chunking_service
-from app.services.embedding_service import embedding_service
-from app.core.qdrant_service import qdrant_service
+from app.services.ingestion_service import ingestion_service, PENDING_STATUSES
+from app.core.vector_store import vector_store
 from app.core.document_store import document_store
-from app.models.schemas import DocumentResponse, DeleteResponse
+from app.core.chunk_store import chunk_store
+from app.models.schemas import (
+    DocumentResponse, DeleteResponse, JobResponse, BulkUploadResponse, BulkFileResult,
+    DocumentChunk, DocumentChunksResponse, BatchDeleteRequest, BatchDeleteResponse
+)
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/documents", tags=["documents"])
 
 
-@router.post("/upload", response_model=DocumentResponse, status_code=status.HTTP_201_CREATED)
-async def upload_document(file: UploadFile = File(...)):
+def _job_response(doc: Dict[str, Any]) -> JobResponse:
+    return JobResponse(
+        job_id=doc["id"],
+        doc_id=doc["id"],
+        filename=doc["filename"],
+        status=doc["status"],
+        chunk_count=doc["chunk_count"],
+        chunks_done=doc["chunks_done"],
+        duplicate=doc.get("duplicate", False),
+        error=doc["error"]
+    )
+
+
+@router.post("/upload", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def upload_document(response: Response, file: UploadFile = File(...)):
     try:
-        doc_id = str(uuid.uuid4())
-        
-        file_type = document_processor.get_file_type(file.filename)
-        file_content = await file.read()
-        
-        document_processor.validate_file_size(len(file_content))
-        
-        text = document_processor.extract_text(file_content, file.filename, file_type)
-        
-        metadata = {
-            "doc_id": doc_id,
-            "filename": file.filename,
-            "file_type": file_type,
-            "uploaded_at": datetime.now().isoformat(),
-            "file_size": len(file_content)
-        }
-        
-        chunks = chunking_service.chunk_document(text, metadata)
-        
-        qdrant_points = await embedding_service.create_qdrant_points(doc_id, chunks)
+        job = await ingestion_service.submit(file)
         
-        success = await qdrant_service.upsert_points(qdrant_points)
+        if job["duplicate"]:
+            # Nothing was queued: the existing document is returned as is
+            response.status_code = status.HTTP_200_OK
         
-        if not success:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to store document in vector database"
-            )
+        return _job_response(job)
         
-        doc_data = {
-            "id": doc_id,
-            "filename": file.filename,
-            "file_type": file_type,
-            "file_size": len(file_content),
-            "uploaded_at": metadata["uploaded_at"],
-            "chunk_count": len(chunks),
-            "status": "completed",
-            "metadata": {
-                "doc_id": doc_id,
-                "file_type": file_type
-            }
-        }
-        
-        document_store.add_document(doc_data)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Error uploading document: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Internal server error: {str(e)}"
+        )
+
+
+@router.post("/bulk", response_model=BulkUploadResponse, status_code=status.HTTP_202_ACCEPTED)
+async def bulk_upload_documents(files: List[UploadFile] = File(...)):
+    try:
+        results = await ingestion_service.submit_bulk(files)
         
-        logger.info(f"Document uploaded successfully: {file.filename} (ID: {doc_id})")
+        accepted = sum(1 for result in results if result["doc_id"])
+        duplicates = sum(1 for result in results if result["duplicate"])
+        logger.info(
+            f"Bulk upload: {accepted - duplicates} files queued, {duplicates} duplicates, "
+            f"{len(results) - accepted} rejected"
+        )
         
-        return DocumentResponse(**doc_data)
+        return BulkUploadResponse(
+            accepted=accepted,
+            rejected=len(results) - accepted,
+            results=[
+                BulkFileResult(job_id=result["doc_id"], **result)
+                for result in results
+            ]
+        )
         
     except ValueError as e:
         raise HTTPException(
@@ -74,13 +80,26 @@ async def upload_document(file: UploadFile = File(...)):
             detail=str(e)
         )
     except Exception as e:
-        logger.error(f"Error uploading document: {e}")
+        logger.error(f"Error in bulk upload: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Internal server error: {str(e)}"
         )
 
 
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    doc_info = document_store.get_document(job_id)
+    
+    if not doc_info:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    
+    return _job_response(doc_info)
+
+
 @router.get("", response_model=List[DocumentResponse])
 async def list_documents():
     try:
@@ -94,6 +113,74 @@ async def list_documents():
         )
 
 
+@router.delete("/all", response_model=DeleteResponse)
+async def delete_all_documents():
+    # Registered before /{doc_id} so that "all" is not taken for a document id
+    try:
+        doc_count = document_store.get_document_count()
+        pending = [doc["id"] for doc in document_store.get_documents_by_status(PENDING_STATUSES)]
+        
+        if not await vector_store.delete_all():
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Failed to clear the vector database"
+            )
+        
+        document_store.delete_all_documents()
+        ingestion_service.discard_uploads(pending)
+        
+        logger.info(f"All documents deleted: {doc_count} documents removed")
+        
+        return {
+            "success": True,
+            "message": f"Successfully deleted {doc_count} documents"
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error deleting all documents: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to delete documents: {str(e)}"
+        )
+
+
+@router.post("/delete", response_model=BatchDeleteResponse)
+async def delete_documents(request: BatchDeleteRequest):
+    try:
+        doc_ids = list(dict.fromkeys(request.doc_ids))
+        deleted = [doc_id for doc_id in doc_ids if document_store.get_document(doc_id)]
+        not_found = [doc_id for doc_id in doc_ids if doc_id not in deleted]
+        
+        if not await vector_store.delete_documents(deleted):
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Failed to delete documents from vector database"
+            )
+        
+        document_store.delete_documents(deleted)
+        ingestion_service.discard_uploads(deleted)
+        
+        logger.info(f"Batch delete: {len(deleted)} documents removed, {len(not_found)} not found")
+        
+        return BatchDeleteResponse(
+            success=True,
+            message=f"Successfully deleted {len(deleted)} documents",
+            deleted=deleted,
+            not_found=not_found
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error deleting documents: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to delete documents: {str(e)}"
+        )
+
+
 @router.get("/{doc_id}", response_model=DocumentResponse)
 async def get_document(doc_id: str):
     try:
@@ -105,8 +192,7 @@ async def get_document(doc_id: str):
                 detail="Document not found"
             )
         
-        chunks = await qdrant_service.get_document_chunks(doc_id)
-        doc_info["chunk_count"] = len(chunks)
+        doc_info["chunk_count"] = await vector_store.count_document_chunks(doc_id)
         
         return DocumentResponse(**doc_info)
         
@@ -120,6 +206,97 @@ async def get_document(doc_id: str):
         )
 
 
+@router.get("/{doc_id}/chunks", response_model=DocumentChunksResponse)
+async def get_document_chunks(
+    doc_id: str,
+    limit: int = Query(100, ge=1, le=1000),
+    offset: Optional[str] = Query(None, description="next_offset of the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated payload fields, e.g. chunk_index,text"),
+    ordered: bool = Query(True, description="Sort chunks by chunk_index")
+):
+    if not document_store.get_document(doc_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Document not found"
+        )
+    
+    payload_fields = None
+    if fields is not None:
+        payload_fields = [field.strip() for field in fields.split(",") if field.strip()]
+    
+    try:
+        chunks, next_offset = await vector_store.get_document_chunks_page(
+            doc_id, limit, offset, payload_fields, ordered
+        )
+        if payload_fields is None or {"text", "metadata"} & set(payload_fields):
+            chunk_store.hydrate(chunks)
+        
+        return DocumentChunksResponse(
+            doc_id=doc_id,
+            chunks=[
+                DocumentChunk(
+                    id=str(chunk["id"]),
+                    chunk_index=chunk.get("chunk_index"),
+                    text=chunk.get("text"),
+                    chunk_hash=chunk.get("chunk_hash"),
+                    metadata=chunk.get("metadata")
+                )
+                for chunk in chunks
+            ],
+            next_offset=str(next_offset) if next_offset is not None else None
+        )
+        
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid offset"
+        )
+    except Exception as e:
+        logger.error(f"Error getting chunks of document {doc_id}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to retrieve document chunks"
+        )
+
+
+@router.put("/{doc_id}", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def replace_document(doc_id: str, response: Response, file: UploadFile = File(...)):
+    doc_info = document_store.get_document(doc_id)
+
+    if not doc_info:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Document not found"
+        )
+
+    if doc_info["status"] in PENDING_STATUSES:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Document is still being ingested"
+        )
+
+    try:
+        job = await ingestion_service.submit_replace(doc_info, file)
+
+        if job["duplicate"]:
+            # Same content as the indexed version: nothing to re-ingest
+            response.status_code = status.HTTP_200_OK
+
+        return _job_response(job)
+
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Error replacing document {doc_id}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Internal server error: {str(e)}"
+        )
+
+
 @router.delete("/{doc_id}", response_model=DeleteResponse)
 async def delete_document(doc_id: str):
     try:
@@ -131,7 +308,7 @@ async def delete_document(doc_id: str):
                 detail="Document not found"
             )
         
-        success = await qdrant_service.delete_document(doc_id)
+        success = await vector_store.delete_document(doc_id)
         
         if not success:
             raise HTTPException(
@@ -140,6 +317,7 @@ async def delete_document(doc_id: str):
             )
         
         document_store.delete_document(doc_id)
+        ingestion_service.discard_uploads([doc_id])
         doc_filename = doc_info["filename"]
         
         logger.info(f"Document deleted successfully: {doc_filename} (ID: {doc_id})")
@@ -157,29 +335,3 @@ async def delete_document(doc_id: str):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to delete document: {str(e)}"
         )
-
-
-@router.delete("/all", response_model=DeleteResponse)
-async def delete_all_documents():
-    try:
-        docs = document_store.get_all_documents()
-        doc_count = len(docs)
-        
-        for doc in docs:
-            await qdrant_service.delete_document(doc["id"])
-        
-        document_store.delete_all_documents()
-        
-        logger.info(f"All documents deleted: {doc_count} documents removed")
-        
-        return {
-            "success": True,
-            "message": f"Successfully deleted {doc_count} documents"
-        }
-        
-    except Exception as e:
-        logger.error(f"Error deleting all documents: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to delete documents: {str(e)}"
-        )
@@ -1,8 +1,13 @@
 from fastapi import APIRouter, HTTPException, status
 import logging
 
-from app.core.qdrant_service import qdrant_service
+from app.core.config import settings
+from app.core.vector_store import vector_store
 from app.core.regolo_service import regolo_service
+from app.core.embedding_cache import embedding_cache
+from app.services.embedding_service import query_embedding_cache
+from app.services.answer_cache import answer_cache
+from app.services.retrieval import retrieval_cache
 from app.models.schemas import HealthResponse
 
 logger = logging.getLogger(__name__)
@@ -16,10 +21,10 @@ async def health_check():
     regolo_connected = False
     
     try:
-        qdrant_service.client.get_collections()
+        await vector_store.ping()
         qdrant_connected = True
     except Exception as e:
-        logger.error(f"Qdrant health check failed: {e}")
+        logger.error(f"Vector store health check failed: {e}")
     
     try:
         await regolo_service.client.models.list()
@@ -36,20 +41,28 @@ async def health_check():
     )
 
 
+@router.get("/vector-store")
 @router.get("/qdrant")
-async def qdrant_health():
+async def vector_store_health():
     try:
-        qdrant_service.client.get_collections()
+        await vector_store.ping()
+        if settings.vector_store_backend.lower() == "local":
+            return {
+                "status": "healthy",
+                "service": "local",
+                "path": settings.local_vector_store_path
+            }
         return {
             "status": "healthy",
             "service": "qdrant",
-            "url": qdrant_service.client.get_cluster_info()
+            "url": settings.qdrant_url,
+            "transport": "grpc" if settings.qdrant_prefer_grpc else "rest"
         }
     except Exception as e:
-        logger.error(f"Qdrant health check failed: {e}")
+        logger.error(f"Vector store health check failed: {e}")
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="Qdrant service unavailable"
+            detail="Vector store unavailable"
         )
 
 
@@ -68,3 +81,13 @@ async def regolo_health():
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Regolo service unavailable"
         )
+
+
+@router.get("/cache")
+async def cache_stats():
+    return {
+        "embedding_cache": embedding_cache.stats() if embedding_cache else None,
+        "query_embedding_cache": query_embedding_cache.stats(),
+        "answer_cache": answer_cache.stats() if answer_cache else None,
+        "retrieval_cache": retrieval_cache.stats() if retrieval_cache else None
+    }
@@ -3,7 +3,7 @@ from fastapi.responses import StreamingResponse
 import json
 import logging
 from app.services.rag_service import rag_service
-from app.models.schemas import ChatRequest, ChatResponse
+from app.models.schemas import ChatRequest, ChatResponse, BatchSearchRequest, BatchSearchResponse, SearchResult
 from app.core.regolo_service import regolo_service
 
 logger = logging.getLogger(__name__)
@@ -31,7 +31,8 @@ async def chat(request: ChatRequest):
         response = await rag_service.process_query(
             query=request.message,
             conversation_history=conversation_history,
-            top_k=request.top_k
+            top_k=request.top_k,
+            retrieval_options=request.retrieval_options()
         )
         
         logger.info(f"Response message: '{response.get('message', '')}'")
@@ -39,7 +40,7 @@ async def chat(request: ChatRequest):
         logger.info("="*80)
         
         return ChatResponse(**response)
-        
+    
     except Exception as e:
         logger.error(f"Error in chat: {e}")
         raise HTTPException(
@@ -63,7 +64,8 @@ async def chat_stream(request: ChatRequest):
                 response = await rag_service.process_query(
                     query=request.message,
                     conversation_history=conversation_history,
-                    top_k=request.top_k
+                    top_k=request.top_k,
+                    retrieval_options=request.retrieval_options()
                 )
                 
                 yield f"data: {json.dumps({'type': 'sources', 'data': response.get('sources', [])})}\n\n"
@@ -73,7 +75,7 @@ async def chat_stream(request: ChatRequest):
                         yield f"data: {json.dumps({'type': 'content', 'data': chunk})}\n\n"
                 
                 yield f"data: {json.dumps({'type': 'done'})}\n\n"
-                
+            
             except Exception as e:
                 logger.error(f"Error in stream: {e}")
                 yield f"data: {json.dumps({'type': 'error', 'data': str(e)})}\n\n"
@@ -87,7 +89,7 @@ async def chat_stream(request: ChatRequest):
                 "X-Accel-Buffering": "no"
             }
         )
-        
+    
     except Exception as e:
         logger.error(f"Error setting up chat stream: {e}")
         raise HTTPException(
@@ -99,15 +101,13 @@ async def chat_stream(request: ChatRequest):
 @router.post("/search")
 async def search_documents(request: ChatRequest):
     try:
-        from app.services.embedding_service import embedding_service
-        from app.core.qdrant_service import qdrant_service
-        
-        query_embedding = await embedding_service.generate_query_embedding(request.message)
+        from app.services.retrieval import retrieve
         
-        results = await qdrant_service.search(
-            query_vector=query_embedding,
-            limit=request.top_k or 5,
-            score_threshold=0.5
+        results = await retrieve(
+            request.message,
+            top_k=request.top_k or 5,
+            score_threshold=0.5,
+            **request.retrieval_options()
         )
         
         return {
@@ -115,7 +115,7 @@ async def search_documents(request: ChatRequest):
             "results": results,
             "count": len(results)
         }
-        
+    
     except Exception as e:
         logger.error(f"Error in search: {e}")
         raise HTTPException(
@@ -124,6 +124,41 @@ async def search_documents(request: ChatRequest):
         )
 
 
+@router.post("/search/batch", response_model=BatchSearchResponse)
+async def search_documents_batch(request: BatchSearchRequest):
+    try:
+        from app.services.embedding_service import embedding_service
+        from app.core.vector_store import vector_store
+        
+        query_embeddings = await embedding_service.generate_query_embeddings(
+            [search.query for search in request.queries]
+        )
+        
+        results = await vector_store.search_batch([
+            {
+                "query_vector": query_embedding,
+                "limit": search.top_k,
+                "score_threshold": search.score_threshold,
+                "doc_id_filter": search.doc_id
+            }
+            for search, query_embedding in zip(request.queries, query_embeddings)
+        ])
+        
+        return BatchSearchResponse(
+            results=[
+                SearchResult(query=search.query, results=hits, count=len(hits))
+                for search, hits in zip(request.queries, results)
+            ]
+        )
+    
+    except Exception as e:
+        logger.error(f"Error in batch search: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error searching documents: {str(e)}"
+        )
+
+
 @router.post("/clear-history")
 async def clear_history():
     return {
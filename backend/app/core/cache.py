@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from statistics import median
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncLRUCache:
+    """In-process LRU cache with TTL, bounded by entry count and bytes.
+    
+    Concurrent misses for the same key share a single call to the loader,
+    which runs in its own task: cancelling the caller that started it does
+    not cancel the others. All bookkeeping happens between awaits, so the
+    cache is safe to use from any number of coroutines on the same event
+    loop without a lock.
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        max_entries: int = 1024,
+        max_bytes: int = 67108864,
+        ttl: float = 3600.0,
+        size_of: Optional[Callable[[Any], int]] = None,
+        latency_window: int = 1000
+    ):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size_of = size_of or (lambda value: 0)
+        
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float, int]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._bytes = 0
+        
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._hit_latencies: deque = deque(maxlen=latency_window)
+        self._miss_latencies: deque = deque(maxlen=latency_window)
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        
+        value, expires_at, size = entry
+        if expires_at < time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            return None
+        
+        self._entries.move_to_end(key)
+        return value
+    
+    def __contains__(self, key: Hashable) -> bool:
+        # Unlike get(), leaves the LRU order alone
+        entry = self._entries.get(key)
+        return entry is not None and entry[1] >= time.monotonic()
+    
+    def set(self, key: Hashable, value: Any):
+        size = self.size_of(value)
+        if size > self.max_bytes:
+            return
+        
+        if key in self._entries:
+            self._remove(key)
+        
+        self._entries[key] = (value, time.monotonic() + self.ttl, size)
+        self._bytes += size
+        
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+    
+    def _remove(self, key: Hashable):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+    
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+    
+    async def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        cacheable: Optional[Callable[[Any], bool]] = None
+    ) -> Any:
+        """Return the cached value of ``key``, or load it with ``loader``.
+        
+        Loaded values for which ``cacheable`` returns False are handed to
+        the waiting callers but not stored.
+        """
+        start = time.perf_counter()
+        
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            self._hit_latencies.append(time.perf_counter() - start)
+            return value
+        
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight)
+        
+        self.misses += 1
+        task = asyncio.ensure_future(self._load(key, loader, cacheable, start))
+        # Retrieve the outcome even when every caller was cancelled, so it is never reported as lost
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self._inflight[key] = task
+        return await asyncio.shield(task)
+    
+    async def _load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        cacheable: Optional[Callable[[Any], bool]],
+        start: float
+    ) -> Any:
+        try:
+            value = await loader()
+            if cacheable is None or cacheable(value):
+                self.set(key, value)
+            self._miss_latencies.append(time.perf_counter() - start)
+            return value
+        finally:
+            del self._inflight[key]
+    
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        p50_hit = median(self._hit_latencies) if self._hit_latencies else None
+        p50_miss = median(self._miss_latencies) if self._miss_latencies else None
+        
+        return {
+            "name": self.name,
+            "entries": len(self._entries),
+            "size_bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "p50_hit_ms": p50_hit * 1000 if p50_hit is not None else None,
+            "p50_miss_ms": p50_miss * 1000 if p50_miss is not None else None,
+            "p50_saved_ms": (p50_miss - p50_hit) * 1000 if p50_hit is not None and p50_miss is not None else None
+        }
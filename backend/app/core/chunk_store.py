@@ -0,0 +1,183 @@
+import sqlite3
+import json
+import logging
+import zlib
+from typing import List, Dict, Any, Tuple, Union
+from app.core.config import settings
+from app.core.document_store import document_store
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zlib is used instead
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+CODEC_ZLIB = 0
+CODEC_ZSTD = 1
+
+# Chunk metadata that is the same for every chunk of a document, read from DocumentStore instead
+DOCUMENT_FIELDS = ("doc_id", "filename", "file_type", "uploaded_at", "file_size")
+
+
+class ChunkStore:
+    """Compressed chunk text and chunk metadata, keyed by point id.
+    
+    Vector payloads only keep the fields used for filtering; search hits are
+    hydrated from here once ranking is done. Blobs are zstd-compressed JSON
+    (zlib when ``zstandard`` is not installed), and document-level metadata
+    is merged back in from ``DocumentStore``.
+    """
+    
+    def __init__(self, db_path: str = None, level: int = 3):
+        if db_path is None:
+            db_path = "chunks.db"
+        
+        self.db_path = str(db_path)
+        self.level = level
+        self._init_db()
+    
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+    
+    def _init_db(self):
+        try:
+            conn = self._connect()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS chunks (
+                    point_id TEXT PRIMARY KEY,
+                    doc_id TEXT NOT NULL,
+                    codec INTEGER NOT NULL,
+                    data BLOB NOT NULL
+                )
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_chunks_doc_id
+                ON chunks (doc_id)
+            """)
+            
+            conn.commit()
+            conn.close()
+            logger.info(f"Chunk store initialized at {self.db_path}")
+        except Exception as e:
+            logger.error(f"Error initializing chunk store: {e}")
+            raise
+    
+    def _encode(self, entry: Dict[str, Any]) -> Tuple[int, bytes]:
+        raw = json.dumps(entry, default=str).encode("utf-8")
+        if zstandard is not None:
+            return CODEC_ZSTD, zstandard.ZstdCompressor(level=self.level).compress(raw)
+        return CODEC_ZLIB, zlib.compress(raw, self.level)
+    
+    @staticmethod
+    def _decode(codec: int, data: bytes) -> Dict[str, Any]:
+        if codec == CODEC_ZSTD:
+            raw = zstandard.ZstdDecompressor().decompress(data)
+        else:
+            raw = zlib.decompress(data)
+        return json.loads(raw)
+    
+    @staticmethod
+    def _chunk_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: value for key, value in metadata.items() if key not in DOCUMENT_FIELDS}
+    
+    def put_many(self, entries: List[Tuple[str, str, str, Dict[str, Any]]]):
+        """Store ``(point_id, doc_id, text, metadata)`` entries."""
+        rows = []
+        for point_id, doc_id, text, metadata in entries:
+            codec, data = self._encode({"text": text, "metadata": self._chunk_metadata(metadata)})
+            rows.append((str(point_id), doc_id, codec, data))
+        
+        conn = self._connect()
+        try:
+            conn.executemany("""
+                INSERT OR REPLACE INTO chunks (point_id, doc_id, codec, data)
+                VALUES (?, ?, ?, ?)
+            """, rows)
+            conn.commit()
+        finally:
+            conn.close()
+    
+    def get_many(self, point_ids: List[Union[str, int]]) -> Dict[str, Dict[str, Any]]:
+        """Return ``{"doc_id", "text", "metadata"}`` for the stored ``point_ids``."""
+        ids = list({str(point_id) for point_id in point_ids})
+        found: Dict[str, Dict[str, Any]] = {}
+        
+        conn = self._connect()
+        try:
+            for i in range(0, len(ids), 500):
+                batch = ids[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                cursor = conn.execute(f"""
+                    SELECT point_id, doc_id, codec, data FROM chunks
+                    WHERE point_id IN ({placeholders})
+                """, batch)
+                
+                for point_id, doc_id, codec, data in cursor.fetchall():
+                    found[point_id] = {"doc_id": doc_id, **self._decode(codec, data)}
+        finally:
+            conn.close()
+        
+        return found
+    
+    def delete_points(self, point_ids: List[Union[str, int]]):
+        conn = self._connect()
+        try:
+            conn.executemany("DELETE FROM chunks WHERE point_id = ?", [(str(point_id),) for point_id in point_ids])
+            conn.commit()
+        finally:
+            conn.close()
+    
+    def delete_documents(self, doc_ids: List[str]):
+        conn = self._connect()
+        try:
+            conn.executemany("DELETE FROM chunks WHERE doc_id = ?", [(doc_id,) for doc_id in doc_ids])
+            conn.commit()
+        finally:
+            conn.close()
+    
+    def delete_all(self):
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM chunks")
+            conn.commit()
+        finally:
+            conn.close()
+    
+    def hydrate(self, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Fill in ``text`` and ``metadata`` of search hits or chunks, in one bulk lookup.
+        
+        Points indexed before text moved out of the payload already carry it
+        and are left as they are.
+        """
+        missing = [chunk for chunk in chunks if chunk.get("text") is None]
+        if not missing:
+            return chunks
+        
+        stored = self.get_many([chunk["id"] for chunk in missing])
+        documents = {}
+        for entry in stored.values():
+            if entry["doc_id"] not in documents:
+                documents[entry["doc_id"]] = document_store.get_document(entry["doc_id"]) or {}
+        
+        for chunk in missing:
+            entry = stored.get(str(chunk["id"]))
+            if entry is None:
+                continue
+            
+            doc = documents[entry["doc_id"]]
+            chunk["text"] = entry["text"]
+            chunk["metadata"] = {
+                "doc_id": entry["doc_id"],
+                **{field: doc[field] for field in DOCUMENT_FIELDS[1:] if field in doc},
+                **entry["metadata"]
+            }
+        
+        return chunks
+
+
+chunk_store = ChunkStore(db_path=settings.chunk_store_path, level=settings.chunk_store_compression_level)
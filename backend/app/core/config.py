@@ -8,20 +8,74 @@ class Settings(BaseSettings):
     regolo_base_url: str = "https://api.regolo.ai/v1"
     regolo_model: str = "gpt-oss-120b"
     regolo_embedding_model: str = "qwen3-embedding-8b"
+    embedding_dimension: int = 4096  # leading dimensions kept from each embedding
+
+    vector_store_backend: str = "qdrant"  # qdrant or local
+    local_vector_store_path: str = "./vector_store"
+    local_vector_store_dtype: str = "float32"  # float32 or float16
+
+    chunk_store_path: str = "chunks.db"
+    chunk_store_compression_level: int = 3
 
     qdrant_url: str = "http://localhost:7333"
     qdrant_collection_name: str = "documents"
+    qdrant_prefer_grpc: bool = False
+    qdrant_grpc_port: int = 6334
+    qdrant_timeout: int = 30
+    qdrant_max_connections: int = 100
+    qdrant_max_keepalive_connections: int = 20
+    qdrant_keepalive_expiry: float = 30.0
+    qdrant_on_disk_vectors: bool = False
+    qdrant_quantization: str = "none"  # none, scalar (int8) or binary
+    qdrant_quantization_always_ram: bool = True
+    qdrant_quantization_rescore: bool = True
+    qdrant_quantization_oversampling: float = 2.0
+    qdrant_hnsw_m: int = 16
+    qdrant_hnsw_ef_construct: int = 100
+    qdrant_hnsw_ef: int = 128
+    qdrant_upsert_batch_size: int = 256
+    qdrant_upsert_max_batch_bytes: int = 16777216  # 16MB
+    qdrant_upsert_max_concurrency: int = 4
+    qdrant_upsert_retries: int = 3
 
     backend_port: int = 8000
     backend_host: str = "0.0.0.0"
     _cors_origins: str = "http://localhost:8000,http://127.0.0.1:8000,http://localhost:5173,http://localhost:3000,http://localhost:5500"
 
     max_file_size: int = 10485760  # 10MB
+    max_archive_size: int = 524288000  # 500MB
+    max_bulk_files: int = 1000
     upload_dir: str = "./uploads"
+    ingestion_workers: int = 2
+    ingestion_queue_size: int = 4  # embedded batches buffered ahead of the upsert stage
+    extraction_workers: int = 0  # 0 = one process per CPU core
+    pdf_pages_per_task: int = 16
 
     chunk_size: int = 1000
     chunk_overlap: int = 200
     top_k_results: int = 5
+    retrieval_fetch_factor: int = 1  # >1 over-fetches candidates for MMR diversification
+    retrieval_mmr_lambda: float = 0.5  # 1 = pure relevance, 0 = pure diversity
+    retrieval_max_chunks_per_doc: int = 0  # 0 = no per-document cap
+    retrieval_cache_enabled: bool = True
+    retrieval_cache_max_entries: int = 4096
+    retrieval_cache_ttl: float = 600.0
+
+    embedding_batch_size: int = 32
+    embedding_max_concurrency: int = 4
+
+    embedding_cache_enabled: bool = True
+    embedding_cache_path: str = "embedding_cache.db"
+    embedding_cache_max_bytes: int = 1073741824  # 1GB
+
+    query_cache_max_entries: int = 4096
+    query_cache_max_bytes: int = 67108864  # 64MB
+    query_cache_ttl: float = 3600.0
+
+    answer_cache_enabled: bool = True
+    answer_cache_max_entries: int = 1024
+    answer_cache_ttl: float = 900.0
+    answer_cache_similarity_threshold: float = 0.0  # 0 = exact matches only, e.g. 0.95 to reuse answers of near-identical questions
 
     google_credentials_path: str = ""
     google_api_key: str = ""
@@ -12,6 +12,8 @@ class DocumentStore:
             db_path = "documents_store.db"
         
         self.db_path = str(db_path)
+        # Corpus generation, bumped by every write so caches of answers can tell they are stale
+        self.generation = 0
         self._init_db()
     
     def _init_db(self):
@@ -28,10 +30,20 @@ class DocumentStore:
                     uploaded_at TEXT NOT NULL,
                     chunk_count INTEGER DEFAULT 0,
                     status TEXT DEFAULT 'completed',
-                    metadata TEXT
+                    metadata TEXT,
+                    chunks_done INTEGER DEFAULT 0,
+                    error TEXT,
+                    content_hash TEXT
                 )
             """)
             
+            self._migrate(cursor)
+            
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_documents_content_hash
+                ON documents (content_hash)
+            """)
+            
             conn.commit()
             conn.close()
             logger.info(f"Document store initialized at {self.db_path}")
@@ -39,6 +51,33 @@ class DocumentStore:
             logger.error(f"Error initializing document store: {e}")
             raise
     
+    def _migrate(self, cursor: sqlite3.Cursor):
+        cursor.execute("PRAGMA table_info(documents)")
+        columns = {row[1] for row in cursor.fetchall()}
+        
+        if "chunks_done" not in columns:
+            cursor.execute("ALTER TABLE documents ADD COLUMN chunks_done INTEGER DEFAULT 0")
+        if "error" not in columns:
+            cursor.execute("ALTER TABLE documents ADD COLUMN error TEXT")
+        if "content_hash" not in columns:
+            cursor.execute("ALTER TABLE documents ADD COLUMN content_hash TEXT")
+    
+    @staticmethod
+    def _row_to_document(row: tuple) -> Dict[str, Any]:
+        return {
+            "id": row[0],
+            "filename": row[1],
+            "file_type": row[2],
+            "file_size": row[3],
+            "uploaded_at": row[4],
+            "chunk_count": row[5],
+            "status": row[6],
+            "metadata": json.loads(row[7]) if row[7] else {},
+            "chunks_done": row[8],
+            "error": row[9],
+            "content_hash": row[10]
+        }
+    
     def add_document(self, doc_data: Dict[str, Any]) -> bool:
         try:
             conn = sqlite3.connect(self.db_path)
@@ -47,8 +86,8 @@ class DocumentStore:
             metadata_json = json.dumps(doc_data.get("metadata", {}))
             
             cursor.execute("""
-                INSERT INTO documents (id, filename, file_type, file_size, uploaded_at, chunk_count, status, metadata)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                INSERT INTO documents (id, filename, file_type, file_size, uploaded_at, chunk_count, status, metadata, content_hash)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
             """, (
                 doc_data["id"],
                 doc_data["filename"],
@@ -57,12 +96,14 @@ class DocumentStore:
                 doc_data["uploaded_at"],
                 doc_data["chunk_count"],
                 doc_data["status"],
-                metadata_json
+                metadata_json,
+                doc_data.get("content_hash")
             ))
             
             conn.commit()
             conn.close()
             logger.info(f"Document added: {doc_data['filename']}")
+            self.generation += 1
             return True
         except Exception as e:
             logger.error(f"Error adding document: {e}")
@@ -74,7 +115,7 @@ class DocumentStore:
             cursor = conn.cursor()
             
             cursor.execute("""
-                SELECT id, filename, file_type, file_size, uploaded_at, chunk_count, status, metadata
+                SELECT id, filename, file_type, file_size, uploaded_at, chunk_count, status, metadata, chunks_done, error, content_hash
                 FROM documents
                 ORDER BY uploaded_at DESC
             """)
@@ -82,21 +123,7 @@ class DocumentStore:
             rows = cursor.fetchall()
             conn.close()
             
-            documents = []
-            for row in rows:
-                doc = {
-                    "id": row[0],
-                    "filename": row[1],
-                    "file_type": row[2],
-                    "file_size": row[3],
-                    "uploaded_at": row[4],
-                    "chunk_count": row[5],
-                    "status": row[6],
-                    "metadata": json.loads(row[7]) if row[7] else {}
-                }
-                documents.append(doc)
-            
-            return documents
+            return [self._row_to_document(row) for row in rows]
         except Exception as e:
             logger.error(f"Error getting all documents: {e}")
             return []
@@ -107,7 +134,7 @@ class DocumentStore:
             cursor = conn.cursor()
             
             cursor.execute("""
-                SELECT id, filename, file_type, file_size, uploaded_at, chunk_count, status, metadata
+                SELECT id, filename, file_type, file_size, uploaded_at, chunk_count, status, metadata, chunks_done, error, content_hash
                 FROM documents
                 WHERE id = ?
             """, (doc_id,))
@@ -116,16 +143,7 @@ class DocumentStore:
             conn.close()
             
             if row:
-                return {
-                    "id": row[0],
-                    "filename": row[1],
-                    "file_type": row[2],
-                    "file_size": row[3],
-                    "uploaded_at": row[4],
-                    "chunk_count": row[5],
-                    "status": row[6],
-                    "metadata": json.loads(row[7]) if row[7] else {}
-                }
+                return self._row_to_document(row)
             return None
         except Exception as e:
             logger.error(f"Error getting document {doc_id}: {e}")
@@ -141,11 +159,28 @@ class DocumentStore:
             conn.commit()
             conn.close()
             logger.info(f"Document deleted: {doc_id}")
+            self.generation += 1
             return True
         except Exception as e:
             logger.error(f"Error deleting document {doc_id}: {e}")
             return False
     
+    def delete_documents(self, doc_ids: List[str]) -> bool:
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.executemany("DELETE FROM documents WHERE id = ?", [(doc_id,) for doc_id in doc_ids])
+            
+            conn.commit()
+            conn.close()
+            logger.info(f"{len(doc_ids)} documents deleted")
+            self.generation += 1
+            return True
+        except Exception as e:
+            logger.error(f"Error deleting {len(doc_ids)} documents: {e}")
+            return False
+    
     def delete_all_documents(self) -> bool:
         try:
             conn = sqlite3.connect(self.db_path)
@@ -156,6 +191,7 @@ class DocumentStore:
             conn.commit()
             conn.close()
             logger.info("All documents deleted")
+            self.generation += 1
             return True
         except Exception as e:
             logger.error(f"Error deleting all documents: {e}")
@@ -179,6 +215,126 @@ class DocumentStore:
             logger.error(f"Error updating chunk count: {e}")
             return False
     
+    def get_document_by_content_hash(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """Return the oldest document with this content that has not failed ingestion."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT id, filename, file_type, file_size, uploaded_at, chunk_count, status, metadata, chunks_done, error, content_hash
+                FROM documents
+                WHERE content_hash = ? AND status != 'failed'
+                ORDER BY uploaded_at ASC
+                LIMIT 1
+            """, (content_hash,))
+            
+            row = cursor.fetchone()
+            conn.close()
+            
+            if row:
+                return self._row_to_document(row)
+            return None
+        except Exception as e:
+            logger.error(f"Error getting document by content hash: {e}")
+            return None
+    
+    def get_documents_by_status(self, statuses: List[str]) -> List[Dict[str, Any]]:
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            placeholders = ",".join("?" * len(statuses))
+            cursor.execute(f"""
+                SELECT id, filename, file_type, file_size, uploaded_at, chunk_count, status, metadata, chunks_done, error, content_hash
+                FROM documents
+                WHERE status IN ({placeholders})
+                ORDER BY uploaded_at ASC
+            """, statuses)
+            
+            rows = cursor.fetchall()
+            conn.close()
+            
+            return [self._row_to_document(row) for row in rows]
+        except Exception as e:
+            logger.error(f"Error getting documents by status: {e}")
+            return []
+    
+    def update_file(self, doc_data: Dict[str, Any]) -> bool:
+        """Point an existing document at a new version of its file and reset its progress."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                UPDATE documents
+                SET filename = ?, file_type = ?, file_size = ?, uploaded_at = ?,
+                    status = ?, metadata = ?, content_hash = ?, chunks_done = 0, error = NULL
+                WHERE id = ?
+            """, (
+                doc_data["filename"],
+                doc_data["file_type"],
+                doc_data["file_size"],
+                doc_data["uploaded_at"],
+                doc_data["status"],
+                json.dumps(doc_data.get("metadata", {})),
+                doc_data.get("content_hash"),
+                doc_data["id"]
+            ))
+            
+            conn.commit()
+            conn.close()
+            logger.info(f"Document file updated: {doc_data['filename']} (ID: {doc_data['id']})")
+            self.generation += 1
+            return True
+        except Exception as e:
+            logger.error(f"Error updating document file {doc_data['id']}: {e}")
+            return False
+    
+    def update_status(self, doc_id: str, status: str, error: Optional[str] = None) -> bool:
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                UPDATE documents
+                SET status = ?, error = ?
+                WHERE id = ?
+            """, (status, error, doc_id))
+            
+            conn.commit()
+            conn.close()
+            self.generation += 1
+            return True
+        except Exception as e:
+            logger.error(f"Error updating status of document {doc_id}: {e}")
+            return False
+    
+    def update_progress(self, doc_id: str, chunks_done: int, chunk_count: Optional[int] = None) -> bool:
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            if chunk_count is None:
+                cursor.execute("""
+                    UPDATE documents
+                    SET chunks_done = ?
+                    WHERE id = ?
+                """, (chunks_done, doc_id))
+            else:
+                cursor.execute("""
+                    UPDATE documents
+                    SET chunks_done = ?, chunk_count = ?
+                    WHERE id = ?
+                """, (chunks_done, chunk_count, doc_id))
+            
+            conn.commit()
+            conn.close()
+            return True
+        except Exception as e:
+            logger.error(f"Error updating progress of document {doc_id}: {e}")
+            return False
+    
     def get_document_count(self) -> int:
         try:
             conn = sqlite3.connect(self.db_path)
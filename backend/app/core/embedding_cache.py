@@ -0,0 +1,221 @@
+import sqlite3
+import hashlib
+import logging
+import threading
+import time
+from array import array
+from typing import List, Dict, Optional, Any, Tuple
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """Persistent embedding cache keyed by (sha256 of text, embedding model).
+    
+    Vectors are stored as float32 blobs and evicted least-recently-used first
+    once the total size of the stored vectors exceeds ``max_bytes``. The
+    total is kept in memory, and ``size`` and ``last_used`` come before the
+    blob in each row and are covered by an index, so neither bookkeeping nor
+    eviction reads the vectors. Calls block on SQLite; async callers run
+    them in a worker thread.
+    """
+    
+    def __init__(self, db_path: str = None, max_bytes: int = 1073741824):
+        if db_path is None:
+            db_path = "embedding_cache.db"
+        
+        self.db_path = str(db_path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = 0
+        self._bytes = 0
+        # Serializes writers, which keep the in-memory totals up to date
+        self._lock = threading.Lock()
+        self._init_db()
+    
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+    
+    def _init_db(self):
+        try:
+            conn = self._connect()
+            cursor = conn.cursor()
+            
+            columns = [row[1] for row in cursor.execute("PRAGMA table_info(embeddings)")]
+            if columns and columns[-1] != "vector":
+                # Caches written before the blob moved to the end of the row
+                logger.info("Migrating embedding cache to the current row layout")
+                cursor.execute("DROP INDEX IF EXISTS idx_embeddings_last_used")
+                cursor.execute("ALTER TABLE embeddings RENAME TO embeddings_old")
+            
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    text_hash TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_used REAL NOT NULL,
+                    vector BLOB NOT NULL,
+                    PRIMARY KEY (text_hash, model)
+                )
+            """)
+            if columns and columns[-1] != "vector":
+                cursor.execute("""
+                    INSERT INTO embeddings (text_hash, model, size, last_used, vector)
+                    SELECT text_hash, model, size, last_used, vector FROM embeddings_old
+                """)
+                cursor.execute("DROP TABLE embeddings_old")
+            
+            cursor.execute("DROP INDEX IF EXISTS idx_embeddings_last_used")
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_embeddings_lru
+                ON embeddings (last_used, size)
+            """)
+            
+            cursor.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM embeddings INDEXED BY idx_embeddings_lru")
+            self._entries, self._bytes = cursor.fetchone()
+            
+            conn.commit()
+            conn.close()
+            logger.info(f"Embedding cache initialized at {self.db_path}")
+        except Exception as e:
+            logger.error(f"Error initializing embedding cache: {e}")
+            raise
+    
+    @staticmethod
+    def hash_text(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+    
+    def get_many(self, text_hashes: List[str], model: str) -> Dict[str, List[float]]:
+        """Return the cached vectors for ``text_hashes`` that are present."""
+        hashes = list(set(text_hashes))
+        found: Dict[str, List[float]] = {}
+        
+        try:
+            conn = self._connect()
+            cursor = conn.cursor()
+            
+            # Stay well below SQLite's bound-parameter limit
+            for i in range(0, len(hashes), 500):
+                batch = hashes[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                cursor.execute(f"""
+                    SELECT text_hash, vector FROM embeddings
+                    WHERE model = ? AND text_hash IN ({placeholders})
+                """, [model, *batch])
+                
+                for text_hash, blob in cursor.fetchall():
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[text_hash] = vector.tolist()
+            
+            if found:
+                now = time.time()
+                with self._lock:
+                    cursor.executemany("""
+                        UPDATE embeddings SET last_used = ?
+                        WHERE text_hash = ? AND model = ?
+                    """, [(now, text_hash, model) for text_hash in found])
+                    conn.commit()
+            
+            conn.close()
+        except Exception as e:
+            logger.error(f"Error reading embedding cache: {e}")
+            found = {}
+        
+        hits = sum(1 for text_hash in text_hashes if text_hash in found)
+        self.hits += hits
+        self.misses += len(text_hashes) - hits
+        
+        return found
+    
+    def put_many(self, text_hashes: List[str], vectors: List[List[float]], model: str) -> bool:
+        now = time.time()
+        rows = {}
+        for text_hash, vector in zip(text_hashes, vectors):
+            blob = array("f", vector).tobytes()
+            rows[text_hash] = (text_hash, model, len(blob), now, blob)
+        
+        with self._lock:
+            try:
+                conn = self._connect()
+                cursor = conn.cursor()
+                
+                # Sizes of rows about to be replaced, read without touching their blobs
+                replaced = []
+                hashes = list(rows)
+                for i in range(0, len(hashes), 500):
+                    batch = hashes[i:i + 500]
+                    placeholders = ",".join("?" * len(batch))
+                    cursor.execute(f"""
+                        SELECT size FROM embeddings
+                        WHERE model = ? AND text_hash IN ({placeholders})
+                    """, [model, *batch])
+                    replaced.extend(size for size, in cursor.fetchall())
+                
+                cursor.executemany("""
+                    INSERT OR REPLACE INTO embeddings (text_hash, model, size, last_used, vector)
+                    VALUES (?, ?, ?, ?, ?)
+                """, rows.values())
+                
+                entries = self._entries + len(rows) - len(replaced)
+                size_bytes = self._bytes + sum(row[2] for row in rows.values()) - sum(replaced)
+                evicted, freed = self._evict(cursor, size_bytes - self.max_bytes)
+                
+                conn.commit()
+                conn.close()
+            except Exception as e:
+                logger.error(f"Error writing embedding cache: {e}")
+                return False
+            
+            self._entries = entries - evicted
+            self._bytes = size_bytes - freed
+            self.evictions += evicted
+        
+        if evicted:
+            logger.info(f"Evicted {evicted} embeddings from cache")
+        return True
+    
+    @staticmethod
+    def _evict(cursor: sqlite3.Cursor, excess: int) -> Tuple[int, int]:
+        """Drop the least recently used rows until ``excess`` bytes are freed; returns (rows, bytes)."""
+        if excess <= 0:
+            return 0, 0
+        
+        # Walks the (last_used, size) index only, oldest first
+        cursor.execute("SELECT rowid, size FROM embeddings INDEXED BY idx_embeddings_lru ORDER BY last_used")
+        rowids = []
+        freed = 0
+        for rowid, size in cursor:
+            rowids.append((rowid,))
+            freed += size
+            if freed >= excess:
+                break
+        
+        cursor.executemany("DELETE FROM embeddings WHERE rowid = ?", rowids)
+        return len(rowids), freed
+    
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._entries,
+            "size_bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions
+        }
+
+
+embedding_cache: Optional[EmbeddingCache] = None
+
+if settings.embedding_cache_enabled:
+    embedding_cache = EmbeddingCache(
+        db_path=settings.embedding_cache_path,
+        max_bytes=settings.embedding_cache_max_bytes
+    )
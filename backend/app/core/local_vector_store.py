@@ -0,0 +1,562 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple, Union, Iterable
+
+import numpy as np
+from qdrant_client.models import PointStruct
+
+from app.core.vector_store import VectorStore, writes_collection, split_ordered_offset
+from app.core.chunk_store import chunk_store
+
+logger = logging.getLogger(__name__)
+
+INITIAL_CAPACITY = 1024
+# Temporary memory of one scan block: its float32 copy and score matrix
+SCAN_BLOCK_BYTES = 64 * 1024 * 1024
+# Stay under SQLite's limit on bound parameters
+SQL_BATCH = 900
+
+
+class LocalVectorStore(VectorStore):
+    """In-process vector store: a flat index over a memory-mapped matrix.
+    
+    Vectors are stored L2-normalized in ``vectors.npy`` (float32 or float16),
+    so cosine similarity is a dot product. Payloads live in a SQLite sidecar
+    keyed by matrix row. Searches score the rows in blocks with one matrix
+    product per block and keep a running top-k with ``argpartition``; results
+    are exact. Deleted rows are reused by later upserts.
+    
+    All work runs in a worker thread under one lock, so NumPy scans do not
+    block the event loop.
+    """
+    
+    def __init__(self, path: str, dimension: int, dtype: str = "float32"):
+        self.path = Path(path)
+        self.dimension = dimension
+        self.dtype = np.dtype(dtype)
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._vectors: Optional[np.memmap] = None
+        self._alive = np.zeros(0, dtype=bool)
+        self._size = 0  # rows in use or freed, i.e. the scanned prefix of the matrix
+        self._free: List[int] = []
+        self._row_of: Dict[str, int] = {}  # point id -> row
+        self._point_at: Dict[int, Tuple[str, Optional[str]]] = {}  # row -> (point id, doc_id)
+        self._doc_rows: Dict[Optional[str], set] = {}
+    
+    @property
+    def _vectors_path(self) -> Path:
+        return self.path / "vectors.npy"
+    
+    async def start(self):
+        await asyncio.to_thread(self._start)
+    
+    def _start(self):
+        with self._lock:
+            self.path.mkdir(parents=True, exist_ok=True)
+            
+            self._conn = sqlite3.connect(self.path / "payloads.db", check_same_thread=False)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS points (
+                    row INTEGER PRIMARY KEY,
+                    id TEXT NOT NULL UNIQUE,
+                    doc_id TEXT,
+                    chunk_index INTEGER,
+                    payload TEXT NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_points_doc ON points (doc_id, chunk_index)")
+            self._conn.commit()
+            
+            if self._vectors_path.exists():
+                self._vectors = np.lib.format.open_memmap(self._vectors_path, mode="r+")
+                if self._vectors.shape[1] != self.dimension:
+                    raise ValueError(
+                        f"Local vector store stores {self._vectors.shape[1]}-dim vectors but "
+                        f"EMBEDDING_DIMENSION is {self.dimension}; "
+                        f"run `python -m app.reproject_collection` to convert it"
+                    )
+                self.dtype = self._vectors.dtype
+            else:
+                self._vectors = np.lib.format.open_memmap(
+                    self._vectors_path, mode="w+", dtype=self.dtype,
+                    shape=(INITIAL_CAPACITY, self.dimension)
+                )
+            
+            self._alive = np.zeros(len(self._vectors), dtype=bool)
+            for row, point_id, doc_id in self._conn.execute("SELECT row, id, doc_id FROM points"):
+                self._track(row, point_id, doc_id)
+            self._size = max(self._point_at, default=-1) + 1
+            self._free = [row for row in range(self._size) if not self._alive[row]]
+            
+            logger.info(f"Local vector store at {self.path}: {len(self._row_of)} points")
+    
+    async def close(self):
+        await asyncio.to_thread(self._close)
+    
+    def _close(self):
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+                self._vectors = None
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+    
+    async def ping(self):
+        if self._conn is None:
+            raise RuntimeError("Local vector store is not started")
+    
+    def _track(self, row: int, point_id: str, doc_id: Optional[str]):
+        self._alive[row] = True
+        self._row_of[point_id] = row
+        self._point_at[row] = (point_id, doc_id)
+        self._doc_rows.setdefault(doc_id, set()).add(row)
+    
+    def _untrack(self, row: int):
+        self._alive[row] = False
+        point_id, doc_id = self._point_at.pop(row)
+        del self._row_of[point_id]
+        rows = self._doc_rows[doc_id]
+        rows.discard(row)
+        if not rows:
+            del self._doc_rows[doc_id]
+    
+    def _ensure_capacity(self, rows: int):
+        capacity = len(self._vectors)
+        if rows <= capacity:
+            return
+        
+        new_capacity = max(rows, capacity * 2)
+        tmp_path = self.path / "vectors.tmp.npy"
+        grown = np.lib.format.open_memmap(
+            tmp_path, mode="w+", dtype=self.dtype, shape=(new_capacity, self.dimension)
+        )
+        grown[:self._size] = self._vectors[:self._size]
+        grown.flush()
+        del grown
+        
+        self._vectors = None
+        os.replace(tmp_path, self._vectors_path)
+        self._vectors = np.lib.format.open_memmap(self._vectors_path, mode="r+")
+        self._alive = np.concatenate([self._alive, np.zeros(new_capacity - capacity, dtype=bool)])
+    
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+    
+    @writes_collection
+    async def upsert_points(self, points: List[PointStruct], wait: bool = True) -> bool:
+        # Writes are always applied before returning, ``wait`` has no effect here
+        if not points:
+            return True
+        try:
+            await asyncio.to_thread(self._upsert, points)
+            logger.info(f"Upserted {len(points)} points")
+            return True
+        except Exception as e:
+            logger.error(f"Error upserting points: {e}")
+            return False
+    
+    def _upsert(self, points: List[PointStruct]):
+        vectors = self._normalize(np.asarray([point.vector for point in points], dtype=np.float32))
+        
+        with self._lock:
+            new_points = [str(point.id) for point in points if str(point.id) not in self._row_of]
+            reused = min(len(self._free), len(new_points))
+            self._ensure_capacity(self._size + len(new_points) - reused)
+            
+            rows = []
+            records = []
+            for point in points:
+                point_id = str(point.id)
+                payload = point.payload or {}
+                row = self._row_of.get(point_id)
+                if row is not None:
+                    self._untrack(row)
+                elif self._free:
+                    row = self._free.pop()
+                else:
+                    row = self._size
+                    self._size += 1
+                
+                self._track(row, point_id, payload.get("doc_id"))
+                rows.append(row)
+                records.append((
+                    row, point_id, payload.get("doc_id"), payload.get("chunk_index"),
+                    json.dumps(payload, default=str)
+                ))
+            
+            self._vectors[rows] = vectors.astype(self.dtype)
+            self._vectors.flush()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO points (row, id, doc_id, chunk_index, payload) VALUES (?, ?, ?, ?, ?)",
+                records
+            )
+            self._conn.commit()
+    
+    async def search(
+        self,
+        query_vector: List[float],
+        limit: int = 5,
+        score_threshold: float = 0.0,
+        doc_id_filter: Optional[str] = None,
+        with_vectors: bool = False,
+        hydrate: bool = True,
+        raise_errors: bool = False
+    ) -> List[Dict[str, Any]]:
+        try:
+            results = await asyncio.to_thread(self._search_batch, [{
+                "query_vector": query_vector,
+                "limit": limit,
+                "score_threshold": score_threshold,
+                "doc_id_filter": doc_id_filter
+            }], with_vectors, hydrate)
+            return results[0]
+        except Exception as e:
+            logger.error(f"Error searching: {e}")
+            if raise_errors:
+                raise
+            return []
+    
+    async def search_batch(self, searches: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        if not searches:
+            return []
+        return await asyncio.to_thread(self._search_batch, searches)
+    
+    def _search_batch(
+        self,
+        searches: List[Dict[str, Any]],
+        with_vectors: bool = False,
+        hydrate: bool = True
+    ) -> List[List[Dict[str, Any]]]:
+        queries = self._normalize(np.asarray([search["query_vector"] for search in searches], dtype=np.float32))
+        
+        # Searches over the same rows share one scan
+        groups: Dict[Optional[str], List[int]] = {}
+        for i, search in enumerate(searches):
+            groups.setdefault(search.get("doc_id_filter") or None, []).append(i)
+        
+        hits: List[List[Tuple[int, float]]] = [[] for _ in searches]
+        with self._lock:
+            for doc_id, indexes in groups.items():
+                rows = None
+                if doc_id is not None:
+                    rows = np.fromiter(sorted(self._doc_rows.get(doc_id, ())), dtype=np.int64)
+                
+                k = max(searches[i].get("limit", 5) for i in indexes)
+                top_rows, top_scores = self._scan(queries[indexes], k, rows)
+                
+                for i, query_rows, query_scores in zip(indexes, top_rows, top_scores):
+                    threshold = searches[i].get("score_threshold", 0.0)
+                    hits[i] = [
+                        (int(row), float(score))
+                        for row, score in zip(query_rows, query_scores)
+                        if score >= threshold
+                    ][:searches[i].get("limit", 5)]
+            
+            hit_rows = {row for query_hits in hits for row, _ in query_hits}
+            payloads = self._load_rows(hit_rows)
+            vectors = {}
+            if with_vectors and hit_rows:
+                rows = sorted(hit_rows)
+                vectors = dict(zip(rows, self._vectors[rows].astype(np.float32).tolist()))
+        
+        results = []
+        for query_hits in hits:
+            query_results = []
+            for row, score in query_hits:
+                hit = self._format_hit(payloads[row], score)
+                if with_vectors:
+                    hit["vector"] = vectors[row]
+                query_results.append(hit)
+            results.append(query_results)
+        
+        if hydrate:
+            chunk_store.hydrate([hit for query_hits in results for hit in query_hits])
+        return results
+    
+    def _scan(
+        self,
+        queries: np.ndarray,
+        k: int,
+        rows: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-``k`` rows and scores of each query, best first, over ``rows`` or every live row."""
+        top_rows = np.empty((len(queries), 0), dtype=np.int64)
+        top_scores = np.empty((len(queries), 0), dtype=np.float32)
+        total = self._size if rows is None else len(rows)
+        step = self._scan_block_rows(self.dimension, len(queries))
+        
+        for start in range(0, total, step):
+            end = min(start + step, total)
+            if rows is None:
+                block_rows = np.arange(start, end)
+                block = self._vectors[start:end]
+            else:
+                block_rows = rows[start:end]
+                block = self._vectors[block_rows]
+            
+            scores = queries @ block.astype(np.float32, copy=False).T
+            if rows is None:
+                scores[:, ~self._alive[start:end]] = -np.inf
+            
+            top_rows = np.concatenate([top_rows, np.broadcast_to(block_rows, scores.shape)], axis=1)
+            top_scores = np.concatenate([top_scores, scores], axis=1)
+            if top_scores.shape[1] > k:
+                keep = np.argpartition(-top_scores, k - 1, axis=1)[:, :k]
+                top_rows = np.take_along_axis(top_rows, keep, axis=1)
+                top_scores = np.take_along_axis(top_scores, keep, axis=1)
+        
+        order = np.argsort(-top_scores, axis=1)
+        return np.take_along_axis(top_rows, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+    
+    @staticmethod
+    def _scan_block_rows(dimension: int, queries: int) -> int:
+        """Rows per scan block, so that wide vectors get smaller blocks than narrow ones."""
+        # Per row: its float32 copy, and for each query a score plus the row and score kept for top-k
+        row_bytes = dimension * 4 + queries * (4 + 8 + 4)
+        return max(1, SCAN_BLOCK_BYTES // row_bytes)
+    
+    def _load_rows(self, rows: Iterable[int]) -> Dict[int, Tuple[str, Dict[str, Any]]]:
+        rows = list(rows)
+        loaded = {}
+        for i in range(0, len(rows), SQL_BATCH):
+            batch = rows[i:i + SQL_BATCH]
+            cursor = self._conn.execute(
+                f"SELECT row, id, payload FROM points WHERE row IN ({','.join('?' * len(batch))})",
+                batch
+            )
+            for row, point_id, payload in cursor:
+                loaded[row] = (point_id, json.loads(payload))
+        return loaded
+    
+    @staticmethod
+    def _format_hit(point: Tuple[str, Dict[str, Any]], score: float) -> Dict[str, Any]:
+        point_id, payload = point
+        return {
+            "id": point_id,
+            "score": score,
+            "doc_id": payload.get("doc_id"),
+            "chunk_index": payload.get("chunk_index"),
+            "text": payload.get("text"),
+            "metadata": payload.get("metadata", {})
+        }
+    
+    async def delete_document(self, doc_id: str) -> bool:
+        # delete_documents already bumps the generation
+        return await self.delete_documents([doc_id])
+    
+    @writes_collection
+    async def delete_documents(self, doc_ids: List[str]) -> bool:
+        if not doc_ids:
+            return True
+        try:
+            await asyncio.to_thread(self._delete_documents, doc_ids)
+            logger.info(f"Deleted {len(doc_ids)} documents")
+            return True
+        except Exception as e:
+            logger.error(f"Error deleting {len(doc_ids)} documents: {e}")
+            return False
+    
+    def _delete_documents(self, doc_ids: List[str]):
+        with self._lock:
+            rows = [row for doc_id in doc_ids for row in self._doc_rows.get(doc_id, ())]
+            self._delete_rows(rows)
+        chunk_store.delete_documents(doc_ids)
+    
+    @writes_collection
+    async def delete_points(self, point_ids: List[Union[str, int]]) -> bool:
+        if not point_ids:
+            return True
+        try:
+            await asyncio.to_thread(self._delete_points, point_ids)
+            logger.info(f"Deleted {len(point_ids)} points")
+            return True
+        except Exception as e:
+            logger.error(f"Error deleting points: {e}")
+            return False
+    
+    def _delete_points(self, point_ids: List[Union[str, int]]):
+        with self._lock:
+            rows = [self._row_of[str(point_id)] for point_id in point_ids if str(point_id) in self._row_of]
+            self._delete_rows(rows)
+        chunk_store.delete_points(point_ids)
+    
+    def _delete_rows(self, rows: List[int]):
+        if not rows:
+            return
+        for row in rows:
+            self._untrack(row)
+            self._free.append(row)
+        
+        self._conn.executemany("DELETE FROM points WHERE row = ?", [(row,) for row in rows])
+        self._conn.commit()
+    
+    @writes_collection
+    async def delete_all(self) -> bool:
+        try:
+            await asyncio.to_thread(self._delete_all)
+            logger.info(f"Cleared local vector store at {self.path}")
+            return True
+        except Exception as e:
+            logger.error(f"Error clearing local vector store: {e}")
+            return False
+    
+    def _delete_all(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM points")
+            self._conn.commit()
+            self._alive[:] = False
+            self._size = 0
+            self._free = []
+            self._row_of.clear()
+            self._point_at.clear()
+            self._doc_rows.clear()
+        chunk_store.delete_all()
+    
+    @writes_collection
+    async def set_payloads(self, updates: List[Tuple[Union[str, int], Dict[str, Any]]]) -> bool:
+        if not updates:
+            return True
+        try:
+            await asyncio.to_thread(self._set_payloads, updates)
+            return True
+        except Exception as e:
+            logger.error(f"Error updating payloads: {e}")
+            return False
+    
+    def _set_payloads(self, updates: List[Tuple[Union[str, int], Dict[str, Any]]]):
+        with self._lock:
+            rows = {str(point_id): self._row_of.get(str(point_id)) for point_id, _ in updates}
+            current = self._load_rows(row for row in rows.values() if row is not None)
+            
+            records = []
+            for point_id, changes in updates:
+                row = rows[str(point_id)]
+                if row is None:
+                    continue
+                payload = {**current[row][1], **changes}
+                current[row] = (str(point_id), payload)
+                
+                if self._point_at[row][1] != payload.get("doc_id"):
+                    self._untrack(row)
+                    self._track(row, str(point_id), payload.get("doc_id"))
+                records.append((
+                    payload.get("doc_id"), payload.get("chunk_index"),
+                    json.dumps(payload, default=str), row
+                ))
+            
+            self._conn.executemany(
+                "UPDATE points SET doc_id = ?, chunk_index = ?, payload = ? WHERE row = ?",
+                records
+            )
+            self._conn.commit()
+    
+    async def count_document_chunks(self, doc_id: str) -> int:
+        return await asyncio.to_thread(self._count_document_chunks, doc_id)
+    
+    def _count_document_chunks(self, doc_id: str) -> int:
+        with self._lock:
+            return len(self._doc_rows.get(doc_id, ()))
+    
+    async def get_document_chunks_page(
+        self,
+        doc_id: str,
+        limit: int = 256,
+        offset: Optional[Union[str, int]] = None,
+        payload_fields: Optional[List[str]] = None,
+        ordered: bool = False
+    ) -> Tuple[List[Dict[str, Any]], Optional[Union[str, int]]]:
+        return await asyncio.to_thread(
+            self._get_document_chunks_page, doc_id, limit, offset, payload_fields, ordered
+        )
+    
+    def _get_document_chunks_page(
+        self,
+        doc_id: str,
+        limit: int,
+        offset: Optional[Union[str, int]],
+        payload_fields: Optional[List[str]],
+        ordered: bool
+    ) -> Tuple[List[Dict[str, Any]], Optional[Union[str, int]]]:
+        # Offsets are "<chunk_index>:<row>" of the next point when ordered, its matrix row otherwise
+        with self._lock:
+            if ordered:
+                records = self._conn.execute("""
+                    SELECT id, chunk_index, row, payload FROM points
+                    WHERE doc_id = ? AND (chunk_index, row) >= (?, ?)
+                    ORDER BY chunk_index, row
+                    LIMIT ?
+                """, (doc_id, *split_ordered_offset(offset), limit + 1)).fetchall()
+            else:
+                records = self._conn.execute("""
+                    SELECT id, NULL, row, payload FROM points
+                    WHERE doc_id = ? AND row >= ?
+                    ORDER BY row
+                    LIMIT ?
+                """, (doc_id, int(offset or 0), limit + 1)).fetchall()
+        
+        next_offset = None
+        if len(records) > limit:
+            _, chunk_index, row, _ = records[limit]
+            next_offset = f"{chunk_index}:{row}" if ordered else row
+            records = records[:limit]
+        
+        chunks = []
+        for point_id, _, _, payload in records:
+            payload = json.loads(payload)
+            if payload_fields is not None:
+                payload = {field: payload[field] for field in payload_fields if field in payload}
+            chunks.append({"id": point_id, **payload})
+        return chunks, next_offset
+    
+    @writes_collection
+    async def reproject_collection(self, dimension: int, batch_size: int = 256):
+        await asyncio.to_thread(self._reproject, dimension)
+    
+    def _reproject(self, dimension: int):
+        with self._lock:
+            if self._vectors is None:
+                if not self._vectors_path.exists():
+                    logger.info(f"Local vector store at {self.path} is empty, nothing to reproject")
+                    return
+                self._start_for_reproject()
+            
+            current = self._vectors.shape[1]
+            if current == dimension:
+                logger.info(f"Local vector store already stores {dimension}-dim vectors")
+                return
+            if dimension > current:
+                raise ValueError(f"Cannot project {current}-dim vectors up to {dimension} dimensions")
+            
+            tmp_path = self.path / "vectors.tmp.npy"
+            projected = np.lib.format.open_memmap(
+                tmp_path, mode="w+", dtype=self._vectors.dtype, shape=(len(self._vectors), dimension)
+            )
+            block_rows = self._scan_block_rows(current, 0)
+            for start in range(0, self._size, block_rows):
+                block = self._vectors[start:start + block_rows, :dimension].astype(np.float32)
+                projected[start:start + len(block)] = self._normalize(block)
+            projected.flush()
+            del projected
+            
+            self._vectors = None
+            os.replace(tmp_path, self._vectors_path)
+            self._vectors = np.lib.format.open_memmap(self._vectors_path, mode="r+")
+            self.dimension = dimension
+            logger.info(f"Reprojected local vector store from {current} to {dimension} dimensions")
+    
+    def _start_for_reproject(self):
+        # The stored dimension differs from the configured one, so skip the check in _start
+        stored = np.lib.format.open_memmap(self._vectors_path, mode="r")
+        self.dimension = stored.shape[1]
+        del stored
+        self._start()
@@ -1,96 +1,439 @@
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchValue
-from typing import List, Dict, Any, Optional
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.models import (
+    Distance, VectorParams, PayloadSchemaType, PointStruct, Filter, FieldCondition, MatchValue, MatchAny,
+    PointIdsList, SetPayload, SetPayloadOperation, HnswConfigDiff, VectorParamsDiff,
+    ScalarQuantization, ScalarQuantizationConfig, ScalarType, BinaryQuantization,
+    BinaryQuantizationConfig, QuantizationSearchParams, SearchParams, Disabled, OrderBy, QueryRequest
+)
+from typing import List, Dict, Any, Optional, Tuple, Union, Callable
 from app.core.config import settings
+from app.core.vector_store import VectorStore, writes_collection, split_ordered_offset
+from app.core.chunk_store import chunk_store
+import asyncio
+import httpx
+import json
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+# Rough size of one float in a JSON request body
+JSON_BYTES_PER_FLOAT = 20
 
-class QdrantService:
+# Payload fields used in filters, indexed so filtered calls avoid full scans
+PAYLOAD_INDEXES = {
+    "doc_id": PayloadSchemaType.KEYWORD,
+    "chunk_index": PayloadSchemaType.INTEGER,  # also enables ordering by chunk_index
+}
+
+
+class QdrantService(VectorStore):
     def __init__(self):
-        self.client = QdrantClient(url=settings.qdrant_url)
+        # REST calls share a pool of keep-alive connections; gRPC is used instead when preferred
+        self.client = AsyncQdrantClient(
+            url=settings.qdrant_url,
+            prefer_grpc=settings.qdrant_prefer_grpc,
+            grpc_port=settings.qdrant_grpc_port,
+            timeout=settings.qdrant_timeout,
+            limits=httpx.Limits(
+                max_connections=settings.qdrant_max_connections,
+                max_keepalive_connections=settings.qdrant_max_keepalive_connections,
+                keepalive_expiry=settings.qdrant_keepalive_expiry
+            )
+        )
         self.collection_name = settings.qdrant_collection_name
-        self._ensure_collection_exists()
     
-    def _ensure_collection_exists(self):
+    async def start(self):
+        await self._ensure_collection_exists()
+    
+    async def close(self):
+        await self.client.close()
+    
+    async def ping(self):
+        await self.client.get_collections()
+    
+    async def _ensure_collection_exists(self):
         try:
-            collections = self.client.get_collections()
-            existing_collections = [c.name for c in collections.collections]
-            
-            if self.collection_name not in existing_collections:
-                self.client.create_collection(
-                    collection_name=self.collection_name,
-                    vectors_config=VectorParams(
-                        size=4096,  # Adjust based on embedding model
-                        distance=Distance.COSINE
-                    )
-                )
+            if not await self.client.collection_exists(self.collection_name):
+                await self._create_collection(self.collection_name, settings.embedding_dimension)
                 logger.info(f"Created collection: {self.collection_name}")
             else:
                 logger.info(f"Collection {self.collection_name} already exists")
+                await self._migrate_storage_config()
+            
+            await self._ensure_payload_indexes()
         except Exception as e:
             logger.error(f"Error ensuring collection exists: {e}")
             raise
     
-    async def upsert_points(self, points: List[PointStruct]) -> bool:
-        try:
-            self.client.upsert(
+    async def _create_collection(self, collection_name: str, dimension: int):
+        await self.client.create_collection(
+            collection_name=collection_name,
+            vectors_config=VectorParams(
+                size=dimension,
+                distance=Distance.COSINE,
+                on_disk=settings.qdrant_on_disk_vectors
+            ),
+            hnsw_config=self._hnsw_config(),
+            quantization_config=self._quantization_config()
+        )
+    
+    @staticmethod
+    def _hnsw_config() -> HnswConfigDiff:
+        return HnswConfigDiff(m=settings.qdrant_hnsw_m, ef_construct=settings.qdrant_hnsw_ef_construct)
+    
+    @staticmethod
+    def _quantization_config() -> Optional[Union[ScalarQuantization, BinaryQuantization]]:
+        mode = settings.qdrant_quantization.lower()
+        if mode == "none":
+            return None
+        if mode == "scalar":
+            return ScalarQuantization(
+                scalar=ScalarQuantizationConfig(
+                    type=ScalarType.INT8,
+                    quantile=0.99,
+                    always_ram=settings.qdrant_quantization_always_ram
+                )
+            )
+        if mode == "binary":
+            return BinaryQuantization(
+                binary=BinaryQuantizationConfig(always_ram=settings.qdrant_quantization_always_ram)
+            )
+        raise ValueError(f"Unsupported QDRANT_QUANTIZATION: {settings.qdrant_quantization}")
+    
+    def _search_params(self) -> SearchParams:
+        quantization = None
+        if settings.qdrant_quantization.lower() != "none":
+            quantization = QuantizationSearchParams(
+                rescore=settings.qdrant_quantization_rescore,
+                oversampling=settings.qdrant_quantization_oversampling
+            )
+        return SearchParams(hnsw_ef=settings.qdrant_hnsw_ef, quantization=quantization)
+    
+    async def _migrate_storage_config(self):
+        """Bring an existing collection's storage settings in line with the configuration.
+        
+        Qdrant applies the update online: the collection keeps serving reads and
+        writes while indexes and quantized vectors are rebuilt in the background.
+        """
+        info = await self.client.get_collection(self.collection_name)
+        config = info.config
+        update = {}
+        
+        vectors = config.params.vectors
+        if isinstance(vectors, VectorParams) and vectors.size != settings.embedding_dimension:
+            raise ValueError(
+                f"Collection {self.collection_name} stores {vectors.size}-dim vectors but "
+                f"EMBEDDING_DIMENSION is {settings.embedding_dimension}; "
+                f"run `python -m app.reproject_collection` to convert it"
+            )
+        if isinstance(vectors, VectorParams) and bool(vectors.on_disk) != settings.qdrant_on_disk_vectors:
+            update["vectors_config"] = {"": VectorParamsDiff(on_disk=settings.qdrant_on_disk_vectors)}
+        
+        if (config.hnsw_config.m, config.hnsw_config.ef_construct) != (
+            settings.qdrant_hnsw_m, settings.qdrant_hnsw_ef_construct
+        ):
+            update["hnsw_config"] = self._hnsw_config()
+        
+        quantization = self._quantization_config()
+        if config.quantization_config != quantization:
+            update["quantization_config"] = quantization if quantization is not None else Disabled.DISABLED
+        
+        if update:
+            await self.client.update_collection(collection_name=self.collection_name, **update)
+            logger.info(f"Updated {', '.join(update)} of collection {self.collection_name}")
+    
+    async def _ensure_payload_indexes(self):
+        """Create missing payload indexes, so existing collections are migrated in place."""
+        info = await self.client.get_collection(self.collection_name)
+        payload_schema = info.payload_schema or {}
+        
+        for field_name, field_schema in PAYLOAD_INDEXES.items():
+            existing = payload_schema.get(field_name)
+            if existing is not None and existing.data_type == field_schema:
+                continue
+            
+            if existing is not None:
+                await self.client.delete_payload_index(
+                    collection_name=self.collection_name,
+                    field_name=field_name,
+                    wait=True
+                )
+            await self.client.create_payload_index(
                 collection_name=self.collection_name,
-                points=points
+                field_name=field_name,
+                field_schema=field_schema,
+                wait=True
             )
-            logger.info(f"Upserted {len(points)} points")
+            logger.info(f"Created {field_schema.value} payload index on {field_name}")
+    
+    @writes_collection
+    async def reproject_collection(self, dimension: int, batch_size: int = 256):
+        """Shrink the stored vectors to their first ``dimension`` components.
+        
+        Vectors are truncated and re-normalized from what Qdrant already stores,
+        so no embedding is requested again. The points are copied to a temporary
+        collection, the original is recreated with the new size and the points
+        are copied back, keeping their ids and payloads. The temporary collection
+        is dropped last, so a run interrupted while copying back is completed
+        from it the next time this is called.
+        """
+        from app.services.embedding_service import truncate_embedding
+        
+        interrupted = await self._interrupted_reprojection()
+        if interrupted is not None:
+            logger.info(f"Resuming interrupted reprojection from {interrupted}")
+            info = await self.client.get_collection(interrupted)
+            await self._finish_reprojection(interrupted, info.config.params.vectors.size, batch_size)
+        
+        info = await self.client.get_collection(self.collection_name)
+        current = info.config.params.vectors.size
+        if current == dimension:
+            logger.info(f"Collection {self.collection_name} already stores {dimension}-dim vectors")
+            return
+        if dimension > current:
+            raise ValueError(f"Cannot project {current}-dim vectors up to {dimension} dimensions")
+        
+        temp_name = self._reprojection_name(dimension)
+        if await self.client.collection_exists(temp_name):
+            # Left by a run that stopped before the original was dropped
+            await self.client.delete_collection(temp_name)
+        await self._create_collection(temp_name, dimension)
+        
+        copied = await self._copy_points(
+            self.collection_name,
+            temp_name,
+            batch_size,
+            lambda vector: truncate_embedding(vector, dimension)
+        )
+        logger.info(f"Projected {copied} points from {current} to {dimension} dimensions")
+        
+        await self.client.delete_collection(self.collection_name)
+        await self._finish_reprojection(temp_name, dimension, batch_size)
+    
+    def _reprojection_name(self, dimension: int) -> str:
+        return f"{self.collection_name}_reproject_{dimension}"
+    
+    async def _interrupted_reprojection(self) -> Optional[str]:
+        """Name of a complete temporary collection whose copy back never finished, if any.
+        
+        The original is only dropped once the temporary collection holds every
+        point, so one is complete if the original is missing or has already
+        been recreated with its vector size.
+        """
+        if await self.client.collection_exists(self.collection_name):
+            info = await self.client.get_collection(self.collection_name)
+            temp_name = self._reprojection_name(info.config.params.vectors.size)
+            return temp_name if await self.client.collection_exists(temp_name) else None
+        
+        prefix = f"{self.collection_name}_reproject_"
+        collections = (await self.client.get_collections()).collections
+        return next((collection.name for collection in collections if collection.name.startswith(prefix)), None)
+    
+    async def _finish_reprojection(self, temp_name: str, dimension: int, batch_size: int):
+        if not await self.client.collection_exists(self.collection_name):
+            await self._create_collection(self.collection_name, dimension)
+        # Upserts keep ids, so points copied before an interruption are just rewritten
+        await self._copy_points(temp_name, self.collection_name, batch_size)
+        await self._ensure_payload_indexes()
+        await self.client.delete_collection(temp_name)
+        logger.info(f"Reprojected collection {self.collection_name} to {dimension} dimensions")
+    
+    async def _copy_points(
+        self,
+        source: str,
+        target: str,
+        batch_size: int,
+        transform: Optional[Callable[[List[float]], List[float]]] = None
+    ) -> int:
+        copied = 0
+        offset = None
+        while True:
+            records, offset = await self.client.scroll(
+                collection_name=source,
+                limit=batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True
+            )
+            if records:
+                await self.client.upsert(
+                    collection_name=target,
+                    points=[
+                        PointStruct(
+                            id=record.id,
+                            vector=transform(record.vector) if transform else record.vector,
+                            payload=record.payload
+                        )
+                        for record in records
+                    ],
+                    wait=True
+                )
+                copied += len(records)
+            if offset is None:
+                return copied
+    
+    @writes_collection
+    async def upsert_points(self, points: List[PointStruct], wait: bool = True) -> bool:
+        """Upsert points in size-bounded batches sent with bounded parallelism.
+        
+        Each batch is retried on its own, so one failed request does not resend
+        the whole document. With ``wait=False`` Qdrant acknowledges batches
+        before they are applied.
+        """
+        if not points:
             return True
-        except Exception as e:
-            logger.error(f"Error upserting points: {e}")
+        
+        batches = self._split_batches(points)
+        semaphore = asyncio.Semaphore(settings.qdrant_upsert_max_concurrency)
+        
+        async def run_batch(batch: List[PointStruct]) -> bool:
+            async with semaphore:
+                for attempt in range(settings.qdrant_upsert_retries + 1):
+                    try:
+                        await self.client.upsert(
+                            collection_name=self.collection_name,
+                            points=batch,
+                            wait=wait
+                        )
+                        return True
+                    except Exception as e:
+                        logger.warning(
+                            f"Upsert of {len(batch)} points failed "
+                            f"(attempt {attempt + 1}/{settings.qdrant_upsert_retries + 1}): {e}"
+                        )
+                        if attempt < settings.qdrant_upsert_retries:
+                            await asyncio.sleep(0.5 * 2 ** attempt)
+                return False
+        
+        started = time.perf_counter()
+        results = await asyncio.gather(*(run_batch(batch) for batch in batches))
+        elapsed = time.perf_counter() - started
+        
+        if not all(results):
+            logger.error(f"Error upserting points: {results.count(False)} of {len(batches)} batches failed")
             return False
+        
+        logger.info(
+            f"Upserted {len(points)} points in {len(batches)} batches "
+            f"({len(points) / max(elapsed, 1e-9):.0f} points/sec)"
+        )
+        return True
+    
+    @staticmethod
+    def _split_batches(points: List[PointStruct]) -> List[List[PointStruct]]:
+        # Request size is estimated from the JSON encoding of vectors and payloads
+        batches = []
+        batch = []
+        batch_bytes = 0
+        for point in points:
+            vector = point.vector if isinstance(point.vector, list) else []
+            point_bytes = len(vector) * JSON_BYTES_PER_FLOAT + len(json.dumps(point.payload or {}, default=str))
+            if batch and (
+                len(batch) >= settings.qdrant_upsert_batch_size
+                or batch_bytes + point_bytes > settings.qdrant_upsert_max_batch_bytes
+            ):
+                batches.append(batch)
+                batch = []
+                batch_bytes = 0
+            batch.append(point)
+            batch_bytes += point_bytes
+        
+        if batch:
+            batches.append(batch)
+        return batches
     
     async def search(
         self,
         query_vector: List[float],
         limit: int = 5,
         score_threshold: float = 0.0,
-        doc_id_filter: Optional[str] = None
+        doc_id_filter: Optional[str] = None,
+        with_vectors: bool = False,
+        hydrate: bool = True,
+        raise_errors: bool = False
     ) -> List[Dict[str, Any]]:
         try:
-            filters = None
-            if doc_id_filter:
-                filters = Filter(
-                    must=[
-                        FieldCondition(
-                            key="doc_id",
-                            match=MatchValue(value=doc_id_filter)
-                        )
-                    ]
-                )
-            
-            results = self.client.query_points(
+            results = (await self.client.query_points(
                 collection_name=self.collection_name,
                 query=query_vector,
                 limit=limit,
                 score_threshold=score_threshold,
-                query_filter=filters,
-                with_payload=True
-            ).points
+                query_filter=self._doc_filter(doc_id_filter),
+                search_params=self._search_params(),
+                with_payload=True,
+                with_vectors=with_vectors
+            )).points
             
-            return [
-                {
-                    "id": result.id,
-                    "score": result.score,
-                    "doc_id": result.payload.get("doc_id"),
-                    "chunk_index": result.payload.get("chunk_index"),
-                    "text": result.payload.get("text"),
-                    "metadata": result.payload.get("metadata", {})
-                }
-                for result in results
-            ]
+            hits = [self._format_hit(result) for result in results]
+            return chunk_store.hydrate(hits) if hydrate else hits
         except Exception as e:
             logger.error(f"Error searching: {e}")
+            if raise_errors:
+                raise
+            return []
+    
+    async def search_batch(self, searches: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Run many searches in one request; results come back in the order of ``searches``.
+        
+        Each search is a dict with ``query_vector`` and optional ``limit``,
+        ``score_threshold`` and ``doc_id_filter``, as in :meth:`search`.
+        """
+        if not searches:
             return []
+        
+        search_params = self._search_params()
+        responses = await self.client.query_batch_points(
+            collection_name=self.collection_name,
+            requests=[
+                QueryRequest(
+                    query=search["query_vector"],
+                    limit=search.get("limit", 5),
+                    score_threshold=search.get("score_threshold", 0.0),
+                    filter=self._doc_filter(search.get("doc_id_filter")),
+                    params=search_params,
+                    with_payload=True
+                )
+                for search in searches
+            ]
+        )
+        
+        results = [[self._format_hit(result) for result in response.points] for response in responses]
+        # Chunk text is loaded once, for all hits of all searches
+        chunk_store.hydrate([hit for hits in results for hit in hits])
+        return results
     
+    @staticmethod
+    def _doc_filter(doc_id: Optional[str]) -> Optional[Filter]:
+        if not doc_id:
+            return None
+        return Filter(
+            must=[
+                FieldCondition(
+                    key="doc_id",
+                    match=MatchValue(value=doc_id)
+                )
+            ]
+        )
+    
+    @staticmethod
+    def _format_hit(result) -> Dict[str, Any]:
+        hit = {
+            "id": result.id,
+            "score": result.score,
+            "doc_id": result.payload.get("doc_id"),
+            "chunk_index": result.payload.get("chunk_index"),
+            "text": result.payload.get("text"),
+            "metadata": result.payload.get("metadata", {})
+        }
+        if result.vector is not None:
+            hit["vector"] = result.vector
+        return hit
+    
+    @writes_collection
     async def delete_document(self, doc_id: str) -> bool:
         try:
-            self.client.delete(
+            await self.client.delete(
                 collection_name=self.collection_name,
                 points_selector=Filter(
                     must=[
@@ -101,40 +444,154 @@ class QdrantService:
                     ]
                 )
             )
+            chunk_store.delete_documents([doc_id])
             logger.info(f"Deleted document: {doc_id}")
             return True
         except Exception as e:
             logger.error(f"Error deleting document {doc_id}: {e}")
             return False
     
-    async def get_document_chunks(self, doc_id: str) -> List[Dict[str, Any]]:
+    @writes_collection
+    async def delete_documents(self, doc_ids: List[str]) -> bool:
+        """Delete the points of many documents in a single filtered request."""
+        if not doc_ids:
+            return True
         try:
-            results = self.client.scroll(
+            await self.client.delete(
                 collection_name=self.collection_name,
-                scroll_filter=Filter(
+                points_selector=Filter(
                     must=[
                         FieldCondition(
                             key="doc_id",
-                            match=MatchValue(value=doc_id)
+                            match=MatchAny(any=list(doc_ids))
                         )
                     ]
-                ),
-                limit=10000,
-                with_payload=True
+                )
             )
-            
-            return [
-                {
-                    "id": point.id,
-                    "chunk_index": point.payload.get("chunk_index"),
-                    "text": point.payload.get("text"),
-                    "metadata": point.payload.get("metadata", {})
-                }
-                for point in results[0]
-            ]
+            chunk_store.delete_documents(doc_ids)
+            logger.info(f"Deleted {len(doc_ids)} documents")
+            return True
         except Exception as e:
-            logger.error(f"Error getting document chunks: {e}")
-            return []
-
-
-qdrant_service = QdrantService()
+            logger.error(f"Error deleting {len(doc_ids)} documents: {e}")
+            return False
+    
+    @writes_collection
+    async def delete_all(self) -> bool:
+        """Drop and recreate the collection, which is much faster than deleting every point."""
+        try:
+            await self.client.delete_collection(self.collection_name)
+            await self._create_collection(self.collection_name, settings.embedding_dimension)
+            await self._ensure_payload_indexes()
+            chunk_store.delete_all()
+            logger.info(f"Recreated collection: {self.collection_name}")
+            return True
+        except Exception as e:
+            logger.error(f"Error clearing collection {self.collection_name}: {e}")
+            return False
+    
+    @writes_collection
+    async def set_payloads(self, updates: List[Tuple[Union[str, int], Dict[str, Any]]]) -> bool:
+        """Overwrite top-level payload keys of many points in a single request."""
+        if not updates:
+            return True
+        try:
+            await self.client.batch_update_points(
+                collection_name=self.collection_name,
+                update_operations=[
+                    SetPayloadOperation(set_payload=SetPayload(payload=payload, points=[point_id]))
+                    for point_id, payload in updates
+                ]
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Error updating payloads: {e}")
+            return False
+    
+    @writes_collection
+    async def delete_points(self, point_ids: List[Union[str, int]]) -> bool:
+        if not point_ids:
+            return True
+        try:
+            await self.client.delete(
+                collection_name=self.collection_name,
+                points_selector=PointIdsList(points=point_ids)
+            )
+            chunk_store.delete_points(point_ids)
+            logger.info(f"Deleted {len(point_ids)} points")
+            return True
+        except Exception as e:
+            logger.error(f"Error deleting points: {e}")
+            return False
+    
+    async def count_document_chunks(self, doc_id: str) -> int:
+        # Answered from the doc_id payload index, without transferring any point
+        result = await self.client.count(
+            collection_name=self.collection_name,
+            count_filter=Filter(
+                must=[
+                    FieldCondition(
+                        key="doc_id",
+                        match=MatchValue(value=doc_id)
+                    )
+                ]
+            ),
+            exact=True
+        )
+        return result.count
+    
+    async def get_document_chunks_page(
+        self,
+        doc_id: str,
+        limit: int = 256,
+        offset: Optional[Union[str, int]] = None,
+        payload_fields: Optional[List[str]] = None,
+        ordered: bool = False
+    ) -> Tuple[List[Dict[str, Any]], Optional[Union[str, int]]]:
+        """Return one page of a document's chunks and the offset of the next page.
+        
+        ``payload_fields`` selects the payload keys to load (all of them by
+        default). With ``ordered=True`` chunks come sorted by ``chunk_index``
+        and the offset is ``"<chunk_index>:<skip>"``, with ``skip`` the number
+        of points of that chunk index already returned; otherwise it is a
+        point id.
+        """
+        doc_filter = Filter(
+            must=[
+                FieldCondition(
+                    key="doc_id",
+                    match=MatchValue(value=doc_id)
+                )
+            ]
+        )
+        with_payload = True if payload_fields is None else list(payload_fields)
+        
+        if ordered:
+            if with_payload is not True and "chunk_index" not in with_payload:
+                with_payload.append("chunk_index")
+            start_index, skip = split_ordered_offset(offset)
+            # Points are fetched from the first one of start_index, so the ones the
+            # previous pages returned are skipped; one extra point gives the next offset
+            points, _ = await self.client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=doc_filter,
+                limit=skip + limit + 1,
+                order_by=OrderBy(key="chunk_index", start_from=start_index),
+                with_payload=with_payload
+            )
+            end = skip + limit
+            next_offset = None
+            if len(points) > end:
+                next_index = points[end].payload["chunk_index"]
+                returned = sum(1 for point in points[:end] if point.payload["chunk_index"] == next_index)
+                next_offset = f"{next_index}:{returned}"
+            points = points[skip:end]
+        else:
+            points, next_offset = await self.client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=doc_filter,
+                limit=limit,
+                offset=offset,
+                with_payload=with_payload
+            )
+        
+        return [{"id": point.id, **(point.payload or {})} for point in points], next_offset
@@ -26,7 +26,20 @@ class RegoloAIService:
         except Exception as e:
             logger.error(f"Error generating embedding: {e}")
             raise
-    
+
+    async def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+        try:
+            response = await self.client.embeddings.create(
+                model=self.embedding_model,
+                input=texts
+            )
+            # The API does not guarantee response order, restore it by index
+            data = sorted(response.data, key=lambda item: item.index)
+            return [item.embedding for item in data]
+        except Exception as e:
+            logger.error(f"Error generating batch embeddings: {e}")
+            raise
+
     async def chat_completion(
         self,
         messages: List[Dict[str, Any]],
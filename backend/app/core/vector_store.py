@@ -0,0 +1,173 @@
+from abc import ABC, abstractmethod
+from functools import wraps
+from qdrant_client.models import PointStruct
+from typing import List, Dict, Any, Optional, Tuple, Union, AsyncIterator, Callable
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def writes_collection(method: Callable) -> Callable:
+    """Mark a vector store method as a write, bumping ``generation`` once it returns or fails."""
+    @wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        try:
+            return await method(self, *args, **kwargs)
+        finally:
+            self.generation += 1
+    
+    return wrapper
+
+
+def split_ordered_offset(offset: Optional[Union[str, int]]) -> Tuple[int, int]:
+    """Split an ordered paging offset ``"<chunk_index>:<tiebreak>"``, ``(0, 0)`` for the first page.
+    
+    Raises ``ValueError`` for an offset that is not of that form.
+    """
+    if offset is None:
+        return 0, 0
+    chunk_index, tiebreak = str(offset).split(":")
+    return int(chunk_index), int(tiebreak)
+
+
+class VectorStore(ABC):
+    """Storage and similarity search for chunk vectors and their payloads.
+    
+    Points carry a payload with at least ``doc_id``, ``chunk_index``, ``text``
+    and ``metadata``. Vectors are compared by cosine similarity. Search hits
+    are dicts with ``id``, ``score``, ``doc_id``, ``chunk_index``, ``text``
+    and ``metadata``.
+    
+    ``generation`` changes after every write, so cached search results can
+    tell they are stale; implementations decorate their writes with
+    :func:`writes_collection`.
+    """
+    
+    generation = 0
+    
+    async def start(self):
+        pass
+    
+    async def close(self):
+        pass
+    
+    @abstractmethod
+    async def ping(self):
+        """Raise if the backend cannot be reached."""
+    
+    @abstractmethod
+    async def upsert_points(self, points: List[PointStruct], wait: bool = True) -> bool:
+        ...
+    
+    @abstractmethod
+    async def search(
+        self,
+        query_vector: List[float],
+        limit: int = 5,
+        score_threshold: float = 0.0,
+        doc_id_filter: Optional[str] = None,
+        with_vectors: bool = False,
+        hydrate: bool = True,
+        raise_errors: bool = False
+    ) -> List[Dict[str, Any]]:
+        """Top ``limit`` hits for ``query_vector``, best first.
+        
+        ``with_vectors`` adds each hit's stored ``vector``. With ``hydrate=False``
+        text and metadata are left for the caller to load from the chunk store.
+        Errors are logged and give no hits, unless ``raise_errors`` is set.
+        """
+    
+    @abstractmethod
+    async def search_batch(self, searches: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Run many searches; results come back in the order of ``searches``.
+        
+        Each search is a dict with ``query_vector`` and optional ``limit``,
+        ``score_threshold`` and ``doc_id_filter``, as in :meth:`search`.
+        """
+    
+    @abstractmethod
+    async def delete_document(self, doc_id: str) -> bool:
+        ...
+    
+    @abstractmethod
+    async def delete_documents(self, doc_ids: List[str]) -> bool:
+        ...
+    
+    @abstractmethod
+    async def delete_all(self) -> bool:
+        ...
+    
+    @abstractmethod
+    async def set_payloads(self, updates: List[Tuple[Union[str, int], Dict[str, Any]]]) -> bool:
+        """Overwrite top-level payload keys of many points."""
+    
+    @abstractmethod
+    async def delete_points(self, point_ids: List[Union[str, int]]) -> bool:
+        ...
+    
+    @abstractmethod
+    async def count_document_chunks(self, doc_id: str) -> int:
+        ...
+    
+    @abstractmethod
+    async def get_document_chunks_page(
+        self,
+        doc_id: str,
+        limit: int = 256,
+        offset: Optional[Union[str, int]] = None,
+        payload_fields: Optional[List[str]] = None,
+        ordered: bool = False
+    ) -> Tuple[List[Dict[str, Any]], Optional[Union[str, int]]]:
+        """Return one page of a document's chunks and the offset of the next page.
+        
+        ``payload_fields`` selects the payload keys to load (all of them by
+        default). With ``ordered=True`` chunks come sorted by ``chunk_index``
+        and the offset is ``"<chunk_index>:<tiebreak>"`` (see
+        :func:`split_ordered_offset`): several points can share a chunk index
+        while a document is being replaced, and the tiebreak tells the next
+        page where to resume among them.
+        """
+    
+    @abstractmethod
+    async def reproject_collection(self, dimension: int, batch_size: int = 256):
+        """Shrink the stored vectors to their first ``dimension`` components, re-normalized."""
+    
+    async def iter_document_chunks(
+        self,
+        doc_id: str,
+        payload_fields: Optional[List[str]] = None,
+        ordered: bool = False,
+        page_size: int = 256
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yield every chunk of a document, one page in memory at a time."""
+        offset = None
+        while True:
+            chunks, offset = await self.get_document_chunks_page(
+                doc_id, page_size, offset, payload_fields, ordered
+            )
+            for chunk in chunks:
+                yield chunk
+            if offset is None:
+                return
+
+
+def create_vector_store() -> VectorStore:
+    backend = settings.vector_store_backend.lower()
+    
+    if backend == "qdrant":
+        from app.core.qdrant_service import QdrantService
+        return QdrantService()
+    
+    if backend == "local":
+        from app.core.local_vector_store import LocalVectorStore
+        return LocalVectorStore(
+            path=settings.local_vector_store_path,
+            dimension=settings.embedding_dimension,
+            dtype=settings.local_vector_store_dtype
+        )
+    
+    raise ValueError(f"Unsupported VECTOR_STORE_BACKEND: {settings.vector_store_backend}")
+
+
+vector_store = create_vector_store()
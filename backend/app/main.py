@@ -6,6 +6,9 @@ from pathlib import Path
 
 from app.core.config import settings
 from app.api.routes import documents, rag, health
+from app.core.vector_store import vector_store
+from app.services.ingestion_service import ingestion_service
+from app.services.document_processor import document_processor
 
 logging.basicConfig(
     level=logging.INFO,
@@ -55,11 +58,16 @@ async def startup_event():
     logger.info(f"Backend running on: {settings.backend_host}:{settings.backend_port}")
     logger.info(f"Qdrant URL: {settings.qdrant_url}")
     logger.info(f"Regolo Model: {settings.regolo_model}")
+    await vector_store.start()
+    await ingestion_service.start()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Shutting down Agentic RAG API...")
+    await ingestion_service.stop()
+    document_processor.shutdown()
+    await vector_store.close()
 
 
 if __name__ == "__main__":
@@ -19,6 +19,46 @@ class DocumentResponse(BaseModel):
     status: str
 
 
+class DocumentChunk(BaseModel):
+    id: str
+    chunk_index: Optional[int] = None
+    text: Optional[str] = None
+    chunk_hash: Optional[str] = None
+    metadata: Optional[Dict[str, Any]] = None
+
+
+class DocumentChunksResponse(BaseModel):
+    doc_id: str
+    chunks: List[DocumentChunk]
+    next_offset: Optional[str] = Field(None, description="Offset of the next page, null on the last page")
+
+
+class JobResponse(BaseModel):
+    job_id: str
+    doc_id: str
+    filename: str
+    status: str = Field(..., description="queued, extracting, embedding, indexing, completed or failed")
+    chunk_count: int = Field(0, description="Total number of chunks, known once extraction is done")
+    chunks_done: int = Field(0, description="Number of chunks embedded so far")
+    duplicate: bool = Field(False, description="True if the upload matched an existing document's content")
+    error: Optional[str] = None
+
+
+class BulkFileResult(BaseModel):
+    filename: str
+    job_id: Optional[str] = None
+    doc_id: Optional[str] = None
+    status: str = Field(..., description="queued, or rejected if the file was not accepted")
+    duplicate: bool = Field(False, description="True if the file matched an existing document's content")
+    error: Optional[str] = None
+
+
+class BulkUploadResponse(BaseModel):
+    accepted: int
+    rejected: int
+    results: List[BulkFileResult]
+
+
 class ChatMessage(BaseModel):
     role: str = Field(..., description="Role of the message (user, assistant, system)")
     content: str = Field(..., description="Content of the message")
@@ -28,6 +68,37 @@ class ChatRequest(BaseModel):
     message: str = Field(..., description="User's message")
     conversation_history: List[ChatMessage] = Field(default_factory=list, description="Previous messages in the conversation")
     top_k: Optional[int] = Field(default=5, description="Number of relevant chunks to retrieve")
+    fetch_factor: Optional[int] = Field(default=None, ge=1, description="Over-fetch top_k * fetch_factor candidates and diversify them with MMR (1 disables)")
+    mmr_lambda: Optional[float] = Field(default=None, ge=0.0, le=1.0, description="MMR trade-off, 1 = pure relevance, 0 = pure diversity")
+    max_chunks_per_doc: Optional[int] = Field(default=None, ge=0, description="Maximum chunks from one document when diversifying (0 = no cap)")
+    
+    def retrieval_options(self) -> Dict[str, Any]:
+        return {
+            "fetch_factor": self.fetch_factor,
+            "mmr_lambda": self.mmr_lambda,
+            "max_chunks_per_doc": self.max_chunks_per_doc
+        }
+
+
+class SearchQuery(BaseModel):
+    query: str = Field(..., description="Search query")
+    top_k: int = Field(default=5, ge=1, description="Number of chunks to return")
+    score_threshold: float = Field(default=0.5, description="Minimum similarity score")
+    doc_id: Optional[str] = Field(default=None, description="Only search this document")
+
+
+class BatchSearchRequest(BaseModel):
+    queries: List[SearchQuery] = Field(..., min_length=1, max_length=100, description="Queries, answered in the same order")
+
+
+class SearchResult(BaseModel):
+    query: str
+    results: List[Dict[str, Any]]
+    count: int
+
+
+class BatchSearchResponse(BaseModel):
+    results: List[SearchResult]
 
 
 class ToolCall(BaseModel):
@@ -58,3 +129,14 @@ class HealthResponse(BaseModel):
 class DeleteResponse(BaseModel):
     success: bool
     message: str
+
+
+class BatchDeleteRequest(BaseModel):
+    doc_ids: List[str] = Field(..., min_length=1, description="Ids of the documents to delete")
+
+
+class BatchDeleteResponse(BaseModel):
+    success: bool
+    message: str
+    deleted: List[str]
+    not_found: List[str]
@@ -0,0 +1,35 @@
+"""Re-project the vector store to EMBEDDING_DIMENSION from its stored vectors.
+
+Usage: python -m app.reproject_collection [--dimension N] [--batch-size N]
+
+Run it with the backend stopped, then start the backend with the same
+EMBEDDING_DIMENSION. If it is interrupted, running it again finishes the
+conversion.
+"""
+import argparse
+import asyncio
+import logging
+
+from app.core.config import settings
+from app.core.vector_store import vector_store
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+
+async def main(dimension: int, batch_size: int):
+    try:
+        await vector_store.reproject_collection(dimension, batch_size)
+    finally:
+        await vector_store.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dimension", type=int, default=settings.embedding_dimension)
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args()
+    
+    asyncio.run(main(args.dimension, args.batch_size))
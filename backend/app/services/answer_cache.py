@@ -0,0 +1,128 @@
+from typing import List, Dict, Any, Optional, Tuple, Hashable, Callable, Awaitable
+import hashlib
+import json
+import logging
+
+import numpy as np
+
+from app.core.cache import AsyncLRUCache
+from app.core.config import settings
+from app.core.document_store import document_store
+from app.services.embedding_service import embedding_service
+
+logger = logging.getLogger(__name__)
+
+
+class AnswerCache:
+    """Cache of full RAG answers in front of the agent.
+    
+    Answers are keyed by the normalized question, a hash of the conversation
+    so far, the retrieval options and the corpus generation of
+    ``DocumentStore``, so an upload or delete makes every older answer
+    unreachable. With a similarity threshold set, a question missing from the
+    cache can also reuse the answer of a question whose embedding is close
+    enough, within the same conversation context.
+    """
+    
+    def __init__(self, max_entries: int = 1024, ttl: float = 900.0, similarity_threshold: float = 0.0):
+        self.cache = AsyncLRUCache(name="answers", max_entries=max_entries, ttl=ttl)
+        self.similarity_threshold = similarity_threshold
+        self.semantic_hits = 0
+        
+        # (context hash, options, generation) -> keys and unit query vectors of the cached answers
+        self._index: Dict[Hashable, List[Tuple[Hashable, np.ndarray]]] = {}
+        self._index_generation = 0
+    
+    @staticmethod
+    def context_hash(conversation_history: List[Dict[str, Any]]) -> str:
+        turns = [(msg["role"], msg["content"]) for msg in conversation_history]
+        return hashlib.sha256(json.dumps(turns).encode("utf-8")).hexdigest()
+    
+    async def get_or_answer(
+        self,
+        query: str,
+        conversation_history: List[Dict[str, Any]],
+        options: Dict[str, Any],
+        answer: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """Return the cached answer for ``query``, or compute it with ``answer`` and cache it.
+        
+        Concurrent identical questions share one call to ``answer``. Answers
+        flagged with ``tool_error`` were given without the documents, so
+        they are returned but never cached.
+        """
+        generation = document_store.generation
+        scope = (self.context_hash(conversation_history), tuple(sorted(options.items())), generation)
+        key = (embedding_service.normalize_query(query), scope)
+        
+        if not self.similarity_threshold or key in self.cache:
+            return await self.cache.get_or_load(key, answer, self._cacheable)
+        
+        query_vector = await self._query_vector(query)
+        similar = self._find_similar(scope, query_vector)
+        if similar is not None:
+            self.semantic_hits += 1
+            logger.info(f"Answer cache: semantic hit for '{query}'")
+            return similar
+        
+        result = await self.cache.get_or_load(key, answer, self._cacheable)
+        self._remember(scope, key, query_vector)
+        return result
+    
+    @staticmethod
+    def _cacheable(result: Dict[str, Any]) -> bool:
+        return not result.get("tool_error")
+    
+    async def _query_vector(self, query: str) -> np.ndarray:
+        vector = np.asarray(await embedding_service.generate_query_embedding(query), dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+    
+    def _find_similar(self, scope: Hashable, query_vector: np.ndarray) -> Optional[Dict[str, Any]]:
+        # Entries evicted or expired from the LRU are dropped from the index as they are met
+        entries = [(key, vector) for key, vector in self._index.get(scope, []) if key in self.cache]
+        if not entries:
+            self._index.pop(scope, None)
+            return None
+        self._index[scope] = entries
+        
+        similarities = np.stack([vector for _, vector in entries]) @ query_vector
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.similarity_threshold:
+            return None
+        return self.cache.get(entries[best][0])
+    
+    def _remember(self, scope: Hashable, key: Hashable, query_vector: np.ndarray):
+        if key not in self.cache:
+            return
+        
+        generation = scope[2]
+        if generation != self._index_generation:
+            # Answers of older generations can no longer be served
+            self._index = {s: entries for s, entries in self._index.items() if s[2] >= generation}
+            self._index_generation = generation
+        
+        entries = self._index.setdefault(scope, [])
+        if all(existing != key for existing, _ in entries):
+            entries.append((key, query_vector))
+    
+    def stats(self) -> Dict[str, Any]:
+        stats = self.cache.stats()
+        lookups = self.cache.hits + self.cache.misses + self.cache.coalesced + self.semantic_hits
+        
+        stats.update({
+            "semantic_hits": self.semantic_hits,
+            "hit_rate": (self.cache.hits + self.cache.coalesced + self.semantic_hits) / lookups if lookups else 0.0,
+            "similarity_threshold": self.similarity_threshold,
+            "corpus_generation": document_store.generation
+        })
+        return stats
+
+
+answer_cache: Optional[AnswerCache] = None
+
+if settings.answer_cache_enabled:
+    answer_cache = AnswerCache(
+        max_entries=settings.answer_cache_max_entries,
+        ttl=settings.answer_cache_ttl,
+        similarity_threshold=settings.answer_cache_similarity_threshold
+    )
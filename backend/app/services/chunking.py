@@ -1,17 +1,112 @@
-from typing import List, Dict, Any
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from typing import List, Dict, Any, Optional, Tuple
 from app.core.config import settings
+import hashlib
 import logging
+import re
 
 logger = logging.getLogger(__name__)
 
 
+def chunk_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class TextChunker:
+    """Recursive character chunker that works on offsets into the source text.
+    
+    Produces the same chunks as LangChain's ``RecursiveCharacterTextSplitter``
+    with ``keep_separator=True``, ``strip_whitespace=True`` and
+    ``length_function=len``, but as ``(start, end)`` spans: no intermediate
+    strings are built while splitting and merging, and callers slice out
+    only the chunks they actually need.
+    """
+    
+    def __init__(self, chunk_size: int, chunk_overlap: int, separators: List[str]):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = separators
+        self._patterns = {sep: re.compile(re.escape(sep)) for sep in separators if sep}
+    
+    def split_spans(self, text: str) -> List[Tuple[int, int]]:
+        spans: List[Tuple[int, int]] = []
+        self._split(text, 0, len(text), 0, spans)
+        return spans
+    
+    def split_text(self, text: str) -> List[str]:
+        return [text[start:end] for start, end in self.split_spans(text)]
+    
+    def _split(self, text: str, start: int, end: int, level: int, spans: List[Tuple[int, int]]):
+        # Use the first separator present in text[start:end]; pieces that are
+        # still too long are split again with the separators after it
+        separator = self.separators[-1]
+        next_level = len(self.separators)
+        for i in range(level, len(self.separators)):
+            if not self.separators[i]:
+                separator = ""
+                break
+            if text.find(self.separators[i], start, end) != -1:
+                separator = self.separators[i]
+                next_level = i + 1
+                break
+        
+        if separator:
+            # Each piece starts with the separator that precedes it
+            bounds = [start]
+            bounds.extend(match.start() for match in self._patterns[separator].finditer(text, start, end))
+            bounds.append(end)
+            pieces = [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+        else:
+            pieces = [(pos, pos + 1) for pos in range(start, end)]
+        
+        # Pieces are contiguous, so a run of short ones can be merged by offsets alone
+        short = []
+        for piece_start, piece_end in pieces:
+            if piece_end - piece_start < self.chunk_size:
+                short.append((piece_start, piece_end))
+                continue
+            
+            if short:
+                self._merge(text, short, spans)
+                short = []
+            if next_level >= len(self.separators):
+                spans.append((piece_start, piece_end))
+            else:
+                self._split(text, piece_start, piece_end, next_level, spans)
+        
+        if short:
+            self._merge(text, short, spans)
+    
+    def _merge(self, text: str, pieces: List[Tuple[int, int]], spans: List[Tuple[int, int]]):
+        # pieces[first:i] is the chunk being built, ``total`` its length
+        first = 0
+        total = 0
+        for i, (piece_start, piece_end) in enumerate(pieces):
+            length = piece_end - piece_start
+            if total + length > self.chunk_size and i > first:
+                self._add_span(text, pieces[first][0], pieces[i - 1][1], spans)
+                # Keep the tail of the chunk as overlap for the next one
+                while total > self.chunk_overlap or (total + length > self.chunk_size and total > 0):
+                    total -= pieces[first][1] - pieces[first][0]
+                    first += 1
+            total += length
+        
+        self._add_span(text, pieces[first][0], pieces[-1][1], spans)
+    
+    @staticmethod
+    def _add_span(text: str, start: int, end: int, spans: List[Tuple[int, int]]):
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start < end:
+            spans.append((start, end))
+
+
 class ChunkingService:
     def __init__(self):
-        self.splitter = RecursiveCharacterTextSplitter(
+        self.chunker = TextChunker(
             chunk_size=settings.chunk_size,
             chunk_overlap=settings.chunk_overlap,
-            length_function=len,
             separators=["\n\n", "\n", ". ", " ", ""]
         )
     
@@ -21,30 +116,65 @@ class ChunkingService:
         metadata: Dict[str, Any]
     ) -> List[Dict[str, Any]]:
         try:
-            chunks = self.splitter.split_text(text)
+            spans = self.chunker.split_spans(text)
             
             chunked_documents = []
             
-            for i, chunk in enumerate(chunks):
-                chunk_metadata = metadata.copy()
-                chunk_metadata.update({
-                    "chunk_index": i,
-                    "chunk_size": len(chunk),
-                    "total_chunks": len(chunks)
-                })
-                
+            for i, (start, end) in enumerate(spans):
                 chunked_documents.append({
-                    "text": chunk,
-                    "metadata": chunk_metadata
+                    "text": text[start:end],
+                    "metadata": {
+                        **metadata,
+                        "chunk_index": i,
+                        "chunk_size": end - start,
+                        "total_chunks": len(spans),
+                        "start_offset": start,
+                        "end_offset": end
+                    }
                 })
             
-            logger.info(f"Chunked document into {len(chunks)} chunks")
+            logger.info(f"Chunked document into {len(spans)} chunks")
             return chunked_documents
             
         except Exception as e:
             logger.error(f"Error chunking document: {e}")
             raise
     
+    def chunk_page(
+        self,
+        page_text: str,
+        metadata: Dict[str, Any],
+        page_number: Optional[int] = None,
+        start_index: int = 0,
+        base_offset: int = 0
+    ) -> List[Dict[str, Any]]:
+        """Chunk a single page of a document being ingested incrementally.
+        
+        Chunk indexes continue from ``start_index`` so they stay global to the
+        document. ``start_offset``/``end_offset`` locate each chunk in the page
+        text, shifted by ``base_offset``.
+        """
+        spans = self.chunker.split_spans(page_text)
+        
+        chunked_documents = []
+        for i, (start, end) in enumerate(spans):
+            chunk_metadata = {
+                **metadata,
+                "chunk_index": start_index + i,
+                "chunk_size": end - start,
+                "start_offset": base_offset + start,
+                "end_offset": base_offset + end
+            }
+            if page_number is not None:
+                chunk_metadata["page_number"] = page_number
+            
+            chunked_documents.append({
+                "text": page_text[start:end],
+                "metadata": chunk_metadata
+            })
+        
+        return chunked_documents
+    
     def chunk_with_page_numbers(
         self,
         pages: List[tuple],
@@ -59,7 +189,7 @@ class ChunkingService:
                 if not page_text.strip():
                     continue
                 
-                chunks = self.splitter.split_text(page_text)
+                chunks = self.chunker.split_text(page_text)
                 
                 for chunk in chunks:
                     chunked_documents.append({
@@ -1,6 +1,13 @@
 import os
+import codecs
+import asyncio
 import logging
-from typing import Dict, Any, List
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple, Union
+import aiofiles
 import pypdf
 import docx
 import pdfplumber
@@ -9,10 +16,171 @@ from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+TXT_BLOCK_SIZE = 1024 * 1024
+
+
+def _count_pdf_pages(file_path: str) -> int:
+    return len(pypdf.PdfReader(file_path).pages)
+
+
+def _extract_pdf_pages(file_path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """Extract pages [start, end) of a PDF as (page_number, text) pairs, 1-based."""
+    pages = []
+    
+    try:
+        with pdfplumber.open(file_path, pages=list(range(start + 1, end + 1))) as pdf:
+            for page in pdf.pages:
+                page_text = page.extract_text()
+                if page_text:
+                    pages.append((page.page_number, page_text))
+    except Exception as e:
+        logger.warning(f"pdfplumber failed on pages {start + 1}-{end}, trying pypdf: {e}")
+    
+    if not pages:
+        pdf_reader = pypdf.PdfReader(file_path)
+        for i in range(start, end):
+            page_text = pdf_reader.pages[i].extract_text()
+            if page_text:
+                pages.append((i + 1, page_text))
+    
+    return pages
+
+
+def _extract_file(file_path: str, filename: str, file_type: str) -> str:
+    with open(file_path, "rb") as f:
+        file_content = f.read()
+    return DocumentProcessor().extract_text(file_content, filename, file_type)
+
 
 class DocumentProcessor:
     def __init__(self):
         self.supported_types = ['pdf', 'docx', 'txt']
+        self._executor: Optional[ProcessPoolExecutor] = None
+    
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=settings.extraction_workers or os.cpu_count(),
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+    
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+    
+    async def iter_pages(
+        self,
+        file_path: Union[str, Path],
+        filename: str,
+        file_type: str
+    ) -> AsyncIterator[Tuple[Optional[int], str]]:
+        """Yield ``(page_number, text)`` pieces of a document in order.
+        
+        PDFs are parsed in page ranges in the process pool, with only a
+        bounded number of ranges in flight. Text files are read in blocks
+        cut at paragraph boundaries. Pieces without pages use ``None``.
+        """
+        file_path = str(file_path)
+        
+        try:
+            if file_type == 'pdf':
+                pages = self._iter_pdf_pages(file_path)
+            elif file_type == 'txt':
+                pages = self._iter_txt_blocks(file_path)
+            else:
+                pages = self._iter_whole_file(file_path, filename, file_type)
+            
+            async for page in pages:
+                yield page
+                
+        except Exception as e:
+            logger.error(f"Error processing {filename}: {e}")
+            raise
+    
+    async def _iter_pdf_pages(self, file_path: str) -> AsyncIterator[Tuple[Optional[int], str]]:
+        loop = asyncio.get_running_loop()
+        page_count = await loop.run_in_executor(self.executor, _count_pdf_pages, file_path)
+        step = settings.pdf_pages_per_task
+        max_in_flight = settings.extraction_workers or os.cpu_count()
+        
+        pending = deque()
+        extracted_any = False
+        
+        for start in range(0, page_count, step):
+            pending.append(loop.run_in_executor(
+                self.executor, _extract_pdf_pages, file_path, start, min(start + step, page_count)
+            ))
+            if len(pending) >= max_in_flight:
+                for page in await pending.popleft():
+                    extracted_any = True
+                    yield page
+        
+        # Ranges are awaited in submission order, so pages come out in page order
+        while pending:
+            for page in await pending.popleft():
+                extracted_any = True
+                yield page
+        
+        if not extracted_any:
+            raise ValueError("No text could be extracted from PDF")
+    
+    async def _iter_txt_blocks(self, file_path: str) -> AsyncIterator[Tuple[Optional[int], str]]:
+        # Validate the whole file as UTF-8 first, so the latin-1 fallback
+        # applies to the entire file as it does in _extract_from_txt
+        encoding = 'utf-8'
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        try:
+            async with aiofiles.open(file_path, 'rb') as f:
+                while block := await f.read(TXT_BLOCK_SIZE):
+                    decoder.decode(block)
+                decoder.decode(b'', final=True)
+        except UnicodeDecodeError:
+            encoding = 'latin-1'
+        
+        decoder = codecs.getincrementaldecoder(encoding)()
+        pending = ""
+        extracted_any = False
+        
+        async with aiofiles.open(file_path, 'rb') as f:
+            while True:
+                block = await f.read(TXT_BLOCK_SIZE)
+                pending += decoder.decode(block, final=not block)
+                
+                if block:
+                    # Prefer paragraph breaks so blocks split where the chunker would
+                    cut = pending.rfind("\n\n")
+                    if cut <= 0:
+                        cut = pending.rfind("\n")
+                    if cut <= 0:
+                        cut = len(pending)
+                    text, pending = pending[:cut], pending[cut:]
+                else:
+                    text, pending = pending, ""
+                
+                if text.strip():
+                    extracted_any = True
+                    yield None, text
+                
+                if not block:
+                    break
+        
+        if not extracted_any:
+            raise ValueError("Text file is empty")
+    
+    async def _iter_whole_file(
+        self,
+        file_path: str,
+        filename: str,
+        file_type: str
+    ) -> AsyncIterator[Tuple[Optional[int], str]]:
+        loop = asyncio.get_running_loop()
+        text = await loop.run_in_executor(
+            self.executor, _extract_file, file_path, filename, file_type
+        )
+        yield None, text
     
     def extract_text(self, file_content: bytes, filename: str, file_type: str) -> str:
         try:
@@ -107,9 +275,11 @@ class DocumentProcessor:
         
         return ext
     
-    def validate_file_size(self, file_size: int) -> bool:
-        if file_size > settings.max_file_size:
-            raise ValueError(f"File too large. Maximum size: {settings.max_file_size / (1024*1024):.0f}MB")
+    def validate_file_size(self, file_size: int, max_size: Optional[int] = None) -> bool:
+        if max_size is None:
+            max_size = settings.max_file_size
+        if file_size > max_size:
+            raise ValueError(f"File too large. Maximum size: {max_size / (1024*1024):.0f}MB")
         return True
 
 
@@ -1,12 +1,31 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from qdrant_client.models import PointStruct
 from app.core.regolo_service import regolo_service
+from app.core.embedding_cache import embedding_cache
+from app.core.chunk_store import chunk_store
+from app.core.cache import AsyncLRUCache
+from app.services.chunking import chunk_hash
 from app.core.config import settings
+from array import array
+import asyncio
 import logging
+import math
 
 logger = logging.getLogger(__name__)
 
 
+def truncate_embedding(embedding: List[float], dimension: int) -> List[float]:
+    """Keep the first ``dimension`` components of a Matryoshka embedding, re-normalized."""
+    if len(embedding) < dimension:
+        raise ValueError(f"Cannot truncate a {len(embedding)}-dim embedding to {dimension} dimensions")
+    
+    truncated = list(embedding[:dimension])
+    norm = math.hypot(*truncated)
+    if norm == 0:
+        return truncated
+    return [value / norm for value in truncated]
+
+
 class EmbeddingService:
     def __init__(self):
         self.embedding_model = settings.regolo_embedding_model
@@ -14,68 +33,160 @@ class EmbeddingService:
     async def generate_embeddings(
         self,
         texts: List[str],
-        batch_size: int = 10
+        batch_size: Optional[int] = None
     ) -> List[List[float]]:
-        embeddings = []
+        # Full-size vectors are cached, so changing the dimension keeps the cache valid
+        embeddings = await self._generate_full_embeddings(texts, batch_size)
+        return [truncate_embedding(embedding, settings.embedding_dimension) for embedding in embeddings]
+    
+    async def _generate_full_embeddings(
+        self,
+        texts: List[str],
+        batch_size: Optional[int] = None
+    ) -> List[List[float]]:
+        if embedding_cache is None:
+            return await self._generate_uncached_embeddings(texts, batch_size)
         
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i + batch_size]
-            try:
-                batch_embeddings = await self._generate_batch_embeddings(batch)
-                embeddings.extend(batch_embeddings)
-            except Exception as e:
-                logger.error(f"Error generating embeddings for batch {i//batch_size}: {e}")
-                raise
+        text_hashes = [embedding_cache.hash_text(text) for text in texts]
+        # SQLite calls block, so they run in a worker thread
+        cached = await asyncio.to_thread(embedding_cache.get_many, text_hashes, self.embedding_model)
+        
+        # Only texts missing from the cache go to the API, each one once
+        missing = {
+            text_hash: text
+            for text_hash, text in zip(text_hashes, texts)
+            if text_hash not in cached
+        }
+        
+        if missing:
+            new_embeddings = await self._generate_uncached_embeddings(
+                list(missing.values()), batch_size
+            )
+            await asyncio.to_thread(embedding_cache.put_many, list(missing), new_embeddings, self.embedding_model)
+            cached.update(zip(missing, new_embeddings))
+        
+        logger.info(f"Embedding cache: {len(texts) - len(missing)} hits, {len(missing)} misses")
+        return [cached[text_hash] for text_hash in text_hashes]
+    
+    async def _generate_uncached_embeddings(
+        self,
+        texts: List[str],
+        batch_size: Optional[int] = None
+    ) -> List[List[float]]:
+        if batch_size is None:
+            batch_size = settings.embedding_batch_size
+        
+        batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+        semaphore = asyncio.Semaphore(settings.embedding_max_concurrency)
+        
+        async def run_batch(batch_index: int, batch: List[str]) -> List[List[float]]:
+            async with semaphore:
+                try:
+                    return await self._generate_batch_embeddings(batch)
+                except Exception as e:
+                    logger.error(f"Error generating embeddings for batch {batch_index}: {e}")
+                    raise
+        
+        # gather() preserves the order of its arguments, so batches come back in input order
+        results = await asyncio.gather(
+            *(run_batch(i, batch) for i, batch in enumerate(batches))
+        )
         
-        logger.info(f"Generated {len(embeddings)} embeddings")
+        embeddings = [embedding for batch_embeddings in results for embedding in batch_embeddings]
+        
+        logger.info(f"Generated {len(embeddings)} embeddings in {len(batches)} batches")
         return embeddings
     
     async def _generate_batch_embeddings(self, texts: List[str]) -> List[List[float]]:
-        embeddings = []
+        embeddings = await regolo_service.generate_embeddings(texts)
         
-        for text in texts:
-            try:
-                embedding = await regolo_service.generate_embedding(text)
-                embeddings.append(embedding)
-            except Exception as e:
-                logger.error(f"Error generating embedding for text: {e}")
-                raise
+        if len(embeddings) != len(texts):
+            raise ValueError(
+                f"Embedding API returned {len(embeddings)} vectors for {len(texts)} inputs"
+            )
         
         return embeddings
     
     async def create_qdrant_points(
         self,
-        doc_id: str,
+        doc_id: Optional[str],
         chunks: List[Dict[str, Any]]
     ) -> List[PointStruct]:
+        """Embed chunks and build their points.
+        
+        With ``doc_id=None`` each chunk's ``metadata["doc_id"]`` is used, so one
+        call can cover chunks of several documents.
+        """
         import uuid
         texts = [chunk["text"] for chunk in chunks]
         embeddings = await self.generate_embeddings(texts)
         
+        # Text and metadata go to the chunk store, payloads keep only what filters need
         points = []
+        entries = []
         for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
             point = PointStruct(
                 id=str(uuid.uuid4()),
                 vector=embedding,
                 payload={
-                    "text": chunk["text"],
-                    "doc_id": doc_id,
+                    "doc_id": doc_id or chunk["metadata"]["doc_id"],
                     "chunk_index": chunk["metadata"].get("chunk_index", i),
-                    "metadata": chunk["metadata"]
+                    "chunk_hash": chunk_hash(chunk["text"])
                 }
             )
             points.append(point)
+            entries.append((point.id, point.payload["doc_id"], chunk["text"], chunk["metadata"]))
+        
+        chunk_store.put_many(entries)
         
         logger.info(f"Created {len(points)} Qdrant points")
         return points
     
     async def generate_query_embedding(self, query: str) -> List[float]:
-        try:
-            embedding = await regolo_service.generate_embedding(query)
-            return embedding
-        except Exception as e:
-            logger.error(f"Error generating query embedding: {e}")
-            raise
+        key = (self.embedding_model, self.normalize_query(query))
+        
+        async def load() -> array:
+            try:
+                embedding = await regolo_service.generate_embedding(query)
+                return array("f", truncate_embedding(embedding, settings.embedding_dimension))
+            except Exception as e:
+                logger.error(f"Error generating query embedding: {e}")
+                raise
+        
+        embedding = await query_embedding_cache.get_or_load(key, load)
+        return embedding.tolist()
+    
+    async def generate_query_embeddings(self, queries: List[str]) -> List[List[float]]:
+        """Embed many queries, sending the ones missing from the query cache in bounded batches."""
+        keys = [(self.embedding_model, self.normalize_query(query)) for query in queries]
+        embeddings = {key: query_embedding_cache.get(key) for key in keys}
+        
+        missing = {key: query for key, query in zip(keys, queries) if embeddings[key] is None}
+        if missing:
+            try:
+                new_embeddings = await self._generate_uncached_embeddings(list(missing.values()))
+            except Exception as e:
+                logger.error(f"Error generating query embeddings: {e}")
+                raise
+            
+            for key, embedding in zip(missing, new_embeddings):
+                embeddings[key] = array("f", truncate_embedding(embedding, settings.embedding_dimension))
+                query_embedding_cache.set(key, embeddings[key])
+        
+        logger.info(f"Query embeddings: {len(set(keys)) - len(missing)} cached, {len(missing)} generated")
+        return [embeddings[key].tolist() for key in keys]
+    
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        return " ".join(query.split()).casefold()
+
 
+query_embedding_cache = AsyncLRUCache(
+    name="query_embeddings",
+    max_entries=settings.query_cache_max_entries,
+    max_bytes=settings.query_cache_max_bytes,
+    ttl=settings.query_cache_ttl,
+    size_of=lambda embedding: embedding.itemsize * len(embedding)
+)
 
 embedding_service = EmbeddingService()
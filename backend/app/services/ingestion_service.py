@@ -0,0 +1,677 @@
+from typing import AsyncIterator, Awaitable, Callable, List, Dict, Any, Optional, Tuple
+from datetime import datetime
+from pathlib import Path, PurePosixPath
+import asyncio
+import hashlib
+import logging
+import tarfile
+import uuid
+import zipfile
+
+import aiofiles
+from fastapi import UploadFile
+from qdrant_client.models import PointStruct
+
+from app.services.document_processor import document_processor
+from app.services.chunking import chunking_service, chunk_hash
+from app.services.embedding_service import embedding_service
+from app.services.pipeline import buffered, batched
+from app.core.vector_store import vector_store
+from app.core.chunk_store import chunk_store
+from app.core.document_store import document_store
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+STATUS_QUEUED = "queued"
+STATUS_EXTRACTING = "extracting"
+STATUS_EMBEDDING = "embedding"
+STATUS_INDEXING = "indexing"
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+STATUS_REJECTED = "rejected"
+
+PENDING_STATUSES = [STATUS_QUEUED, STATUS_EXTRACTING, STATUS_EMBEDDING, STATUS_INDEXING]
+
+# Job modes: fresh documents, new versions of indexed documents, and jobs
+# interrupted by a restart, which are rebuilt from scratch
+MODE_INGEST = "ingest"
+MODE_REPLACE = "replace"
+MODE_RESUME = "resume"
+
+SPOOL_BLOCK_SIZE = 1024 * 1024
+
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+
+
+class IngestionService:
+    """Runs the document ingestion pipeline on a bounded pool of background workers.
+    
+    Uploads are spooled to ``settings.upload_dir`` before being queued, so
+    jobs left unfinished by a restart are picked up again on startup. Each
+    queued job is a list of documents that share one pipeline run, so bulk
+    uploads pack embedding batches and upserts across document boundaries.
+    """
+    
+    def __init__(self):
+        self.upload_dir = Path(settings.upload_dir)
+        self.num_workers = settings.ingestion_workers
+        self.queue: Optional[asyncio.Queue] = None
+        self.workers: List[asyncio.Task] = []
+        # Records of indexed documents with a queued replacement, restored if it fails
+        self._previous_versions: Dict[str, Dict[str, Any]] = {}
+    
+    def get_upload_path(self, doc_id: str, file_type: str) -> Path:
+        return self.upload_dir / f"{doc_id}.{file_type}"
+    
+    async def start(self):
+        self.upload_dir.mkdir(parents=True, exist_ok=True)
+        self.queue = asyncio.Queue()
+        
+        pending = [doc["id"] for doc in document_store.get_documents_by_status(PENDING_STATUSES)]
+        if pending:
+            self.queue.put_nowait((pending, MODE_RESUME))
+            logger.info(f"Re-queued {len(pending)} unfinished ingestion jobs")
+        
+        self.workers = [
+            asyncio.create_task(self._worker(i))
+            for i in range(self.num_workers)
+        ]
+        logger.info(f"Started {self.num_workers} ingestion workers")
+    
+    async def stop(self):
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+    
+    async def submit(self, file: UploadFile) -> Dict[str, Any]:
+        doc = await self._register(file.filename, file.read)
+        
+        if not doc["duplicate"]:
+            await self.queue.put(([doc["id"]], MODE_INGEST))
+            logger.info(f"Queued ingestion job: {doc['filename']} (ID: {doc['id']})")
+        
+        return doc
+    
+    async def submit_bulk(self, files: List[UploadFile]) -> List[Dict[str, Any]]:
+        """Register many files, expanding zip/tar archives, as one shared ingestion job.
+        
+        Returns one result per file with either the queued document id or the
+        reason the file was rejected.
+        """
+        results = []
+        
+        try:
+            for file in files:
+                if file.filename.lower().endswith(ARCHIVE_SUFFIXES):
+                    await self._register_archive(file, results)
+                else:
+                    self._check_bulk_limit(len(results) + 1)
+                    results.append(await self._try_register(file.filename, file.read))
+        except Exception:
+            for result in results:
+                if result["doc_id"] and not result["duplicate"]:
+                    self._discard(result["doc_id"])
+            raise
+        
+        doc_ids = [
+            result["doc_id"] for result in results
+            if result["doc_id"] and not result["duplicate"]
+        ]
+        if doc_ids:
+            await self.queue.put((doc_ids, MODE_INGEST))
+            logger.info(f"Queued bulk ingestion job with {len(doc_ids)} documents")
+        
+        return results
+    
+    async def submit_replace(self, doc: Dict[str, Any], file: UploadFile) -> Dict[str, Any]:
+        """Queue a new version of an indexed document.
+        
+        Unchanged chunks keep their existing points and vectors; only new
+        chunks are embedded, and chunks that disappeared are deleted. The
+        current version stays searchable until the new one is fully indexed,
+        and is kept if the replacement fails.
+        """
+        doc_id = doc["id"]
+        file_type = document_processor.get_file_type(file.filename)
+        upload_path = self.get_upload_path(doc_id, file_type)
+        
+        try:
+            file_size, content_hash = await self._spool(file.read, upload_path, settings.max_file_size)
+        except Exception:
+            upload_path.unlink(missing_ok=True)
+            raise
+        
+        if content_hash == doc["content_hash"]:
+            upload_path.unlink(missing_ok=True)
+            logger.info(f"Replacement of {doc_id} is identical to the current version")
+            return {**doc, "duplicate": True}
+        
+        doc_data = {
+            "id": doc_id,
+            "filename": file.filename,
+            "file_type": file_type,
+            "file_size": file_size,
+            "uploaded_at": datetime.now().isoformat(),
+            "status": STATUS_QUEUED,
+            "content_hash": content_hash,
+            "metadata": {
+                "doc_id": doc_id,
+                "file_type": file_type
+            }
+        }
+        
+        if not document_store.update_file(doc_data):
+            upload_path.unlink(missing_ok=True)
+            raise RuntimeError("Failed to register replacement job")
+        
+        if doc["status"] == STATUS_COMPLETED:
+            self._previous_versions[doc_id] = doc
+        await self.queue.put(([doc_id], MODE_REPLACE))
+        logger.info(f"Queued replacement job: {file.filename} (ID: {doc_id})")
+        
+        return {**document_store.get_document(doc_id), "duplicate": False}
+    
+    async def _try_register(
+        self,
+        filename: str,
+        read: Callable[[int], Awaitable[bytes]]
+    ) -> Dict[str, Any]:
+        try:
+            doc = await self._register(filename, read)
+            return {
+                "filename": filename,
+                "doc_id": doc["id"],
+                "status": doc["status"],
+                "duplicate": doc["duplicate"],
+                "error": None
+            }
+        except ValueError as e:
+            return {
+                "filename": filename,
+                "doc_id": None,
+                "status": STATUS_REJECTED,
+                "duplicate": False,
+                "error": str(e)
+            }
+    
+    @staticmethod
+    def _check_bulk_limit(file_count: int):
+        if file_count > settings.max_bulk_files:
+            raise ValueError(f"Too many files. Maximum per bulk upload: {settings.max_bulk_files}")
+    
+    async def _register_archive(self, file: UploadFile, results: List[Dict[str, Any]]):
+        """Register the members of a zip/tar archive, appending one result per member to ``results``.
+        
+        The bulk file limit is enforced before any member is spooled: up
+        front from the zip directory, member by member for tar streams.
+        """
+        archive_path = self.upload_dir / f"{uuid.uuid4()}.archive"
+        
+        try:
+            await self._spool(file.read, archive_path, settings.max_archive_size)
+        except ValueError as e:
+            archive_path.unlink(missing_ok=True)
+            results.append({
+                "filename": file.filename,
+                "doc_id": None,
+                "status": STATUS_REJECTED,
+                "duplicate": False,
+                "error": str(e)
+            })
+            return
+        
+        try:
+            if zipfile.is_zipfile(archive_path):
+                with zipfile.ZipFile(archive_path) as archive:
+                    members = [member for member in archive.infolist() if not member.is_dir()]
+                    self._check_bulk_limit(len(results) + len(members))
+                    for member in members:
+                        with archive.open(member) as f:
+                            results.append(await self._try_register_member(member.filename, f))
+            else:
+                with tarfile.open(archive_path) as archive:
+                    for member in archive:
+                        if not member.isfile():
+                            continue
+                        self._check_bulk_limit(len(results) + 1)
+                        f = archive.extractfile(member)
+                        results.append(await self._try_register_member(member.name, f))
+        except (zipfile.BadZipFile, tarfile.TarError) as e:
+            results.append({
+                "filename": file.filename,
+                "doc_id": None,
+                "status": STATUS_REJECTED,
+                "duplicate": False,
+                "error": f"Invalid archive: {e}"
+            })
+        finally:
+            archive_path.unlink(missing_ok=True)
+    
+    async def _try_register_member(self, member_name: str, f) -> Dict[str, Any]:
+        # Only the base name is kept: archive paths never reach the filesystem
+        filename = PurePosixPath(member_name).name
+        return await self._try_register(
+            filename,
+            lambda size: asyncio.to_thread(f.read, size)
+        )
+    
+    async def _register(
+        self,
+        filename: str,
+        read: Callable[[int], Awaitable[bytes]]
+    ) -> Dict[str, Any]:
+        """Validate, spool and record one file as a queued document.
+        
+        If a document with identical content already exists it is returned
+        instead, flagged with ``duplicate``, and nothing new is queued.
+        """
+        doc_id = str(uuid.uuid4())
+        file_type = document_processor.get_file_type(filename)
+        upload_path = self.get_upload_path(doc_id, file_type)
+        
+        try:
+            file_size, content_hash = await self._spool(read, upload_path, settings.max_file_size)
+        except Exception:
+            upload_path.unlink(missing_ok=True)
+            raise
+        
+        existing = document_store.get_document_by_content_hash(content_hash)
+        if existing:
+            upload_path.unlink(missing_ok=True)
+            logger.info(f"Duplicate upload of {filename}, reusing document {existing['id']}")
+            return {**existing, "duplicate": True}
+        
+        doc_data = {
+            "id": doc_id,
+            "filename": filename,
+            "file_type": file_type,
+            "file_size": file_size,
+            "uploaded_at": datetime.now().isoformat(),
+            "chunk_count": 0,
+            "status": STATUS_QUEUED,
+            "content_hash": content_hash,
+            "metadata": {
+                "doc_id": doc_id,
+                "file_type": file_type
+            }
+        }
+        
+        if not document_store.add_document(doc_data):
+            upload_path.unlink(missing_ok=True)
+            raise RuntimeError("Failed to register ingestion job")
+        
+        return {**document_store.get_document(doc_id), "duplicate": False}
+    
+    def discard_uploads(self, doc_ids: List[str]):
+        """Remove the spooled files of deleted documents.
+        
+        Jobs skip documents deleted while queued, so their files would
+        otherwise stay in the upload directory.
+        """
+        for doc_id in doc_ids:
+            for path in self.upload_dir.glob(f"{doc_id}.*"):
+                path.unlink(missing_ok=True)
+    
+    def _discard(self, doc_id: str):
+        doc = document_store.get_document(doc_id)
+        if doc:
+            self.get_upload_path(doc_id, doc["file_type"]).unlink(missing_ok=True)
+            document_store.delete_document(doc_id)
+    
+    async def _spool(
+        self,
+        read: Callable[[int], Awaitable[bytes]],
+        upload_path: Path,
+        max_size: int
+    ) -> Tuple[int, str]:
+        """Copy an upload to disk block by block, enforcing the size limit as it goes.
+        
+        Returns the file size and the sha256 of its content.
+        """
+        file_size = 0
+        content_hash = hashlib.sha256()
+        
+        async with aiofiles.open(upload_path, "wb") as f:
+            while block := await read(SPOOL_BLOCK_SIZE):
+                file_size += len(block)
+                document_processor.validate_file_size(file_size, max_size)
+                content_hash.update(block)
+                await f.write(block)
+        
+        return file_size, content_hash.hexdigest()
+    
+    async def _worker(self, worker_id: int):
+        while True:
+            doc_ids, mode = await self.queue.get()
+            try:
+                await self._process(doc_ids, mode)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ingestion worker {worker_id} failed on job {doc_ids}: {e}")
+            finally:
+                self.queue.task_done()
+    
+    async def _process(self, doc_ids: List[str], mode: str):
+        docs = []
+        previous_versions = {}
+        for doc_id in doc_ids:
+            previous_versions[doc_id] = self._previous_versions.pop(doc_id, None)
+            doc = document_store.get_document(doc_id)
+            if doc is None:
+                logger.info(f"Skipping ingestion of deleted document: {doc_id}")
+                continue
+            
+            if mode == MODE_RESUME:
+                # Interrupted by a restart: drop whatever was already indexed
+                await vector_store.delete_document(doc_id)
+            
+            docs.append(doc)
+        
+        progress = {
+            doc["id"]: {
+                "chunks_total": None,
+                "chunks_done": 0,
+                "status": STATUS_QUEUED,
+                "error": None,
+                "replace": mode == MODE_REPLACE,
+                "previous": previous_versions[doc["id"]],
+                "new_points": [],
+                "reused": [],
+                "stale": [],
+                "original_rows": None
+            }
+            for doc in docs
+        }
+        
+        try:
+            await self._ingest(docs, progress)
+        except Exception as e:
+            logger.error(f"Error ingesting documents {list(progress)}: {e}")
+            failed = [
+                doc_id for doc_id, doc_progress in progress.items()
+                if doc_progress["status"] not in (STATUS_COMPLETED, STATUS_FAILED)
+            ]
+            await self._fail(failed, str(e), progress)
+        
+        # Left in place on cancellation so the job can resume after a restart
+        for doc in docs:
+            self.get_upload_path(doc["id"], doc["file_type"]).unlink(missing_ok=True)
+    
+    async def _ingest(self, docs: List[Dict[str, Any]], progress: Dict[str, Dict[str, Any]]):
+        """Stream documents through extraction, chunking, embedding and indexing.
+        
+        Stages are connected by bounded buffers, so memory use does not grow
+        with file size and the first batches become searchable while later
+        pages are still being parsed. Chunks from consecutive documents share
+        embedding batches and upserts.
+        """
+        embed_batch_size = settings.embedding_batch_size * settings.embedding_max_concurrency
+        
+        chunks = buffered(self._chunk_stage(docs, progress), embed_batch_size)
+        points = buffered(
+            self._embed_stage(batched(chunks, embed_batch_size), progress),
+            settings.ingestion_queue_size
+        )
+        
+        try:
+            async for batch in points:
+                batch = await self._drop_deleted(batch, progress)
+                if not batch:
+                    continue
+                
+                batch_doc_ids = {point.payload["doc_id"] for point in batch}
+                for doc_id in batch_doc_ids:
+                    self._set_status(doc_id, STATUS_INDEXING, progress)
+                
+                success = await vector_store.upsert_points(batch)
+                if not success:
+                    raise RuntimeError("Failed to store document in vector database")
+                
+                for point in batch:
+                    progress[point.payload["doc_id"]]["chunks_done"] += 1
+                
+                for doc_id in batch_doc_ids:
+                    document_store.update_progress(doc_id, progress[doc_id]["chunks_done"])
+                    await self._finish_if_done(doc_id, progress)
+        finally:
+            await points.aclose()
+    
+    async def _chunk_stage(
+        self,
+        docs: List[Dict[str, Any]],
+        progress: Dict[str, Dict[str, Any]]
+    ) -> AsyncIterator[Dict[str, Any]]:
+        for doc in docs:
+            doc_id = doc["id"]
+            self._set_status(doc_id, STATUS_EXTRACTING, progress)
+            
+            metadata = {
+                "doc_id": doc_id,
+                "filename": doc["filename"],
+                "file_type": doc["file_type"],
+                "uploaded_at": doc["uploaded_at"],
+                "file_size": doc["file_size"]
+            }
+            upload_path = self.get_upload_path(doc_id, doc["file_type"])
+            
+            existing = {}
+            chunk_index = 0
+            text_offset = 0
+            try:
+                # For a new version, points of the current one indexed by chunk hash
+                if progress[doc_id]["replace"]:
+                    existing = await self._load_existing_chunks(doc_id)
+                
+                async for page_number, page_text in document_processor.iter_pages(
+                    upload_path, doc["filename"], doc["file_type"]
+                ):
+                    # Offsets are relative to the page when there is one, to the whole text otherwise
+                    base_offset = 0 if page_number is not None else text_offset
+                    text_offset += len(page_text)
+                    
+                    for chunk in chunking_service.chunk_page(
+                        page_text, metadata, page_number, chunk_index, base_offset
+                    ):
+                        chunk_index += 1
+                        
+                        points = existing.get(chunk_hash(chunk["text"]))
+                        if not points:
+                            yield chunk
+                            continue
+                        
+                        # Applied once the new chunks are indexed, see _apply_replacement
+                        progress[doc_id]["reused"].append((*points.pop(), chunk))
+                        progress[doc_id]["chunks_done"] += 1
+                
+                progress[doc_id]["stale"] = [point_id for points in existing.values() for point_id, _ in points]
+            
+            except Exception as e:
+                # A broken file fails on its own without stopping the rest of the job
+                logger.error(f"Error extracting document {doc_id}: {e}")
+                progress[doc_id]["error"] = str(e)
+            
+            progress[doc_id]["chunks_total"] = chunk_index
+            await self._finish_if_done(doc_id, progress)
+    
+    async def _load_existing_chunks(self, doc_id: str) -> Dict[str, List[Tuple[Any, Dict[str, Any]]]]:
+        """Map chunk hashes to ``(point_id, payload)`` of the current version's points.
+        
+        The payload holds the fields ``_reuse_points`` rewrites, so that a
+        failed replacement can put them back.
+        """
+        existing: Dict[str, List[Tuple[Any, Dict[str, Any]]]] = {}
+        async for chunk in vector_store.iter_document_chunks(
+            doc_id, payload_fields=["chunk_index", "chunk_hash", "text", "metadata"]
+        ):
+            point_id = chunk.pop("id")
+            # Points indexed before chunk hashes were stored are hashed from their text
+            key = chunk.get("chunk_hash") or chunk_hash(chunk.get("text") or "")
+            existing.setdefault(key, []).append((point_id, chunk))
+        return existing
+    
+    async def _apply_replacement(self, doc_id: str, doc_progress: Dict[str, Any]):
+        """Switch the index over to a new version once all of its new chunks are upserted.
+        
+        Until then the current version's points are left untouched, so a
+        replacement that fails midway only has to remove the new points.
+        From here on the reused points are rewritten, and their chunk store
+        rows are kept first so that ``_fail`` can restore them.
+        """
+        reused = doc_progress["reused"]
+        doc_progress["original_rows"] = chunk_store.get_many([point_id for point_id, _, _ in reused])
+        
+        batch_size = settings.embedding_batch_size
+        for start in range(0, len(reused), batch_size):
+            await self._reuse_points(doc_id, reused[start:start + batch_size])
+        
+        if not await vector_store.delete_points(doc_progress["stale"]):
+            raise RuntimeError("Failed to delete outdated chunks")
+        
+        logger.info(
+            f"Reused {len(reused)} unchanged chunks of document {doc_id}, "
+            f"deleted {len(doc_progress['stale'])} outdated ones"
+        )
+    
+    async def _restore_reused_points(self, doc_id: str, doc_progress: Dict[str, Any]):
+        """Put the payloads and chunk store rows of reused points back as they were."""
+        reused = doc_progress["reused"]
+        original_rows = doc_progress["original_rows"]
+        
+        # Legacy points had no chunk store row, their text was in the payload
+        chunk_store.delete_points([
+            point_id for point_id, _, _ in reused if str(point_id) not in original_rows
+        ])
+        chunk_store.put_many([
+            (point_id, doc_id, row["text"], row["metadata"])
+            for point_id, row in original_rows.items()
+        ])
+        
+        if not await vector_store.set_payloads([(point_id, payload) for point_id, payload, _ in reused]):
+            logger.error(f"Failed to restore the unchanged chunks of document {doc_id}")
+    
+    async def _reuse_points(self, doc_id: str, reused: List[Tuple[Any, Dict[str, Any], Dict[str, Any]]]):
+        """Keep the vectors of unchanged chunks, updating only their position and metadata."""
+        chunk_store.put_many([
+            (point_id, doc_id, chunk["text"], chunk["metadata"])
+            for point_id, _, chunk in reused
+        ])
+        
+        payloads = []
+        for point_id, original, chunk in reused:
+            payload = {"chunk_index": chunk["metadata"]["chunk_index"], "chunk_hash": chunk_hash(chunk["text"])}
+            if original.get("text") is not None:
+                # Cleared so that hits are hydrated from the chunk store
+                payload.update({"text": None, "metadata": None})
+            payloads.append((point_id, payload))
+        
+        if not await vector_store.set_payloads(payloads):
+            raise RuntimeError("Failed to update unchanged chunks")
+    
+    async def _embed_stage(
+        self,
+        chunk_batches: AsyncIterator[List[Dict[str, Any]]],
+        progress: Dict[str, Dict[str, Any]]
+    ) -> AsyncIterator[List[PointStruct]]:
+        async for chunk_batch in chunk_batches:
+            for doc_id in {chunk["metadata"]["doc_id"] for chunk in chunk_batch}:
+                self._set_status(doc_id, STATUS_EMBEDDING, progress)
+            
+            points = await embedding_service.create_qdrant_points(None, chunk_batch)
+            for point in points:
+                doc_progress = progress[point.payload["doc_id"]]
+                if doc_progress["previous"] is not None:
+                    doc_progress["new_points"].append(point.id)
+            
+            yield points
+    
+    async def _drop_deleted(
+        self,
+        batch: List[PointStruct],
+        progress: Dict[str, Dict[str, Any]]
+    ) -> List[PointStruct]:
+        dropped = set()
+        for doc_id in {point.payload["doc_id"] for point in batch}:
+            doc_progress = progress[doc_id]
+            if doc_progress["status"] == STATUS_FAILED:
+                dropped.add(doc_id)
+            elif document_store.get_document(doc_id) is None:
+                logger.info(f"Document deleted during ingestion, discarding: {doc_id}")
+                doc_progress["status"] = STATUS_FAILED
+                await vector_store.delete_document(doc_id)
+                dropped.add(doc_id)
+        
+        if not dropped:
+            return batch
+        
+        # Their text was stored when they were embedded
+        chunk_store.delete_points([point.id for point in batch if point.payload["doc_id"] in dropped])
+        return [point for point in batch if point.payload["doc_id"] not in dropped]
+    
+    def _set_status(self, doc_id: str, status: str, progress: Dict[str, Dict[str, Any]]):
+        doc_progress = progress[doc_id]
+        if doc_progress["status"] in (status, STATUS_COMPLETED, STATUS_FAILED):
+            return
+        doc_progress["status"] = status
+        document_store.update_status(doc_id, status)
+    
+    async def _finish_if_done(self, doc_id: str, progress: Dict[str, Dict[str, Any]]):
+        doc_progress = progress[doc_id]
+        if doc_progress["status"] in (STATUS_COMPLETED, STATUS_FAILED):
+            return
+        if doc_progress["chunks_total"] is None or doc_progress["chunks_done"] < doc_progress["chunks_total"]:
+            return
+        
+        if doc_progress["error"]:
+            await self._fail([doc_id], doc_progress["error"], progress)
+            return
+        
+        if doc_progress["replace"]:
+            try:
+                await self._apply_replacement(doc_id, doc_progress)
+            except Exception as e:
+                logger.error(f"Error replacing document {doc_id}: {e}")
+                await self._fail([doc_id], str(e), progress)
+                return
+        
+        doc_progress["status"] = STATUS_COMPLETED
+        document_store.update_progress(doc_id, doc_progress["chunks_done"], doc_progress["chunks_total"])
+        document_store.update_status(doc_id, STATUS_COMPLETED)
+        logger.info(f"Document ingested successfully: {doc_id}")
+    
+    async def _fail(self, doc_ids: List[str], error: str, progress: Dict[str, Dict[str, Any]]):
+        """Mark documents failed and remove whatever was indexed for them.
+        
+        A failed replacement of an indexed document only removes the points
+        of the new version and restores the points it reused: the current
+        one stays searchable, and its record is restored as completed with
+        the error attached.
+        """
+        removed = []
+        for doc_id in doc_ids:
+            doc_progress = progress[doc_id]
+            doc_progress["status"] = STATUS_FAILED
+            
+            previous = doc_progress["previous"]
+            if previous is None:
+                document_store.update_status(doc_id, STATUS_FAILED, error)
+                removed.append(doc_id)
+                continue
+            
+            if not await vector_store.delete_points(doc_progress["new_points"]):
+                logger.error(f"Failed to remove the new chunks of document {doc_id}")
+            if doc_progress["original_rows"] is not None:
+                await self._restore_reused_points(doc_id, doc_progress)
+            document_store.update_file({**previous, "status": STATUS_COMPLETED})
+            document_store.update_progress(doc_id, previous["chunks_done"], previous["chunk_count"])
+            document_store.update_status(doc_id, STATUS_COMPLETED, error)
+            logger.info(f"Kept the current version of document {doc_id} after its replacement failed")
+        
+        # Batches upserted before the failure would otherwise stay searchable
+        if removed and not await vector_store.delete_documents(removed):
+            logger.error(f"Failed to remove partially indexed documents {removed}")
+
+
+ingestion_service = IngestionService()
@@ -0,0 +1,57 @@
+from typing import AsyncIterator, List, TypeVar
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_DONE = object()
+
+
+async def buffered(source: AsyncIterator[T], maxsize: int) -> AsyncIterator[T]:
+    """Run ``source`` in a background task, buffering at most ``maxsize`` items.
+    
+    Consecutive stages overlap this way while memory stays bounded: once the
+    buffer is full the producing stage waits for the consumer to catch up.
+    Errors raised by ``source`` are re-raised to the consumer.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize)
+    
+    async def produce():
+        try:
+            async for item in source:
+                await queue.put((item, None))
+        except Exception as e:
+            await queue.put((_DONE, e))
+        else:
+            await queue.put((_DONE, None))
+        finally:
+            if hasattr(source, "aclose"):
+                await source.aclose()
+    
+    producer = asyncio.create_task(produce())
+    
+    try:
+        while True:
+            item, error = await queue.get()
+            if item is _DONE:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        producer.cancel()
+        await asyncio.gather(producer, return_exceptions=True)
+
+
+async def batched(source: AsyncIterator[T], size: int) -> AsyncIterator[List[T]]:
+    batch = []
+    async for item in source:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    
+    if batch:
+        yield batch
@@ -1,10 +1,11 @@
 from typing import List, Dict, Any, Optional
-from langchain_core.messages import HumanMessage
+from langchain_core.messages import HumanMessage, ToolMessage
 import logging
 
 from app.agents import create_rag_agent, AgentState
 from app.core.config import settings
 from app.core.document_store import document_store
+from app.services.answer_cache import answer_cache
 
 logger = logging.getLogger(__name__)
 
@@ -17,7 +18,8 @@ class RAGService:
         self,
         query: str,
         conversation_history: Optional[List[Dict[str, Any]]] = None,
-        top_k: Optional[int] = None
+        top_k: Optional[int] = None,
+        retrieval_options: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
         try:
             if conversation_history is None:
@@ -33,65 +35,15 @@ class RAGService:
                     "sources": []
                 }
             
-            # Convert conversation history to LangChain messages
-            messages = []
-            for msg in conversation_history:
-                if msg["role"] == "user":
-                    messages.append(HumanMessage(content=msg["content"]))
-                elif msg["role"] == "assistant":
-                    messages.append({"role": "assistant", "content": msg["content"]})
+            options = {"top_k": top_k, **(retrieval_options or {})}
             
-            # Add current query
-            messages.append(HumanMessage(content=query))
-            
-            # Run agent
-            result = self.agent.invoke({
-                "messages": messages,
-                "retrieved_context": "",
-                "sources": []
-            })
-            
-            # Extract response
-            messages = result["messages"]
-            final_message = messages[-1]
-            
-            # Get the response content
-            if hasattr(final_message, 'content'):
-                response_text = final_message.content
-            else:
-                response_text = str(final_message)
-            
-            # Extract sources if any tool was called
-            sources = []
-            for msg in messages:
-                if hasattr(msg, 'tool_calls') and msg.tool_calls:
-                    for tool_call in msg.tool_calls:
-                        if tool_call.get("name") == "search_documents":
-                            args = tool_call.get("args", {})
-                            # Sources will be embedded in tool responses
-                            pass
-            
-            # Extract sources from tool messages
-            for msg in messages:
-                if hasattr(msg, 'content') and "<metadata_source_" in str(msg.content):
-                    content = str(msg.content)
-                    import re
-                    source_pattern = r'<metadata_source_(\d+)>\nfilename:([^\n]+)\npage:([^\n]+)\nscore:([\d.]+)'
-                    matches = re.findall(source_pattern, content)
-
-                    for source_id, filename, page, score in matches:
-                        if not any(s["filename"] == filename.strip() and s["page"] == page.strip() for s in sources):
-                            sources.append({
-                                "filename": filename.strip(),
-                                "page": page.strip(),
-                                "score": float(score)
-                            })
-            
-            return {
-                "message": response_text,
-                "sources": sources
-            }
+            async def answer() -> Dict[str, Any]:
+                return await self._run_agent(query, conversation_history, retrieval_options)
             
+            if answer_cache is None:
+                return await answer()
+            return await answer_cache.get_or_answer(query, conversation_history, options, answer)
+        
         except Exception as e:
             logger.error(f"Error processing RAG query: {e}")
             logger.exception("Full traceback:")
@@ -99,6 +51,80 @@ class RAGService:
                 "message": f"Si è verificato un errore: {str(e)}",
                 "sources": []
             }
+    
+    async def _run_agent(
+        self,
+        query: str,
+        conversation_history: List[Dict[str, Any]],
+        retrieval_options: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        # Convert conversation history to LangChain messages
+        messages = []
+        for msg in conversation_history:
+            if msg["role"] == "user":
+                messages.append(HumanMessage(content=msg["content"]))
+            elif msg["role"] == "assistant":
+                messages.append({"role": "assistant", "content": msg["content"]})
+        
+        # Add current query
+        messages.append(HumanMessage(content=query))
+        
+        # Run agent, the search tool reads the retrieval options from its config
+        result = await self.agent.ainvoke(
+            {
+                "messages": messages,
+                "retrieved_context": "",
+                "sources": []
+            },
+            config={"configurable": {"retrieval": retrieval_options or {}}}
+        )
+        
+        # Extract response
+        messages = result["messages"]
+        final_message = messages[-1]
+        
+        # Get the response content
+        if hasattr(final_message, 'content'):
+            response_text = final_message.content
+        else:
+            response_text = str(final_message)
+        
+        # Extract sources if any tool was called
+        sources = []
+        for msg in messages:
+            if hasattr(msg, 'tool_calls') and msg.tool_calls:
+                for tool_call in msg.tool_calls:
+                    if tool_call.get("name") == "search_documents":
+                        args = tool_call.get("args", {})
+                        # Sources will be embedded in tool responses
+                        pass
+        
+        # Extract sources from tool messages
+        for msg in messages:
+            if hasattr(msg, 'content') and "<metadata_source_" in str(msg.content):
+                content = str(msg.content)
+                import re
+                source_pattern = r'<metadata_source_(\d+)>\nfilename:([^\n]+)\npage:([^\n]+)\nscore:([\d.]+)'
+                matches = re.findall(source_pattern, content)
+                
+                for source_id, filename, page, score in matches:
+                    if not any(s["filename"] == filename.strip() and s["page"] == page.strip() for s in sources):
+                        sources.append({
+                            "filename": filename.strip(),
+                            "page": page.strip(),
+                            "score": float(score)
+                        })
+        
+        # The LLM still answers after a failed search, but without the documents
+        tool_error = any(isinstance(msg, ToolMessage) and msg.status == "error" for msg in messages)
+        if tool_error:
+            logger.warning(f"Answered '{query}' after a failed tool call")
+        
+        return {
+            "message": response_text,
+            "sources": sources,
+            "tool_error": tool_error
+        }
 
 
 rag_service = RAGService()
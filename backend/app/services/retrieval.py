@@ -0,0 +1,198 @@
+from typing import List, Dict, Any, Optional, Hashable
+import logging
+
+import numpy as np
+
+from app.core.cache import AsyncLRUCache
+from app.core.config import settings
+from app.core.chunk_store import chunk_store
+from app.core.vector_store import VectorStore, vector_store
+from app.services.embedding_service import embedding_service
+
+logger = logging.getLogger(__name__)
+
+# Hit fields kept by the retrieval cache; text and metadata are hydrated again on every hit
+CACHED_HIT_FIELDS = ("id", "score", "doc_id", "chunk_index")
+
+
+class RetrievalCache:
+    """Ids and scores of recent searches, dropped whenever the vector store is written to.
+    
+    Results are only stored if no write happened while they were being
+    computed. Lookups and stores never await, so concurrent searches on the
+    event loop can share the cache without a lock.
+    """
+    
+    def __init__(self, store: VectorStore, max_entries: int = 4096, ttl: float = 600.0):
+        self.store = store
+        self.cache = AsyncLRUCache(name="retrieval", max_entries=max_entries, ttl=ttl)
+        self.invalidations = 0
+        self._generation = store.generation
+    
+    def _check_generation(self):
+        if self.store.generation != self._generation:
+            self.cache.clear()
+            self._generation = self.store.generation
+            self.invalidations += 1
+    
+    def get(self, key: Hashable) -> Optional[List[Dict[str, Any]]]:
+        self._check_generation()
+        cached = self.cache.get(key)
+        if cached is None:
+            self.cache.misses += 1
+            return None
+        self.cache.hits += 1
+        
+        return [
+            {**dict(zip(CACHED_HIT_FIELDS, hit)), "text": None, "metadata": {}}
+            for hit in cached
+        ]
+    
+    def set(self, key: Hashable, hits: List[Dict[str, Any]], generation: int):
+        """Store ``hits``, computed while the store was at ``generation``."""
+        if any(hit.get("text") is not None for hit in hits):
+            # Points indexed before text moved to the chunk store carry it in their payload
+            return
+        
+        self._check_generation()
+        if generation == self._generation:
+            self.cache.set(key, tuple(tuple(hit[field] for field in CACHED_HIT_FIELDS) for hit in hits))
+    
+    def stats(self) -> Dict[str, Any]:
+        stats = self.cache.stats()
+        stats.update({
+            "invalidations": self.invalidations,
+            "store_generation": self.store.generation
+        })
+        return stats
+
+
+def mmr_select(
+    query_vector: List[float],
+    hits: List[Dict[str, Any]],
+    k: int,
+    lambda_mult: float = 0.5,
+    max_per_doc: int = 0
+) -> List[Dict[str, Any]]:
+    """Pick ``k`` hits by maximal marginal relevance, at most ``max_per_doc`` per document.
+    
+    Each step takes the candidate maximizing
+    ``lambda_mult * relevance - (1 - lambda_mult) * max similarity to the picks``.
+    Similarities between all candidates come from a single matrix product.
+    Hits must carry their ``vector``.
+    """
+    if not hits:
+        return []
+    
+    vectors = np.asarray([hit["vector"] for hit in hits], dtype=np.float32)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    query = np.asarray(query_vector, dtype=np.float32)
+    query /= max(float(np.linalg.norm(query)), 1e-12)
+    
+    relevance = vectors @ query
+    similarity = vectors @ vectors.T
+    redundancy = np.zeros(len(hits), dtype=np.float32)
+    available = np.ones(len(hits), dtype=bool)
+    
+    doc_ids = np.array([hit["doc_id"] for hit in hits], dtype=object)
+    per_doc: Dict[Any, int] = {}
+    
+    selected = []
+    while len(selected) < k and available.any():
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        
+        selected.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, similarity[best])
+        
+        doc_id = doc_ids[best]
+        per_doc[doc_id] = per_doc.get(doc_id, 0) + 1
+        if max_per_doc and per_doc[doc_id] >= max_per_doc:
+            available[doc_ids == doc_id] = False
+    
+    return [hits[i] for i in selected]
+
+
+async def retrieve(
+    query: str,
+    top_k: int = 5,
+    score_threshold: float = 0.0,
+    doc_id_filter: Optional[str] = None,
+    fetch_factor: Optional[int] = None,
+    mmr_lambda: Optional[float] = None,
+    max_chunks_per_doc: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """Embed ``query`` and return its top chunks, diversified when ``fetch_factor`` > 1.
+    
+    Diversification over-fetches ``top_k * fetch_factor`` candidates with
+    their vectors and keeps ``top_k`` of them with :func:`mmr_select`; only
+    those are hydrated with their text. Unset options fall back to settings.
+    Repeated searches are answered from the retrieval cache until the next
+    write to the vector store. Search errors are raised, so a failed search
+    is never cached as one without results.
+    """
+    if fetch_factor is None:
+        fetch_factor = settings.retrieval_fetch_factor
+    if mmr_lambda is None:
+        mmr_lambda = settings.retrieval_mmr_lambda
+    if max_chunks_per_doc is None:
+        max_chunks_per_doc = settings.retrieval_max_chunks_per_doc
+    
+    diversify = fetch_factor > 1
+    key = (
+        embedding_service.normalize_query(query),
+        top_k,
+        score_threshold,
+        doc_id_filter,
+        (fetch_factor, mmr_lambda, max_chunks_per_doc) if diversify else None
+    )
+    
+    if retrieval_cache is not None:
+        cached = retrieval_cache.get(key)
+        if cached is not None:
+            return chunk_store.hydrate(cached)
+    
+    generation = vector_store.generation
+    query_embedding = await embedding_service.generate_query_embedding(query)
+    
+    if not diversify:
+        hits = await vector_store.search(
+            query_vector=query_embedding,
+            limit=top_k,
+            score_threshold=score_threshold,
+            doc_id_filter=doc_id_filter,
+            hydrate=False,
+            raise_errors=True
+        )
+    else:
+        candidates = await vector_store.search(
+            query_vector=query_embedding,
+            limit=top_k * fetch_factor,
+            score_threshold=score_threshold,
+            doc_id_filter=doc_id_filter,
+            with_vectors=True,
+            hydrate=False,
+            raise_errors=True
+        )
+        
+        hits = mmr_select(query_embedding, candidates, top_k, mmr_lambda, max_chunks_per_doc)
+        for hit in hits:
+            del hit["vector"]
+        
+        logger.info(f"Diversified {len(candidates)} candidates down to {len(hits)} chunks")
+    
+    if retrieval_cache is not None:
+        retrieval_cache.set(key, hits, generation)
+    return chunk_store.hydrate(hits)
+
+
+retrieval_cache: Optional[RetrievalCache] = None
+
+if settings.retrieval_cache_enabled:
+    retrieval_cache = RetrievalCache(
+        vector_store,
+        max_entries=settings.retrieval_cache_max_entries,
+        ttl=settings.retrieval_cache_ttl
+    )
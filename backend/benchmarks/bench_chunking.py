@@ -0,0 +1,73 @@
+"""Chunking throughput, TextChunker vs LangChain's RecursiveCharacterTextSplitter.
+
+Usage: python -m benchmarks.bench_chunking [--pages N] [--chunk-size N] [--chunk-overlap N] [--rounds N]
+
+Needs langchain-text-splitters, from requirements-dev.txt. Both chunkers
+split the same synthetic pages with the separators the backend uses, and
+their output is compared before timing.
+"""
+import argparse
+import os
+import random
+import time
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+SEPARATORS = ["\n\n", "\n", ". ", " ", ""]
+
+
+def synthetic_page(rng: random.Random) -> str:
+    paragraphs = []
+    for _ in range(rng.randint(3, 8)):
+        sentences = [
+            " ".join(rng.choice(["testo", "documento", "pagina", "ricerca", "privacy", "dati"]) for _ in range(rng.randint(5, 25)))
+            for _ in range(rng.randint(2, 10))
+        ]
+        paragraphs.append(". ".join(sentences) + ".")
+    return "\n\n".join(paragraphs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+    
+    # Only settings are read on import, nothing is contacted
+    os.environ.setdefault("REGOLO_API_KEY", "stub")
+    from app.services.chunking import TextChunker
+    
+    rng = random.Random(0)
+    pages = [synthetic_page(rng) for _ in range(args.pages)]
+    characters = sum(map(len, pages))
+    
+    chunkers = {
+        "langchain": RecursiveCharacterTextSplitter(
+            chunk_size=args.chunk_size,
+            chunk_overlap=args.chunk_overlap,
+            length_function=len,
+            separators=SEPARATORS
+        ),
+        "offsets": TextChunker(args.chunk_size, args.chunk_overlap, SEPARATORS)
+    }
+    
+    outputs = {name: [chunker.split_text(page) for page in pages] for name, chunker in chunkers.items()}
+    if outputs["langchain"] != outputs["offsets"]:
+        raise SystemExit("Chunkers disagree on the benchmark pages")
+    
+    print(f"{'chunker':<12}{'chunks':>10}{'seconds':>10}{'MB/s':>10}")
+    for name, chunker in chunkers.items():
+        best = float("inf")
+        for _ in range(args.rounds):
+            start = time.perf_counter()
+            for page in pages:
+                chunker.split_text(page)
+            best = min(best, time.perf_counter() - start)
+        chunks = sum(map(len, outputs[name]))
+        print(f"{name:<12}{chunks:>10}{best:>10.2f}{characters / best / 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
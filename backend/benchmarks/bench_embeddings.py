@@ -0,0 +1,67 @@
+"""Embedding throughput against a local OpenAI-compatible stub, one request per chunk vs batched.
+
+Usage: python -m benchmarks.bench_embeddings [--chunks N] [--latency S] [--batch-size N] [--concurrency N]
+
+The per-chunk run awaits one embeddings request per text in turn, as
+ingestion did before batching; the batched run goes through
+EmbeddingService with the embedding cache disabled.
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.common import configure_backend
+from benchmarks.openai_stub import BackgroundServer, create_app
+
+DIMENSION = 256
+
+
+async def run(chunks: int, stats: dict):
+    from app.core.regolo_service import regolo_service
+    from app.services.embedding_service import embedding_service
+    
+    texts = [f"Chunk {i}: " + "testo di esempio per il benchmark " * 25 for i in range(chunks)]
+    results = []
+    
+    requests_before = stats["embedding_requests"]
+    start = time.perf_counter()
+    for text in texts:
+        await regolo_service.generate_embedding(text)
+    results.append(("per-chunk", stats["embedding_requests"] - requests_before, time.perf_counter() - start))
+    
+    requests_before = stats["embedding_requests"]
+    start = time.perf_counter()
+    embeddings = await embedding_service.generate_embeddings(texts)
+    results.append(("batched", stats["embedding_requests"] - requests_before, time.perf_counter() - start))
+    assert len(embeddings) == chunks
+    
+    print(f"{'mode':<12}{'requests':>10}{'seconds':>10}{'chunks/s':>12}")
+    for mode, requests, seconds in results:
+        print(f"{mode:<12}{requests:>10}{seconds:>10.2f}{chunks / seconds:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.02, help="stub latency per request, in seconds")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+    
+    app = create_app(dimension=DIMENSION, embedding_latency=args.latency)
+    with tempfile.TemporaryDirectory() as workdir, BackgroundServer(app) as stub:
+        configure_backend(
+            Path(workdir),
+            stub.url,
+            embedding_dimension=DIMENSION,
+            embedding_batch_size=args.batch_size,
+            embedding_max_concurrency=args.concurrency,
+            embedding_cache_enabled=False
+        )
+        asyncio.run(run(args.chunks, app.state.stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Upload throughput and chat latency while large PDFs are being ingested.
+
+Usage: python -m benchmarks.bench_ingestion [--pdfs N] [--pages N] [--chatters N] [--inline-extraction]
+
+Runs the backend in one uvicorn worker against the local OpenAI stub, as
+benchmarks.load_test_chat does. A few clients chat in a loop, first with
+nothing else running, then while the PDFs are uploaded and ingested.
+Chat latency percentiles of both phases show how much parsing stalls the
+event loop. --inline-extraction runs the extraction tasks on the event
+loop instead of the process pool, as uploads did before.
+"""
+import argparse
+import asyncio
+import itertools
+import tempfile
+import time
+from concurrent.futures import Executor, Future
+from pathlib import Path
+from typing import List
+
+import httpx
+
+from benchmarks.common import configure_backend, percentile
+from benchmarks.load_test_chat import DIMENSION, chat, upload_document, wait_for_job
+from benchmarks.openai_stub import BackgroundServer, create_app
+
+
+def write_pdf(path: Path, pages: int, lines_per_page: int = 45):
+    """Write a text-only PDF, with no dependency beyond the standard library."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for page in range(pages):
+        lines = [
+            f"Pagina {page + 1}, riga {line}: il documento descrive la clausola {page * lines_per_page + line} del contratto."
+            for line in range(lines_per_page)
+        ]
+        stream = "BT /F1 9 Tf 11 TL 40 800 Td " + " ".join(f"({line}) '" for line in lines) + " ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream".encode("latin-1"))
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>".encode("latin-1")
+        )
+        page_ids.append(len(objects))
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode("latin-1")
+    
+    body = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, content in enumerate(objects, 1):
+        offsets.append(len(body))
+        body += f"{number} 0 obj\n".encode("latin-1") + content + b"\nendobj\n"
+    xref = len(body)
+    body += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    body += b"".join(f"{offset:010d} 00000 n \n".encode("latin-1") for offset in offsets)
+    body += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    path.write_bytes(bytes(body))
+
+
+class InlineExecutor(Executor):
+    """Runs each task in the submitting thread, i.e. on the event loop."""
+    
+    def submit(self, fn, *args, **kwargs) -> Future:
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+async def chat_loop(client: httpx.AsyncClient, name: str, stop: asyncio.Event, latencies: List[float]):
+    for i in itertools.count():
+        if stop.is_set():
+            return
+        latencies.append(await chat(client, f"{name}-{i}: cosa prevede la clausola {i}?"))
+
+
+async def measure_chats(client: httpx.AsyncClient, chatters: int, phase: str, work) -> List[float]:
+    latencies: List[float] = []
+    stop = asyncio.Event()
+    loops = [asyncio.create_task(chat_loop(client, f"{phase}{i}", stop, latencies)) for i in range(chatters)]
+    try:
+        await work()
+    finally:
+        stop.set()
+        await asyncio.gather(*loops)
+    return latencies
+
+
+async def run(backend_url: str, pdfs: List[Path], chatters: int, idle_seconds: float):
+    async with httpx.AsyncClient(base_url=backend_url, timeout=600) as client:
+        await upload_document(client)
+        
+        idle = await measure_chats(client, chatters, "idle", lambda: asyncio.sleep(idle_seconds))
+        
+        upload_seconds = 0.0
+        
+        async def ingest_all():
+            nonlocal upload_seconds
+            start = time.perf_counter()
+            responses = await asyncio.gather(*(
+                client.post("/api/documents/upload", files={"file": (pdf.name, pdf.read_bytes(), "application/pdf")})
+                for pdf in pdfs
+            ))
+            for response in responses:
+                response.raise_for_status()
+            await asyncio.gather(*(wait_for_job(client, response.json()["job_id"]) for response in responses))
+            upload_seconds = time.perf_counter() - start
+        
+        busy = await measure_chats(client, chatters, "busy", ingest_all)
+    
+    megabytes = sum(pdf.stat().st_size for pdf in pdfs) / 1e6
+    print(f"Ingested {len(pdfs)} PDFs, {megabytes:.1f} MB, in {upload_seconds:.2f} s ({megabytes / upload_seconds:.2f} MB/s)")
+    print(f"{'phase':<10}{'chats':>8}{'p50 s':>8}{'p99 s':>8}{'max s':>8}")
+    for phase, latencies in (("idle", idle), ("ingesting", busy)):
+        print(
+            f"{phase:<10}{len(latencies):>8}{percentile(latencies, 50):>8.2f}"
+            f"{percentile(latencies, 99):>8.2f}{max(latencies):>8.2f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdfs", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=200, help="pages per PDF")
+    parser.add_argument("--chatters", type=int, default=4, help="clients chatting in a loop")
+    parser.add_argument("--latency", type=float, default=0.1, help="stub latency per chat call, in seconds")
+    parser.add_argument("--idle-seconds", type=float, default=5.0, help="length of the phase without uploads")
+    parser.add_argument("--workers", type=int, default=0, help="extraction processes, 0 = one per CPU core")
+    parser.add_argument("--inline-extraction", action="store_true", help="parse on the event loop instead of the process pool")
+    args = parser.parse_args()
+    
+    stub_app = create_app(dimension=DIMENSION, embedding_latency=0.01, chat_latency=args.latency)
+    with tempfile.TemporaryDirectory() as workdir, BackgroundServer(stub_app) as stub:
+        workdir = Path(workdir)
+        pdfs = []
+        for i in range(args.pdfs):
+            pdfs.append(workdir / f"documento{i}.pdf")
+            write_pdf(pdfs[-1], args.pages)
+        
+        configure_backend(
+            workdir,
+            stub.url,
+            embedding_dimension=DIMENSION,
+            answer_cache_enabled=False,
+            retrieval_cache_enabled=False,
+            extraction_workers=args.workers,
+            max_file_size=1024 ** 3
+        )
+        from app.main import app
+        from app.services.document_processor import document_processor
+        
+        if args.inline_extraction:
+            document_processor._executor = InlineExecutor()
+        
+        with BackgroundServer(app) as backend:
+            asyncio.run(run(backend.url, pdfs, args.chatters, args.idle_seconds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""Prompt size of plain top-k retrieval vs MMR diversification, on a fixed query set.
+
+Usage: python -m benchmarks.bench_mmr [--contracts N] [--versions N] [--top-k N] [--fetch-factor N]
+                                      [--mmr-lambda X] [--max-per-doc N]
+
+The corpus is a few synthetic contracts, each uploaded in several
+slightly edited versions, cut by the backend's chunker, so the plain
+top-k of a query is full of the same clause from every version. Vectors
+are hashed bags of words instead of model embeddings, which is enough for
+near-identical chunks to be near-identical vectors. Each search ranks
+every chunk exactly and diversifies ``top_k * fetch_factor`` candidates
+with ``mmr_select``, as ``retrieve`` does.
+
+For each method the benchmark reports the tokens of the context given to
+the LLM, the tokens repeating text already in that context, and how many
+tokens plain top-k needs to cover as much distinct text as MMR. Tokens
+are estimated as 4 characters each.
+"""
+import argparse
+import hashlib
+import random
+import re
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.common import configure_backend
+
+DIMENSION = 1024
+SHINGLE_WORDS = 8
+
+TOPICS = {
+    "pagamento": "fattura bonifico scadenza importo rata acconto saldo interessi mora iban",
+    "recesso": "disdetta preavviso risoluzione termine comunicazione raccomandata anticipata cessazione",
+    "privacy": "dati personali trattamento titolare consenso interessato conservazione gdpr",
+    "garanzia": "difetti vizi riparazione sostituzione conformità denuncia copertura durata",
+    "fornitura": "consegna merce ordine magazzino trasporto imballaggio quantità ritardo",
+    "riservatezza": "informazioni confidenziali divulgazione segreto terzi obbligo know-how",
+    "penali": "penale inadempimento ritardo percentuale massimale risarcimento danno",
+    "foro": "controversie tribunale competenza giurisdizione legge arbitrato mediazione",
+}
+FILLER = "il la le di del della che per con su una un nel alle dalla sono ogni parte presente contratto".split()
+
+QUERIES = [
+    "entro quale scadenza va pagata la fattura e con quali interessi di mora",
+    "come si comunica la disdetta e quanto preavviso serve",
+    "chi è il titolare del trattamento dei dati personali",
+    "cosa copre la garanzia per i vizi e difetti",
+    "quali sono i tempi di consegna della merce ordinata",
+    "quali informazioni confidenziali non si possono divulgare a terzi",
+    "quanto vale la penale per ritardo nell'inadempimento",
+    "quale tribunale è competente per le controversie",
+]
+
+
+def sentence(rng: random.Random, topic_words: list) -> str:
+    words = [rng.choice(topic_words) if rng.random() < 0.4 else rng.choice(FILLER) for _ in range(rng.randint(10, 22))]
+    return " ".join(words).capitalize() + "."
+
+
+def contract(rng: random.Random) -> list:
+    """Sections of one contract, a list of sentences per topic."""
+    return [[sentence(rng, words.split()) for _ in range(12)] for words in TOPICS.values()]
+
+
+def edited(rng: random.Random, sections: list) -> str:
+    """A version of the contract with about one sentence in ten rewritten."""
+    paragraphs = []
+    for (topic, words), sentences in zip(TOPICS.items(), sections):
+        sentences = [sentence(rng, words.split()) if rng.random() < 0.1 else text for text in sentences]
+        paragraphs.append(f"Articolo {topic}.\n" + " ".join(sentences[:6]) + "\n\n" + " ".join(sentences[6:]))
+    return "\n\n".join(paragraphs)
+
+
+def bag_of_words(text: str) -> np.ndarray:
+    vector = np.zeros(DIMENSION, dtype=np.float32)
+    for word in re.findall(r"\w+", text.lower()):
+        vector[int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=4).digest(), "little") % DIMENSION] += 1
+    return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+
+def context_tokens(hits: list) -> tuple:
+    """Estimated tokens of the context, and of the text in it that repeats earlier hits."""
+    seen = set()
+    total = repeated = 0
+    for hit in hits:
+        words = hit["text"].split()
+        total += len(hit["text"])
+        for i in range(len(words)):
+            shingle = tuple(words[i:i + SHINGLE_WORDS])
+            if shingle in seen:
+                repeated += len(words[i]) + 1
+            seen.add(shingle)
+    return total // 4, repeated // 4
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--contracts", type=int, default=4)
+    parser.add_argument("--versions", type=int, default=3)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--fetch-factor", type=int, default=4)
+    parser.add_argument("--mmr-lambda", type=float, default=0.5)
+    parser.add_argument("--max-per-doc", type=int, default=0)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as workdir:
+        configure_backend(Path(workdir))
+        from app.services.chunking import chunking_service
+        from app.services.retrieval import mmr_select
+        
+        rng = random.Random(0)
+        chunks = []
+        for c in range(args.contracts):
+            sections = contract(rng)
+            for v in range(args.versions):
+                doc_id = f"contratto{c}-v{v}"
+                chunks.extend(chunking_service.chunk_page(edited(rng, sections), {"doc_id": doc_id}, None, 0, 0))
+        vectors = np.stack([bag_of_words(chunk["text"]) for chunk in chunks])
+        hits = [
+            {"doc_id": chunk["metadata"]["doc_id"], "text": chunk["text"], "vector": vector}
+            for chunk, vector in zip(chunks, vectors)
+        ]
+        
+        totals = {"top-k": [0, 0], "mmr": [0, 0]}
+        plain_for_coverage = 0
+        for query in QUERIES:
+            query_vector = bag_of_words(query)
+            ranked = [hits[i] for i in np.argsort(-(vectors @ query_vector))]
+            
+            plain = ranked[:args.top_k]
+            diverse = mmr_select(
+                query_vector.tolist(), ranked[:args.top_k * args.fetch_factor],
+                args.top_k, args.mmr_lambda, args.max_per_doc
+            )
+            for name, selected in (("top-k", plain), ("mmr", diverse)):
+                tokens, repeated = context_tokens(selected)
+                totals[name][0] += tokens
+                totals[name][1] += repeated
+            
+            # Grow plain top-k until it holds as much distinct text as MMR's picks
+            tokens, repeated = context_tokens(diverse)
+            needed = len(ranked)
+            for k in range(args.top_k, len(ranked) + 1):
+                plain_tokens, plain_repeated = context_tokens(ranked[:k])
+                if plain_tokens - plain_repeated >= tokens - repeated:
+                    needed = k
+                    break
+            plain_for_coverage += context_tokens(ranked[:needed])[0]
+        
+        print(f"{len(chunks)} chunks from {args.contracts * args.versions} documents, {len(QUERIES)} queries, "
+              f"top_k={args.top_k}, fetch_factor={args.fetch_factor}, mmr_lambda={args.mmr_lambda}")
+        print(f"{'method':<10}{'context tokens':>16}{'repeated':>10}{'distinct':>10}")
+        for name, (tokens, repeated) in totals.items():
+            print(f"{name:<10}{tokens:>16}{repeated:>10}{tokens - repeated:>10}")
+        
+        mmr_tokens = totals["mmr"][0]
+        print(f"\nplain top-k needs {plain_for_coverage} tokens for MMR's distinct text, "
+              f"MMR saves {1 - mmr_tokens / plain_for_coverage:.0%} of the prompt")
+
+
+if __name__ == "__main__":
+    main()
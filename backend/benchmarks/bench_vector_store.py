@@ -0,0 +1,382 @@
+"""Vector store throughput, LocalVectorStore vs QdrantService, on the same random points.
+
+Usage: python -m benchmarks.bench_vector_store [--points N] [--dimension N] [--queries N]
+                                               [--backends local,qdrant] [--qdrant-url URL]
+                                               [--sweep] [--k N] [--payloads]
+
+Points are generated and upserted in batches, so ``--points 1000000``
+fits in memory. Besides throughput, search latency percentiles are
+reported on an idle store and while one large ``upsert_points`` call is
+running, and filtered deletes and scrolls are timed per document.
+
+Qdrant runs in its in-process mode unless --qdrant-url points at a
+server; the in-process mode has no HNSW index or quantization, so its
+numbers only show the client-side overhead, and its filtered operations
+are full scans: use a server (or ``--backends local``) for large runs. A
+test collection is created on the server and dropped afterwards.
+
+``--sweep`` compares Qdrant storage settings instead: for each
+quantization and HNSW setting it reports the estimated RAM of vectors
+and graph, recall@k against the exact search of LocalVectorStore, and
+search latency. Only a server builds indexes and quantizes, so run it
+with --qdrant-url.
+
+``--payloads`` compares Qdrant payloads holding the chunk text and
+metadata, as points were indexed before the chunk store, with payloads
+holding only the filtered fields plus the chunk store: it reports the
+payload bytes Qdrant keeps, the chunk store size, and the latency of
+searches that return hydrated top-5 hits.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+import uuid
+from contextlib import asynccontextmanager, contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+
+import numpy as np
+
+from benchmarks.common import configure_backend, percentile
+
+DOCUMENTS = 100
+UPSERT_BATCH = 10000
+# Points of the single upsert_points call that searches run against
+MIXED_UPSERT_POINTS = 50000
+# Documents removed one delete_document call at a time
+DELETED_DOCUMENTS = 10
+
+# Storage settings of the --sweep, each applied over the defaults
+SWEEP_DEFAULTS = {
+    "qdrant_quantization": "none",
+    "qdrant_on_disk_vectors": False,
+    "qdrant_hnsw_m": 16,
+    "qdrant_hnsw_ef_construct": 100,
+    "qdrant_hnsw_ef": 128
+}
+# Characters of chunk text in the --payloads comparison, about ChunkingService's chunk size
+CHUNK_CHARS = 1000
+CHUNK_WORDS = "the quarterly report lists revenue costs and forecasts for each region ".split()
+
+SWEEP = [
+    ("float32", {}),
+    ("int8", {"qdrant_quantization": "scalar"}),
+    ("int8, on-disk vectors", {"qdrant_quantization": "scalar", "qdrant_on_disk_vectors": True}),
+    ("binary", {"qdrant_quantization": "binary"}),
+    ("m=32, ef_construct=200", {"qdrant_hnsw_m": 32, "qdrant_hnsw_ef_construct": 200}),
+    ("hnsw_ef=32", {"qdrant_hnsw_ef": 32}),
+]
+
+
+@contextmanager
+def timed(results: list, backend: str, operation: str, count: int):
+    start = time.perf_counter()
+    yield
+    results.append((backend, operation, count, time.perf_counter() - start))
+
+
+def make_points(vectors: np.ndarray, prefix: str = "doc", start: int = 0) -> list:
+    from qdrant_client.models import PointStruct
+    
+    return [
+        PointStruct(
+            id=str(uuid.uuid4()),
+            vector=vector.tolist(),
+            payload={"doc_id": f"{prefix}{i % DOCUMENTS}", "chunk_index": i // DOCUMENTS, "chunk_hash": str(i)}
+        )
+        for i, vector in enumerate(vectors, start)
+    ]
+
+
+def point_batches(points: int, dimension: int, prefix: str = "doc") -> Iterator[list]:
+    """The same random points on every call, ``UPSERT_BATCH`` at a time."""
+    rng = np.random.default_rng(0)
+    for start in range(0, points, UPSERT_BATCH):
+        vectors = rng.standard_normal((min(UPSERT_BATCH, points - start), dimension)).astype(np.float32)
+        yield make_points(vectors, prefix, start)
+
+
+async def search_latencies(store, query_vectors: list, until: Optional[asyncio.Task] = None) -> list:
+    """Time single searches, cycling through the queries until ``until`` is done if given."""
+    latencies = []
+    while len(latencies) < len(query_vectors) if until is None else not until.done():
+        start = time.perf_counter()
+        await store.search(query_vectors[len(latencies) % len(query_vectors)], limit=10, hydrate=False)
+        latencies.append(time.perf_counter() - start)
+        # Qdrant's in-process mode never suspends, so the upsert would not get to run
+        await asyncio.sleep(0)
+    return latencies
+
+
+async def bench(store, backend: str, points: int, dimension: int, query_vectors: list, results: list, latencies: list):
+    await store.start()
+    try:
+        with timed(results, backend, "upsert", points):
+            for batch in point_batches(points, dimension):
+                assert await store.upsert_points(batch)
+        
+        with timed(results, backend, "search", len(query_vectors)):
+            idle = await search_latencies(store, query_vectors)
+        latencies.append((backend, "idle", idle))
+        
+        with timed(results, backend, "search_batch", len(query_vectors)):
+            await store.search_batch([{"query_vector": query, "limit": 10} for query in query_vectors])
+        
+        with timed(results, backend, "filtered search", len(query_vectors)):
+            for i, query in enumerate(query_vectors):
+                await store.search(query, limit=10, doc_id_filter=f"doc{i % DOCUMENTS}", hydrate=False)
+        
+        with timed(results, backend, "scroll", points):
+            for i in range(DOCUMENTS):
+                async for _ in store.iter_document_chunks(f"doc{i}", payload_fields=["chunk_hash"], page_size=256):
+                    pass
+        
+        with timed(results, backend, "ordered paging", points):
+            for i in range(DOCUMENTS):
+                async for _ in store.iter_document_chunks(f"doc{i}", ordered=True, page_size=64):
+                    pass
+        
+        with timed(results, backend, "count", DOCUMENTS):
+            for i in range(DOCUMENTS):
+                await store.count_document_chunks(f"doc{i}")
+        
+        # Searches keep running while a second copy of the points is upserted in one call
+        mixed = [point for batch in point_batches(min(points, MIXED_UPSERT_POINTS), dimension, "mixed") for point in batch]
+        upsert = asyncio.create_task(store.upsert_points(mixed))
+        during_upsert = await search_latencies(store, query_vectors, until=upsert)
+        assert await upsert
+        latencies.append((backend, "during upsert", during_upsert))
+        
+        with timed(results, backend, "filtered delete", DELETED_DOCUMENTS):
+            for i in range(DELETED_DOCUMENTS):
+                assert await store.delete_document(f"doc{i}")
+    finally:
+        await store.delete_all()
+        await store.close()
+
+
+@asynccontextmanager
+async def qdrant_store(qdrant_url: Optional[str]):
+    """A QdrantService on a test collection, dropped from the server afterwards."""
+    from qdrant_client import AsyncQdrantClient
+    from app.core.qdrant_service import QdrantService
+    
+    qdrant = QdrantService()
+    qdrant.collection_name = f"bench_{uuid.uuid4().hex}"
+    if qdrant_url is None:
+        await qdrant.client.close()
+        qdrant.client = AsyncQdrantClient(location=":memory:")
+    try:
+        yield qdrant
+    finally:
+        if qdrant_url is not None:
+            client = AsyncQdrantClient(url=qdrant_url)
+            await client.delete_collection(qdrant.collection_name)
+            await client.close()
+
+
+def estimated_ram(points: int, dimension: int, config: dict) -> float:
+    """MB of RAM for the vectors, their quantized copy and the HNSW graph."""
+    vectors = 0 if config["qdrant_on_disk_vectors"] else points * dimension * 4
+    quantized = {"none": 0, "scalar": points * dimension, "binary": points * dimension // 8}[config["qdrant_quantization"]]
+    # The bottom layer of the graph keeps up to 2 * m links of 4 bytes per point
+    graph = points * config["qdrant_hnsw_m"] * 2 * 4
+    return (vectors + quantized + graph) / 2 ** 20
+
+
+async def search_neighbours(store, query_vectors: list, k: int) -> tuple:
+    """Top-k hits of each query as ``(doc_id, chunk_index)`` sets, and the search latencies."""
+    neighbours = []
+    latencies = []
+    for query in query_vectors:
+        start = time.perf_counter()
+        hits = await store.search(query, limit=k, score_threshold=-1.0, hydrate=False)
+        latencies.append(time.perf_counter() - start)
+        neighbours.append({(hit["doc_id"], hit["chunk_index"]) for hit in hits})
+    return neighbours, latencies
+
+
+async def sweep(points: int, dimension: int, query_vectors: list, k: int, qdrant_url: Optional[str]):
+    from qdrant_client.models import CollectionStatus, OptimizersConfigDiff
+    from app.core.config import settings
+    # The local store configured by configure_backend searches exhaustively,
+    # which gives the true neighbours
+    from app.core.vector_store import vector_store as exact_store
+    
+    await exact_store.start()
+    try:
+        for batch in point_batches(points, dimension):
+            assert await exact_store.upsert_points(batch)
+        exact, _ = await search_neighbours(exact_store, query_vectors, k)
+    finally:
+        await exact_store.delete_all()
+        await exact_store.close()
+    
+    rows = []
+    for label, changes in SWEEP:
+        config = {**SWEEP_DEFAULTS, **changes}
+        previous = {key: getattr(settings, key) for key in config}
+        for key, value in config.items():
+            setattr(settings, key, value)
+        
+        try:
+            async with qdrant_store(qdrant_url) as qdrant:
+                await qdrant.start()
+                try:
+                    # Index whatever the collection size, as a large collection would be
+                    await qdrant.client.update_collection(
+                        qdrant.collection_name, optimizers_config=OptimizersConfigDiff(indexing_threshold=1)
+                    )
+                    for batch in point_batches(points, dimension):
+                        assert await qdrant.upsert_points(batch)
+                    while (await qdrant.client.get_collection(qdrant.collection_name)).status != CollectionStatus.GREEN:
+                        await asyncio.sleep(0.5)
+                    
+                    found, latencies = await search_neighbours(qdrant, query_vectors, k)
+                finally:
+                    await qdrant.close()
+        finally:
+            for key, value in previous.items():
+                setattr(settings, key, value)
+        
+        recall = np.mean([len(hits & truth) / len(truth) for hits, truth in zip(found, exact)])
+        rows.append((label, estimated_ram(points, dimension, config), recall, latencies))
+    
+    print(f"{'qdrant storage':<26}{'est. RAM MB':>12}{f'recall@{k}':>11}{'p50 ms':>10}{'p99 ms':>10}")
+    for label, ram, recall, latencies in rows:
+        print(f"{label:<26}{ram:>12.1f}{recall:>11.3f}"
+              f"{percentile(latencies, 50) * 1000:>10.2f}{percentile(latencies, 99) * 1000:>10.2f}")
+
+
+def chunk_entry(point) -> tuple:
+    """Text and metadata of a bench point, as ChunkingService would produce them."""
+    i = int(point.payload["chunk_hash"])
+    words = " ".join(CHUNK_WORDS[(i + j) % len(CHUNK_WORDS)] for j in range(CHUNK_CHARS // 6))
+    metadata = {
+        "doc_id": point.payload["doc_id"],
+        "filename": f"{point.payload['doc_id']}.pdf",
+        "file_type": "pdf",
+        "uploaded_at": "2024-01-01T00:00:00",
+        "file_size": 1048576,
+        "page": point.payload["chunk_index"] // 3 + 1,
+        "chunk_index": point.payload["chunk_index"],
+        "start_offset": 0,
+        "end_offset": CHUNK_CHARS
+    }
+    return words[:CHUNK_CHARS], metadata
+
+
+async def compare_payloads(points: int, dimension: int, query_vectors: list, qdrant_url: Optional[str]):
+    from app.core.chunk_store import chunk_store
+    
+    rows = []
+    for label, in_payload in (("text + metadata", True), ("filter fields only", False)):
+        payload_bytes = 0
+        async with qdrant_store(qdrant_url) as qdrant:
+            await qdrant.start()
+            try:
+                for batch in point_batches(points, dimension):
+                    entries = []
+                    for point in batch:
+                        text, metadata = chunk_entry(point)
+                        if in_payload:
+                            point.payload.update(text=text, metadata=metadata)
+                        else:
+                            entries.append((point.id, point.payload["doc_id"], text, metadata))
+                        payload_bytes += len(json.dumps(point.payload))
+                    chunk_store.put_many(entries)
+                    assert await qdrant.upsert_points(batch)
+                
+                latencies = []
+                for query in query_vectors:
+                    start = time.perf_counter()
+                    hits = await qdrant.search(query, limit=5, score_threshold=-1.0)
+                    latencies.append(time.perf_counter() - start)
+                    assert all(hit["text"] for hit in hits)
+            finally:
+                await qdrant.close()
+        
+        # Recent writes are still in the write-ahead log
+        chunk_store_bytes = sum(
+            os.path.getsize(path) for path in (chunk_store.db_path, f"{chunk_store.db_path}-wal") if os.path.exists(path)
+        )
+        rows.append((label, payload_bytes / 2 ** 20, chunk_store_bytes / 2 ** 20, latencies))
+        chunk_store.delete_all()
+    
+    print(f"{'qdrant payloads':<22}{'payload MB':>12}{'chunks.db MB':>14}{'p50 ms':>10}{'p99 ms':>10}")
+    for label, payload_mb, chunk_store_mb, latencies in rows:
+        print(f"{label:<22}{payload_mb:>12.1f}{chunk_store_mb:>14.1f}"
+              f"{percentile(latencies, 50) * 1000:>10.2f}{percentile(latencies, 99) * 1000:>10.2f}")
+
+
+async def run(
+    points: int,
+    dimension: int,
+    queries: int,
+    backends: list,
+    qdrant_url: Optional[str],
+    storage_sweep: bool = False,
+    k: int = 10,
+    payloads: bool = False
+):
+    # The store configured by configure_backend is the local one
+    from app.core.vector_store import vector_store as local_store
+    
+    query_vectors = np.random.default_rng(1).standard_normal((queries, dimension)).astype(np.float32).tolist()
+    if storage_sweep:
+        await sweep(points, dimension, query_vectors, k, qdrant_url)
+        return
+    if payloads:
+        await compare_payloads(points, dimension, query_vectors, qdrant_url)
+        return
+    
+    results = []
+    latencies = []
+    
+    if "local" in backends:
+        await bench(local_store, "local", points, dimension, query_vectors, results, latencies)
+    
+    if "qdrant" in backends:
+        async with qdrant_store(qdrant_url) as qdrant:
+            await bench(qdrant, "qdrant", points, dimension, query_vectors, results, latencies)
+    
+    print(f"{'backend':<10}{'operation':<18}{'items':>8}{'seconds':>10}{'items/s':>12}{'ms/item':>10}")
+    for backend, operation, count, seconds in results:
+        print(f"{backend:<10}{operation:<18}{count:>8}{seconds:>10.3f}"
+              f"{count / seconds:>12.1f}{seconds / count * 1000:>10.3f}")
+    
+    print(f"\n{'backend':<10}{'search':<18}{'queries':>8}{'p50 ms':>10}{'p99 ms':>12}")
+    for backend, phase, values in latencies:
+        print(f"{backend:<10}{phase:<18}{len(values):>8}"
+              f"{percentile(values, 50) * 1000:>10.2f}{percentile(values, 99) * 1000:>12.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--points", type=int, default=20000)
+    parser.add_argument("--dimension", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--backends", default="local,qdrant", help="Comma-separated backends to run")
+    parser.add_argument("--qdrant-url", default=None, help="Qdrant server to use instead of the in-process mode")
+    parser.add_argument("--sweep", action="store_true", help="Compare Qdrant quantization and HNSW settings")
+    parser.add_argument("--k", type=int, default=10, help="Neighbours per query for recall in the sweep")
+    parser.add_argument("--payloads", action="store_true", help="Compare Qdrant payloads with and without chunk text")
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as workdir:
+        overrides = {"embedding_dimension": args.dimension}
+        if args.qdrant_url:
+            overrides["qdrant_url"] = args.qdrant_url
+        configure_backend(Path(workdir), **overrides)
+        
+        asyncio.run(run(
+            args.points, args.dimension, args.queries, args.backends.split(","), args.qdrant_url,
+            args.sweep, args.k, args.payloads
+        ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import os
+import sys
+from pathlib import Path
+from typing import Any, Optional, Sequence
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def configure_backend(workdir: Path, stub_url: Optional[str] = None, **overrides: Any):
+    """Point the backend's settings at the stub and keep all of its files in ``workdir``.
+    
+    Must run before any ``app`` module is imported, since settings and the
+    store singletons are created on import. Keyword arguments override
+    further settings by name. Without ``stub_url`` the API URL is a
+    placeholder, for benchmarks that never call the model.
+    """
+    if str(BACKEND_DIR) not in sys.path:
+        sys.path.insert(0, str(BACKEND_DIR))
+    
+    env = {
+        "regolo_api_key": "stub",
+        "regolo_base_url": f"{stub_url or 'http://127.0.0.1:9'}/v1",
+        "vector_store_backend": "local",
+        "local_vector_store_path": workdir / "vector_store",
+        "chunk_store_path": workdir / "chunks.db",
+        "embedding_cache_path": workdir / "embedding_cache.db",
+        "upload_dir": workdir / "uploads",
+        **overrides
+    }
+    os.environ.update({key.upper(): str(value) for key, value in env.items()})
+    
+    # DocumentStore keeps its database in the working directory
+    os.chdir(workdir)
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else float("nan")
@@ -0,0 +1,140 @@
+"""Concurrent chat throughput of one backend worker against a stubbed LLM.
+
+Usage: python -m benchmarks.load_test_chat [--concurrency 1,2,4,8,16] [--rounds N] [--latency S]
+       python -m benchmarks.load_test_chat --repeat [--questions N] [--rounds N] [--concurrency N]
+
+The backend runs in a single uvicorn worker with the local vector store;
+chat completions and embeddings come from the local OpenAI-compatible
+stub, which sleeps for --latency seconds per chat call. Each chat makes
+two LLM calls (tool call, then answer), so a worker that awaits the LLM
+scales with concurrency while a blocking one stays at one chat at a time.
+Answer and retrieval caches are disabled and every question is unique.
+
+With --repeat the answer cache is enabled instead: a fixed set of
+questions is asked once to fill it, then asked again --rounds times at
+the first --concurrency level, and the latency percentiles of both
+passes are reported along with the LLM calls the repeated pass made.
+"""
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import httpx
+
+from benchmarks.common import configure_backend, percentile
+from benchmarks.openai_stub import BackgroundServer, create_app
+
+DIMENSION = 256
+
+
+async def upload_document(client: httpx.AsyncClient):
+    text = "\n\n".join(f"Paragrafo {i}: il contratto prevede la clausola numero {i}." for i in range(50))
+    response = await client.post(
+        "/api/documents/upload",
+        files={"file": ("contratto.txt", text.encode("utf-8"), "text/plain")}
+    )
+    response.raise_for_status()
+    await wait_for_job(client, response.json()["job_id"])
+
+
+async def wait_for_job(client: httpx.AsyncClient, job_id: str):
+    while True:
+        job = (await client.get(f"/api/documents/jobs/{job_id}")).json()
+        if job["status"] == "completed":
+            return
+        if job["status"] == "failed":
+            raise RuntimeError(f"Ingestion of {job['filename']} failed: {job['error']}")
+        await asyncio.sleep(0.1)
+
+
+async def chat(client: httpx.AsyncClient, question: str) -> float:
+    start = time.perf_counter()
+    response = await client.post("/api/rag/chat", json={"message": question})
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def run(backend_url: str, levels: List[int], rounds: int):
+    async with httpx.AsyncClient(base_url=backend_url, timeout=300) as client:
+        await upload_document(client)
+        
+        print(f"{'concurrency':>12}{'chats':>8}{'seconds':>10}{'chats/s':>10}{'p50 s':>8}")
+        for concurrency in levels:
+            questions = [f"Domanda {concurrency}-{i}: cosa prevede la clausola {i}?" for i in range(concurrency * rounds)]
+            semaphore = asyncio.Semaphore(concurrency)
+            
+            async def limited(question: str) -> float:
+                async with semaphore:
+                    return await chat(client, question)
+            
+            start = time.perf_counter()
+            latencies = await asyncio.gather(*(limited(question) for question in questions))
+            seconds = time.perf_counter() - start
+            print(
+                f"{concurrency:>12}{len(questions):>8}{seconds:>10.2f}"
+                f"{len(questions) / seconds:>10.2f}{statistics.median(latencies):>8.2f}"
+            )
+
+
+async def run_repeated(backend_url: str, questions: int, rounds: int, concurrency: int, stats: Dict[str, Any]):
+    async with httpx.AsyncClient(base_url=backend_url, timeout=300) as client:
+        await upload_document(client)
+        asked = [f"Cosa prevede la clausola {i}?" for i in range(questions)]
+        
+        # The first pass answers through the LLM and fills the answer cache
+        misses = [await chat(client, question) for question in asked]
+        chat_requests = stats["chat_requests"]
+        
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def limited(question: str) -> float:
+            async with semaphore:
+                return await chat(client, question)
+        
+        hits = await asyncio.gather(*(limited(question) for question in asked * rounds))
+        
+        print(f"{'pass':<10}{'chats':>8}{'p50 ms':>10}{'p99 ms':>10}")
+        for name, latencies in (("first", misses), ("repeated", hits)):
+            print(f"{name:<10}{len(latencies):>8}"
+                  f"{percentile(latencies, 50) * 1000:>10.1f}{percentile(latencies, 99) * 1000:>10.1f}")
+        print(f"LLM calls during the repeated pass: {stats['chat_requests'] - chat_requests}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", default="1,2,4,8,16", help="comma-separated concurrency levels")
+    parser.add_argument("--rounds", type=int, default=2, help="chats per concurrent client at each level")
+    parser.add_argument("--latency", type=float, default=0.5, help="stub latency per chat call, in seconds")
+    parser.add_argument("--repeat", action="store_true", help="ask the same questions again with the answer cache")
+    parser.add_argument("--questions", type=int, default=20, help="distinct questions of the --repeat mode")
+    args = parser.parse_args()
+    levels = [int(level) for level in args.concurrency.split(",")]
+    
+    stub_app = create_app(dimension=DIMENSION, embedding_latency=0.01, chat_latency=args.latency)
+    with tempfile.TemporaryDirectory() as workdir, BackgroundServer(stub_app) as stub:
+        configure_backend(
+            Path(workdir),
+            stub.url,
+            embedding_dimension=DIMENSION,
+            answer_cache_enabled=args.repeat,
+            retrieval_cache_enabled=False,
+            extraction_workers=1,
+            ingestion_workers=1
+        )
+        from app.main import app
+        
+        with BackgroundServer(app) as backend:
+            if args.repeat:
+                asyncio.run(run_repeated(backend.url, args.questions, args.rounds, levels[0], stub_app.state.stats))
+            else:
+                asyncio.run(run(backend.url, levels, args.rounds))
+        
+        print(f"Stub served {stub_app.state.stats['chat_requests']} chat completions")
+
+
+if __name__ == "__main__":
+    main()
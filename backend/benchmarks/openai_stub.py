@@ -0,0 +1,130 @@
+"""Local OpenAI-compatible stub serving embeddings and chat completions.
+
+Each request sleeps for a fixed latency before answering, so benchmarks
+measure how the backend schedules its calls rather than a real model.
+Embeddings are deterministic unit vectors derived from the input text.
+Chat completions call the first offered tool once, with the last user
+message as its ``query``, then answer.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import socket
+import threading
+import time
+import uuid
+from typing import Any, Dict, List
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+
+
+def stub_vector(text: str, dimension: int) -> np.ndarray:
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dimension).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def create_app(
+    dimension: int = 256,
+    embedding_latency: float = 0.02,
+    chat_latency: float = 0.5
+) -> FastAPI:
+    app = FastAPI()
+    app.state.stats = {"embedding_requests": 0, "embedding_inputs": 0, "chat_requests": 0}
+    
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request) -> Dict[str, Any]:
+        body = await request.json()
+        inputs: List[str] = [body["input"]] if isinstance(body["input"], str) else body["input"]
+        app.state.stats["embedding_requests"] += 1
+        app.state.stats["embedding_inputs"] += len(inputs)
+        
+        await asyncio.sleep(embedding_latency)
+        
+        data = []
+        for index, text in enumerate(inputs):
+            vector = stub_vector(text, dimension)
+            if body.get("encoding_format") == "base64":
+                embedding = base64.b64encode(vector.tobytes()).decode("ascii")
+            else:
+                embedding = vector.tolist()
+            data.append({"object": "embedding", "index": index, "embedding": embedding})
+        
+        return {
+            "object": "list",
+            "data": data,
+            "model": body["model"],
+            "usage": {"prompt_tokens": 0, "total_tokens": 0}
+        }
+    
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request) -> Dict[str, Any]:
+        body = await request.json()
+        app.state.stats["chat_requests"] += 1
+        
+        await asyncio.sleep(chat_latency)
+        
+        messages = body["messages"]
+        if body.get("tools") and messages[-1]["role"] != "tool":
+            question = next(msg["content"] for msg in reversed(messages) if msg["role"] == "user")
+            message = {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [{
+                    "id": f"call_{uuid.uuid4().hex}",
+                    "type": "function",
+                    "function": {
+                        "name": body["tools"][0]["function"]["name"],
+                        "arguments": json.dumps({"query": question})
+                    }
+                }]
+            }
+            finish_reason = "tool_calls"
+        else:
+            message = {"role": "assistant", "content": "Risposta generata dallo stub."}
+            finish_reason = "stop"
+        
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body["model"],
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        }
+    
+    return app
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class BackgroundServer:
+    """Run an ASGI app with uvicorn on a daemon thread, as a context manager."""
+    
+    def __init__(self, app: Any):
+        self.port = free_port()
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+    
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+    
+    def __enter__(self) -> "BackgroundServer":
+        self.thread.start()
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise RuntimeError(f"Server on port {self.port} failed to start")
+            time.sleep(0.01)
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.server.should_exit = True
+        self.thread.join()
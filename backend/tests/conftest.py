@@ -0,0 +1,29 @@
+"""Run the tests against a stub API key and stores in a throwaway directory.
+
+Settings and the store singletons are created when ``app`` modules are
+imported, so the environment is set up here, before any test module is
+collected.
+"""
+import atexit
+import os
+import shutil
+import tempfile
+
+_workdir = tempfile.mkdtemp(prefix="rag-tests-")
+atexit.register(shutil.rmtree, _workdir, ignore_errors=True)
+
+os.environ.update({
+    "REGOLO_API_KEY": "test",
+    "VECTOR_STORE_BACKEND": "local",
+    "LOCAL_VECTOR_STORE_PATH": os.path.join(_workdir, "vector_store"),
+    "CHUNK_STORE_PATH": os.path.join(_workdir, "chunks.db"),
+    "EMBEDDING_DIMENSION": "64",
+    "EMBEDDING_CACHE_ENABLED": "false",
+    "UPLOAD_DIR": os.path.join(_workdir, "uploads")
+})
+
+
+
+def pytest_sessionstart(session):
+    # DocumentStore keeps its database in the working directory
+    os.chdir(_workdir)
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+from app.core.cache import AsyncLRUCache
+
+
+async def test_concurrent_misses_share_one_load():
+    cache = AsyncLRUCache("test")
+    calls = 0
+    
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "value"
+    
+    results = await asyncio.gather(*(cache.get_or_load("key", load) for _ in range(5)))
+    
+    assert results == ["value"] * 5
+    assert calls == 1
+    assert cache.coalesced == 4
+    assert await cache.get_or_load("key", load) == "value"
+    assert cache.hits == 1
+
+
+async def test_cancelling_the_first_caller_does_not_cancel_the_others():
+    cache = AsyncLRUCache("test")
+    
+    async def load():
+        await asyncio.sleep(0.05)
+        return "value"
+    
+    leader = asyncio.create_task(cache.get_or_load("key", load))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(cache.get_or_load("key", load))
+    await asyncio.sleep(0.01)
+    
+    leader.cancel()
+    
+    assert await follower == "value"
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+    assert cache.get("key") == "value"
+
+
+async def test_failed_loads_are_shared_and_not_cached():
+    cache = AsyncLRUCache("test")
+    
+    async def load():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+    
+    results = await asyncio.gather(
+        cache.get_or_load("key", load),
+        cache.get_or_load("key", load),
+        return_exceptions=True
+    )
+    
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert cache.get("key") is None
+    assert "key" not in cache
+
+
+async def test_expired_entries_are_reloaded():
+    cache = AsyncLRUCache("test", ttl=0.01)
+    cache.set("key", "old")
+    await asyncio.sleep(0.02)
+    
+    async def load():
+        return "new"
+    
+    assert await cache.get_or_load("key", load) == "new"
+    assert cache.expirations == 1
+
+
+def test_lru_eviction_by_entries_and_bytes():
+    cache = AsyncLRUCache("test", max_entries=2, max_bytes=10, size_of=len)
+    cache.set("a", "xxxx")
+    cache.set("b", "xxxx")
+    cache.get("a")
+    cache.set("c", "xxxx")
+    
+    assert "b" not in cache
+    assert "a" in cache and "c" in cache
+    
+    cache.set("d", "xxxxxxxx")
+    assert list(cache._entries) == ["d"]
+    assert cache.evictions == 3
+
+
+async def test_values_rejected_by_cacheable_are_returned_but_not_stored():
+    cache = AsyncLRUCache("test")
+    calls = 0
+    
+    async def load():
+        nonlocal calls
+        calls += 1
+        return {"partial": True}
+    
+    cacheable = lambda value: not value["partial"]
+    
+    assert await cache.get_or_load("key", load, cacheable) == {"partial": True}
+    assert await cache.get_or_load("key", load, cacheable) == {"partial": True}
+    assert calls == 2
+    assert "key" not in cache
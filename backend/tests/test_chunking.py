@@ -0,0 +1,53 @@
+import random
+
+import pytest
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from app.services.chunking import TextChunker, chunking_service
+
+SEPARATORS = ["\n\n", "\n", ". ", " ", ""]
+
+
+def random_text(rng: random.Random, length: int) -> str:
+    # Short words, runs of whitespace and the odd word longer than any chunk
+    tokens = []
+    while sum(map(len, tokens)) < length:
+        roll = rng.random()
+        if roll < 0.02:
+            tokens.append("x" * rng.randint(50, 400))
+        elif roll < 0.1:
+            tokens.append(rng.choice(["\n\n", "\n", ". ", "  ", "\n \n", "\t"]))
+        else:
+            tokens.append("".join(rng.choice("abcdefghij") for _ in range(rng.randint(1, 12))))
+            tokens.append(" ")
+    return "".join(tokens)
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_chunker_matches_recursive_character_text_splitter(seed):
+    rng = random.Random(seed)
+    chunk_size = rng.randint(20, 600)
+    chunk_overlap = rng.randint(0, chunk_size // 2)
+    text = random_text(rng, rng.randint(0, 5000))
+    
+    expected = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+        separators=SEPARATORS
+    ).split_text(text)
+    
+    assert TextChunker(chunk_size, chunk_overlap, SEPARATORS).split_text(text) == expected
+
+
+def test_chunk_page_offsets_locate_chunks():
+    page_text = random_text(random.Random(0), 8000)
+    
+    chunks = chunking_service.chunk_page(page_text, {"doc_id": "doc"}, page_number=3, start_index=7, base_offset=100)
+    
+    assert chunks
+    for i, chunk in enumerate(chunks):
+        metadata = chunk["metadata"]
+        assert metadata["chunk_index"] == 7 + i
+        assert metadata["page_number"] == 3
+        assert page_text[metadata["start_offset"] - 100:metadata["end_offset"] - 100] == chunk["text"]
@@ -0,0 +1,82 @@
+import sqlite3
+import time
+
+from app.core.embedding_cache import EmbeddingCache
+
+# Each vector is 4 floats, 16 bytes
+VECTOR_BYTES = 16
+
+
+def vector(i: int):
+    return [float(i)] * 4
+
+
+def stored_hashes(cache: EmbeddingCache):
+    with sqlite3.connect(cache.db_path) as conn:
+        return {row[0] for row in conn.execute("SELECT text_hash FROM embeddings")}
+
+
+def test_hits_and_misses_are_counted(tmp_path):
+    cache = EmbeddingCache(tmp_path / "cache.db")
+    cache.put_many(["a", "b"], [vector(1), vector(2)], "model")
+    
+    found = cache.get_many(["a", "b", "c", "a"], "model")
+    
+    assert found == {"a": vector(1), "b": vector(2)}
+    assert (cache.hits, cache.misses) == (3, 1)
+    # Vectors of another model are a different entry
+    assert cache.get_many(["a"], "other") == {}
+    assert cache.misses == 2
+
+
+def test_least_recently_used_entries_are_evicted_by_bytes(tmp_path):
+    cache = EmbeddingCache(tmp_path / "cache.db", max_bytes=3 * VECTOR_BYTES)
+    cache.put_many(["a", "b", "c"], [vector(1), vector(2), vector(3)], "model")
+    time.sleep(0.01)
+    cache.get_many(["a"], "model")
+    
+    cache.put_many(["d"], [vector(4)], "model")
+    
+    assert stored_hashes(cache) == {"a", "c", "d"}
+    assert cache.evictions == 1
+    assert cache.stats()["size_bytes"] == 3 * VECTOR_BYTES
+
+
+def test_size_total_survives_replacements_and_restarts(tmp_path):
+    cache = EmbeddingCache(tmp_path / "cache.db")
+    cache.put_many(["a", "b"], [vector(1), vector(2)], "model")
+    cache.put_many(["a"], [vector(3)], "model")
+    
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["size_bytes"] == 2 * VECTOR_BYTES
+    
+    reopened = EmbeddingCache(tmp_path / "cache.db")
+    assert reopened.stats()["entries"] == 2
+    assert reopened.stats()["size_bytes"] == 2 * VECTOR_BYTES
+    assert reopened.get_many(["a"], "model") == {"a": vector(3)}
+
+
+def test_caches_with_the_old_row_layout_are_migrated(tmp_path):
+    path = tmp_path / "cache.db"
+    with sqlite3.connect(path) as conn:
+        conn.execute("""
+            CREATE TABLE embeddings (
+                text_hash TEXT NOT NULL,
+                model TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (text_hash, model)
+            )
+        """)
+        conn.execute("CREATE INDEX idx_embeddings_last_used ON embeddings (last_used)")
+        blob = bytes(VECTOR_BYTES)
+        conn.execute("INSERT INTO embeddings VALUES ('a', 'model', ?, ?, 0)", (blob, VECTOR_BYTES))
+    
+    cache = EmbeddingCache(path)
+    
+    with sqlite3.connect(path) as conn:
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(embeddings)")]
+    assert columns[-1] == "vector"
+    assert cache.stats()["size_bytes"] == VECTOR_BYTES
+    assert cache.get_many(["a"], "model") == {"a": [0.0] * 4}
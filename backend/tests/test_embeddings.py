@@ -0,0 +1,35 @@
+import pytest
+from pydantic import ValidationError
+
+from app.core.config import settings
+from app.core.regolo_service import regolo_service
+from app.models.schemas import BatchSearchRequest
+from app.services.embedding_service import embedding_service, query_embedding_cache
+
+
+async def test_query_embeddings_are_sent_in_bounded_batches(monkeypatch):
+    batches = []
+    
+    async def generate_embeddings(texts):
+        batches.append(len(texts))
+        return [[float(len(text))] * settings.embedding_dimension for text in texts]
+    
+    monkeypatch.setattr(regolo_service, "generate_embeddings", generate_embeddings)
+    monkeypatch.setattr(settings, "embedding_batch_size", 8)
+    query_embedding_cache.clear()
+    
+    queries = [f"query {i}" for i in range(30)]
+    embeddings = await embedding_service.generate_query_embeddings(queries)
+    
+    assert len(embeddings) == len(queries)
+    assert batches == [8, 8, 8, 6]
+    
+    # Cached queries are not sent again
+    await embedding_service.generate_query_embeddings(queries[:5] + ["one more"])
+    assert batches == [8, 8, 8, 6, 1]
+
+
+def test_batch_search_request_is_bounded():
+    BatchSearchRequest(queries=[{"query": f"q{i}"} for i in range(100)])
+    with pytest.raises(ValidationError):
+        BatchSearchRequest(queries=[{"query": f"q{i}"} for i in range(101)])
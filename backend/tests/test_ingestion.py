@@ -0,0 +1,262 @@
+import asyncio
+import hashlib
+import io
+import sqlite3
+import tarfile
+import zipfile
+
+import numpy as np
+import pytest
+from fastapi import UploadFile
+
+from app.core.chunk_store import chunk_store
+from app.core.config import settings
+from app.core.document_store import document_store
+from app.core.regolo_service import regolo_service
+from app.core.vector_store import vector_store
+from app.services.ingestion_service import ingestion_service, STATUS_COMPLETED, STATUS_FAILED
+
+
+def fake_embedding(text: str):
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    return np.random.default_rng(seed).standard_normal(settings.embedding_dimension).tolist()
+
+
+def document_text(paragraphs: int, tag: str = "doc") -> str:
+    return "\n\n".join(
+        f"{tag} paragraph {i}. " + " ".join(f"word{i}_{j}" for j in range(120))
+        for i in range(paragraphs)
+    )
+
+
+def stored_chunk_rows(doc_id: str) -> int:
+    with sqlite3.connect(chunk_store.db_path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM chunks WHERE doc_id = ?", (doc_id,)).fetchone()[0]
+
+
+@pytest.fixture(autouse=True)
+async def ingestion(monkeypatch):
+    async def generate_embeddings(texts):
+        return [fake_embedding(text) for text in texts]
+    
+    monkeypatch.setattr(regolo_service, "generate_embeddings", generate_embeddings)
+    monkeypatch.setattr(settings, "embedding_batch_size", 4)
+    monkeypatch.setattr(settings, "embedding_max_concurrency", 1)
+    
+    ingestion_service.upload_dir.mkdir(parents=True, exist_ok=True)
+    ingestion_service.queue = asyncio.Queue()
+    await vector_store.start()
+    await vector_store.delete_all()
+    document_store.delete_all_documents()
+    
+    yield ingestion_service
+    
+    await vector_store.close()
+
+
+async def run_jobs():
+    while not ingestion_service.queue.empty():
+        doc_ids, mode = ingestion_service.queue.get_nowait()
+        await ingestion_service._process(doc_ids, mode)
+
+
+async def ingest(filename: str, text: str):
+    doc = await ingestion_service.submit(UploadFile(io.BytesIO(text.encode("utf-8")), filename=filename))
+    await run_jobs()
+    return document_store.get_document(doc["id"])
+
+
+async def test_ingest_indexes_every_chunk():
+    doc = await ingest("report.txt", document_text(10))
+    
+    assert doc["status"] == STATUS_COMPLETED
+    assert doc["chunk_count"] > 8
+    assert await vector_store.count_document_chunks(doc["id"]) == doc["chunk_count"]
+    assert stored_chunk_rows(doc["id"]) == doc["chunk_count"]
+
+
+async def test_failed_upsert_removes_partially_indexed_chunks(monkeypatch):
+    upsert_points = vector_store.upsert_points
+    calls = 0
+    
+    async def flaky_upsert(points, wait=True):
+        nonlocal calls
+        calls += 1
+        if calls > 1:
+            return False
+        return await upsert_points(points, wait)
+    
+    monkeypatch.setattr(vector_store, "upsert_points", flaky_upsert)
+    doc = await ingest("report.txt", document_text(10))
+    
+    assert calls > 1
+    assert doc["status"] == STATUS_FAILED
+    assert await vector_store.count_document_chunks(doc["id"]) == 0
+    assert stored_chunk_rows(doc["id"]) == 0
+    
+    # A failed document is not a duplicate, so the same file can be uploaded again
+    monkeypatch.setattr(vector_store, "upsert_points", upsert_points)
+    retry = await ingest("report.txt", document_text(10))
+    
+    assert retry["id"] != doc["id"]
+    assert retry["status"] == STATUS_COMPLETED
+    assert await vector_store.count_document_chunks(retry["id"]) == retry["chunk_count"]
+
+
+async def replace(doc_id: str, filename: str, text: str):
+    upload = UploadFile(io.BytesIO(text.encode("utf-8")), filename=filename)
+    await ingestion_service.submit_replace(document_store.get_document(doc_id), upload)
+    await run_jobs()
+    return document_store.get_document(doc_id)
+
+
+async def indexed_hashes(doc_id: str):
+    return sorted([
+        chunk["chunk_hash"]
+        async for chunk in vector_store.iter_document_chunks(doc_id, payload_fields=["chunk_hash"])
+    ])
+
+
+async def indexed_positions(doc_id: str):
+    return sorted([
+        (chunk["chunk_hash"], chunk["chunk_index"])
+        async for chunk in vector_store.iter_document_chunks(doc_id, payload_fields=["chunk_hash", "chunk_index"])
+    ])
+
+
+async def test_replace_reuses_unchanged_chunks_and_drops_stale_ones(monkeypatch):
+    doc = await ingest("report.txt", document_text(10))
+    embedded = []
+    generate_embeddings = regolo_service.generate_embeddings
+    
+    async def counting_embeddings(texts):
+        embedded.extend(texts)
+        return await generate_embeddings(texts)
+    
+    monkeypatch.setattr(regolo_service, "generate_embeddings", counting_embeddings)
+    new_text = document_text(10) + "\n\n" + document_text(2, tag="appendix")
+    replaced = await replace(doc["id"], "report-v2.txt", new_text)
+    
+    assert replaced["status"] == STATUS_COMPLETED
+    assert replaced["filename"] == "report-v2.txt"
+    assert 0 < len(embedded) < replaced["chunk_count"]
+    assert await vector_store.count_document_chunks(doc["id"]) == replaced["chunk_count"]
+    assert stored_chunk_rows(doc["id"]) == replaced["chunk_count"]
+
+
+async def test_failed_replace_keeps_the_indexed_version(monkeypatch):
+    doc = await ingest("report.txt", document_text(10))
+    hashes = await indexed_hashes(doc["id"])
+    upsert_points = vector_store.upsert_points
+    calls = 0
+    
+    async def flaky_upsert(points, wait=True):
+        nonlocal calls
+        calls += 1
+        if calls > 1:
+            return False
+        return await upsert_points(points, wait)
+    
+    monkeypatch.setattr(vector_store, "upsert_points", flaky_upsert)
+    replaced = await replace(doc["id"], "report-v2.txt", document_text(10, tag="rewritten"))
+    
+    assert calls > 1
+    assert replaced["status"] == STATUS_COMPLETED
+    assert replaced["error"]
+    assert replaced["filename"] == "report.txt"
+    assert replaced["content_hash"] == doc["content_hash"]
+    assert replaced["chunk_count"] == doc["chunk_count"]
+    assert await indexed_hashes(doc["id"]) == hashes
+    assert stored_chunk_rows(doc["id"]) == doc["chunk_count"]
+    
+    # The replacement is not mistaken for the current version when retried
+    monkeypatch.setattr(vector_store, "upsert_points", upsert_points)
+    retry = await replace(doc["id"], "report-v2.txt", document_text(10, tag="rewritten"))
+    
+    assert retry["status"] == STATUS_COMPLETED
+    assert retry["error"] is None
+    assert retry["filename"] == "report-v2.txt"
+    assert await vector_store.count_document_chunks(doc["id"]) == retry["chunk_count"]
+    assert stored_chunk_rows(doc["id"]) == retry["chunk_count"]
+
+
+def zip_upload(members: int) -> UploadFile:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for i in range(members):
+            archive.writestr(f"docs/note{i}.txt", f"note {i}")
+    buffer.seek(0)
+    return UploadFile(buffer, filename="notes.zip")
+
+
+def tar_upload(members: int) -> UploadFile:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as archive:
+        for i in range(members):
+            data = f"note {i}".encode("utf-8")
+            info = tarfile.TarInfo(f"docs/note{i}.txt")
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    buffer.seek(0)
+    return UploadFile(buffer, filename="notes.tar")
+
+
+@pytest.mark.parametrize("upload", [zip_upload, tar_upload])
+async def test_bulk_limit_is_enforced_before_archive_members_are_spooled(monkeypatch, upload):
+    monkeypatch.setattr(settings, "max_bulk_files", 3)
+    register = ingestion_service._register
+    registered = 0
+    
+    async def counting_register(filename, read):
+        nonlocal registered
+        registered += 1
+        return await register(filename, read)
+    
+    monkeypatch.setattr(ingestion_service, "_register", counting_register)
+    loose = UploadFile(io.BytesIO(b"loose note"), filename="loose.txt")
+    
+    with pytest.raises(ValueError, match="Too many files"):
+        await ingestion_service.submit_bulk([loose, upload(10)])
+    
+    # The loose file and at most the members within the limit were spooled, then discarded
+    assert registered <= settings.max_bulk_files
+    assert document_store.get_all_documents() == []
+    assert list(ingestion_service.upload_dir.iterdir()) == []
+    assert ingestion_service.queue.empty()
+
+
+async def test_bulk_within_limit_queues_every_archive_member(monkeypatch):
+    monkeypatch.setattr(settings, "max_bulk_files", 3)
+    
+    results = await ingestion_service.submit_bulk([zip_upload(3)])
+    
+    assert [result["filename"] for result in results] == ["note0.txt", "note1.txt", "note2.txt"]
+    assert all(result["doc_id"] and not result["duplicate"] for result in results)
+    assert ingestion_service.queue.qsize() == 1
+
+
+async def test_failed_switch_restores_reused_chunks(monkeypatch):
+    doc = await ingest("report.txt", document_text(10))
+    positions = await indexed_positions(doc["id"])
+    rows = chunk_store.get_many([chunk["id"] async for chunk in vector_store.iter_document_chunks(doc["id"])])
+    delete_points = vector_store.delete_points
+    calls = 0
+    
+    async def flaky_delete(point_ids):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            return False
+        return await delete_points(point_ids)
+    
+    # The new chunks in front shift the position of every unchanged one
+    monkeypatch.setattr(vector_store, "delete_points", flaky_delete)
+    replaced = await replace(doc["id"], "report-v2.txt", document_text(2, tag="preface") + "\n\n" + document_text(10))
+    
+    assert calls > 1
+    assert replaced["status"] == STATUS_COMPLETED
+    assert replaced["error"]
+    assert replaced["filename"] == "report.txt"
+    assert await indexed_positions(doc["id"]) == positions
+    assert chunk_store.get_many(list(rows)) == rows
+    assert stored_chunk_rows(doc["id"]) == doc["chunk_count"]
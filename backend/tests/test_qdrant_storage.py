@@ -0,0 +1,99 @@
+import pytest
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.models import (
+    Disabled, HnswConfigDiff, ScalarQuantization, ScalarQuantizationConfig, ScalarType, VectorParamsDiff
+)
+
+from app.core.config import settings
+from app.core.qdrant_service import QdrantService
+
+
+@pytest.fixture
+async def qdrant(monkeypatch):
+    # Qdrant's in-process mode, no server needed
+    service = QdrantService()
+    await service.client.close()
+    service.client = AsyncQdrantClient(location=":memory:")
+    monkeypatch.setattr(service, "collection_name", "storage_test")
+    await service._create_collection(service.collection_name, settings.embedding_dimension)
+    
+    yield service
+    
+    await service.client.close()
+
+
+@pytest.fixture
+def updates(qdrant, monkeypatch):
+    calls = []
+    
+    async def update_collection(collection_name, **update):
+        calls.append(update)
+    
+    monkeypatch.setattr(qdrant.client, "update_collection", update_collection)
+    return calls
+
+
+async def keep_stored_config(qdrant, monkeypatch, **hnsw):
+    """Report the configured HNSW and quantization settings as stored.
+    
+    The in-process mode accepts them at creation but does not keep them.
+    """
+    info = await qdrant.client.get_collection(qdrant.collection_name)
+    for key, value in hnsw.items():
+        setattr(info.config.hnsw_config, key, value)
+    info.config.quantization_config = qdrant._quantization_config()
+    
+    async def get_collection(collection_name):
+        return info
+    
+    monkeypatch.setattr(qdrant.client, "get_collection", get_collection)
+
+
+async def test_unchanged_config_is_not_updated(qdrant, updates):
+    await qdrant._migrate_storage_config()
+    
+    assert updates == []
+
+
+async def test_changed_config_updates_only_what_differs(qdrant, updates, monkeypatch):
+    monkeypatch.setattr(settings, "qdrant_on_disk_vectors", True)
+    monkeypatch.setattr(settings, "qdrant_hnsw_m", 32)
+    monkeypatch.setattr(settings, "qdrant_quantization", "scalar")
+    
+    await qdrant._migrate_storage_config()
+    
+    assert updates == [{
+        "vectors_config": {"": VectorParamsDiff(on_disk=True)},
+        "hnsw_config": HnswConfigDiff(m=32, ef_construct=settings.qdrant_hnsw_ef_construct),
+        "quantization_config": ScalarQuantization(
+            scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True)
+        )
+    }]
+
+
+async def test_collection_already_tuned_is_not_updated(qdrant, updates, monkeypatch):
+    monkeypatch.setattr(settings, "qdrant_hnsw_m", 32)
+    monkeypatch.setattr(settings, "qdrant_quantization", "scalar")
+    await keep_stored_config(qdrant, monkeypatch, m=32)
+    
+    await qdrant._migrate_storage_config()
+    
+    assert updates == []
+
+
+async def test_quantization_is_disabled_when_turned_off(qdrant, updates, monkeypatch):
+    monkeypatch.setattr(settings, "qdrant_quantization", "binary")
+    await keep_stored_config(qdrant, monkeypatch)
+    monkeypatch.setattr(settings, "qdrant_quantization", "none")
+    
+    await qdrant._migrate_storage_config()
+    
+    assert updates == [{"quantization_config": Disabled.DISABLED}]
+
+
+async def test_dimension_mismatch_asks_for_reprojection(qdrant, updates, monkeypatch):
+    monkeypatch.setattr(settings, "embedding_dimension", settings.embedding_dimension * 2)
+    
+    with pytest.raises(ValueError, match="reproject_collection"):
+        await qdrant._migrate_storage_config()
+    assert updates == []
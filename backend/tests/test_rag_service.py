@@ -0,0 +1,59 @@
+import pytest
+
+import app.agents
+import app.services.rag_service
+from app.core.config import settings
+from app.core.document_store import document_store
+from app.services.answer_cache import AnswerCache
+from app.services.rag_service import RAGService
+from benchmarks.openai_stub import BackgroundServer, create_app
+
+# langchain-openai shares one HTTP client per base URL, bound to the loop that first used it
+pytestmark = pytest.mark.asyncio(loop_scope="module")
+
+
+@pytest.fixture(scope="module")
+def stub():
+    app = create_app(dimension=settings.embedding_dimension, chat_latency=0)
+    with BackgroundServer(app) as server:
+        server.stats = app.state.stats
+        yield server
+
+
+@pytest.fixture
+def rag(monkeypatch, stub):
+    monkeypatch.setattr(settings, "regolo_base_url", f"{stub.url}/v1")
+    monkeypatch.setattr(document_store, "get_document_count", lambda: 1)
+    monkeypatch.setattr(app.services.rag_service, "answer_cache", AnswerCache())
+    return RAGService()
+
+
+async def test_answers_after_a_failed_search_are_not_cached(rag, stub, monkeypatch):
+    async def failing_retrieve(query, **kwargs):
+        raise ConnectionError("vector store unreachable")
+    
+    monkeypatch.setattr(app.agents, "retrieve", failing_retrieve)
+    requests = stub.stats["chat_requests"]
+    
+    first = await rag.process_query("Che cosa dice il contratto?")
+    second = await rag.process_query("Che cosa dice il contratto?")
+    
+    assert first["tool_error"] and second["tool_error"]
+    # Both questions ran the agent: tool call, then answer
+    assert stub.stats["chat_requests"] - requests == 4
+
+
+async def test_answers_after_a_successful_search_are_cached(rag, stub, monkeypatch):
+    async def retrieve(query, **kwargs):
+        return [{"text": "Il contratto dura due anni.", "score": 0.9, "metadata": {"filename": "contratto.pdf"}}]
+    
+    monkeypatch.setattr(app.agents, "retrieve", retrieve)
+    requests = stub.stats["chat_requests"]
+    
+    first = await rag.process_query("Quanto dura il contratto?")
+    second = await rag.process_query("Quanto dura il contratto?")
+    
+    assert not first["tool_error"]
+    assert first["sources"] == [{"filename": "contratto.pdf", "page": "N/A", "score": 0.9}]
+    assert second == first
+    assert stub.stats["chat_requests"] - requests == 2
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.models import PointStruct
+
+from app.core.qdrant_service import QdrantService
+
+
+@pytest.fixture
+async def qdrant(monkeypatch):
+    # Qdrant's in-process mode, no server needed
+    service = QdrantService()
+    await service.client.close()
+    service.client = AsyncQdrantClient(location=":memory:")
+    monkeypatch.setattr(service, "collection_name", "reproject_test")
+    
+    await service._create_collection(service.collection_name, 16)
+    rng = np.random.default_rng(0)
+    await service.client.upsert(
+        collection_name=service.collection_name,
+        points=[
+            PointStruct(id=i, vector=rng.standard_normal(16).tolist(), payload={"doc_id": "doc", "chunk_index": i})
+            for i in range(50)
+        ],
+        wait=True
+    )
+    
+    yield service
+    
+    await service.client.close()
+
+
+async def vector_size(service: QdrantService) -> int:
+    info = await service.client.get_collection(service.collection_name)
+    return info.config.params.vectors.size
+
+
+async def test_reproject_shrinks_vectors_and_keeps_points(qdrant):
+    await qdrant.reproject_collection(8, batch_size=16)
+    
+    assert await vector_size(qdrant) == 8
+    assert (await qdrant.client.count(qdrant.collection_name)).count == 50
+    assert not await qdrant.client.collection_exists("reproject_test_reproject_8")
+
+
+async def test_reproject_resumes_an_interrupted_copy_back(qdrant, monkeypatch):
+    copy_points = qdrant._copy_points
+    copies = 0
+    
+    async def interrupted_copy(source, target, batch_size, transform=None):
+        nonlocal copies
+        copies += 1
+        if copies == 2:
+            # Stop partway through copying back into the recreated collection
+            await qdrant.client.upsert(
+                collection_name=target,
+                points=(await qdrant.client.scroll(source, limit=10, with_vectors=True))[0],
+                wait=True
+            )
+            raise RuntimeError("connection lost")
+        return await copy_points(source, target, batch_size, transform)
+    
+    monkeypatch.setattr(qdrant, "_copy_points", interrupted_copy)
+    with pytest.raises(RuntimeError):
+        await qdrant.reproject_collection(8, batch_size=16)
+    assert (await qdrant.client.count(qdrant.collection_name)).count == 10
+    
+    await qdrant.reproject_collection(8, batch_size=16)
+    
+    assert await vector_size(qdrant) == 8
+    assert (await qdrant.client.count(qdrant.collection_name)).count == 50
+    assert not await qdrant.client.collection_exists("reproject_test_reproject_8")
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+from qdrant_client.models import PointStruct
+
+from app.core.config import settings
+from app.core.vector_store import vector_store
+from app.services import retrieval
+from app.services.embedding_service import embedding_service
+from app.services.retrieval import mmr_select, retrieve
+
+
+@pytest.fixture(autouse=True)
+async def store(monkeypatch):
+    rng = np.random.default_rng(0)
+    query_vector = rng.standard_normal(settings.embedding_dimension).tolist()
+    
+    async def generate_query_embedding(query):
+        return query_vector
+    
+    monkeypatch.setattr(embedding_service, "generate_query_embedding", generate_query_embedding)
+    if retrieval.retrieval_cache is None:
+        monkeypatch.setattr(retrieval, "retrieval_cache", retrieval.RetrievalCache(vector_store))
+    
+    await vector_store.start()
+    await vector_store.delete_all()
+    await vector_store.upsert_points([
+        PointStruct(id=f"00000000-0000-0000-0000-00000000000{i}", vector=query_vector, payload={"doc_id": "doc", "chunk_index": i})
+        for i in range(3)
+    ])
+    
+    yield
+    
+    await vector_store.close()
+
+
+async def test_failed_searches_raise_and_are_not_cached(monkeypatch):
+    search = vector_store.search
+    
+    async def failing_search(*args, raise_errors=False, **kwargs):
+        if raise_errors:
+            raise ConnectionError("vector store unreachable")
+        return []
+    
+    monkeypatch.setattr(vector_store, "search", failing_search)
+    with pytest.raises(ConnectionError):
+        await retrieve("contratto", top_k=3)
+    
+    monkeypatch.setattr(vector_store, "search", search)
+    hits = await retrieve("contratto", top_k=3)
+    
+    assert len(hits) == 3
+    assert retrieval.retrieval_cache.get(("contratto", 3, 0.0, None, None)) is not None
+
+
+def candidate(point_id: str, doc_id: str, vector):
+    return {"id": point_id, "doc_id": doc_id, "vector": vector}
+
+
+def test_mmr_with_lambda_one_keeps_relevance_order():
+    rng = np.random.default_rng(1)
+    query = rng.standard_normal(8)
+    hits = [candidate(str(i), "doc", rng.standard_normal(8)) for i in range(10)]
+    relevance = [float(np.dot(hit["vector"], query) / np.linalg.norm(hit["vector"])) for hit in hits]
+    
+    selected = mmr_select(query.tolist(), hits, 4, lambda_mult=1.0)
+    
+    assert [hit["id"] for hit in selected] == [hits[i]["id"] for i in np.argsort(relevance)[::-1][:4]]
+
+
+def test_mmr_skips_near_duplicates():
+    query = [1.0, 0.0, 0.0]
+    hits = [
+        candidate("best", "a", [1.0, 0.1, 0.0]),
+        candidate("near duplicate", "b", [1.0, 0.11, 0.0]),
+        candidate("different", "c", [0.6, -0.8, 0.0])
+    ]
+    
+    assert [hit["id"] for hit in mmr_select(query, hits, 2, lambda_mult=0.5)] == ["best", "different"]
+    assert [hit["id"] for hit in mmr_select(query, hits, 2, lambda_mult=1.0)] == ["best", "near duplicate"]
+
+
+def test_mmr_caps_chunks_per_document():
+    rng = np.random.default_rng(2)
+    query = np.ones(8)
+    # The first document has the most relevant chunks
+    hits = [candidate(f"x{i}", "x", query + rng.normal(0, 0.1, 8)) for i in range(5)]
+    hits += [candidate(f"y{i}", "y", query + rng.normal(0, 0.5, 8)) for i in range(3)]
+    
+    selected = mmr_select(query.tolist(), hits, 4, lambda_mult=1.0, max_per_doc=2)
+    
+    assert [hit["doc_id"] for hit in selected].count("x") == 2
+    assert [hit["doc_id"] for hit in selected].count("y") == 2
+    assert len(mmr_select(query.tolist(), hits, 6, lambda_mult=1.0, max_per_doc=2)) == 4
@@ -0,0 +1,284 @@
+import uuid
+
+import numpy as np
+import pytest
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.models import PointStruct
+
+from app.core.chunk_store import chunk_store
+from app.core.config import settings
+from app.core.vector_store import VectorStore
+from app.core import local_vector_store
+from app.core.local_vector_store import LocalVectorStore
+from app.core.qdrant_service import QdrantService
+
+
+async def local_store(tmp_path) -> VectorStore:
+    return LocalVectorStore(str(tmp_path / "vectors"), settings.embedding_dimension)
+
+
+async def qdrant_store(tmp_path) -> VectorStore:
+    # Qdrant's in-process mode, no server needed
+    store = QdrantService()
+    await store.client.close()
+    store.client = AsyncQdrantClient(location=":memory:")
+    store.collection_name = f"test_{uuid.uuid4().hex}"
+    return store
+
+
+@pytest.fixture(params=[local_store, qdrant_store], ids=["local", "qdrant"])
+async def store(request, tmp_path):
+    store = await request.param(tmp_path)
+    await store.start()
+    
+    yield store
+    
+    await store.close()
+
+
+def random_vector(rng: np.random.Generator):
+    return rng.standard_normal(settings.embedding_dimension).tolist()
+
+
+def make_points(doc_id: str, chunk_indexes, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    return [
+        PointStruct(
+            id=str(uuid.uuid4()),
+            vector=random_vector(rng),
+            payload={"doc_id": doc_id, "chunk_index": chunk_index, "chunk_hash": f"{doc_id}-{i}"}
+        )
+        for i, chunk_index in enumerate(chunk_indexes)
+    ]
+
+
+async def collect_pages(store: VectorStore, doc_id: str, page_size: int, ordered: bool):
+    pages = []
+    offset = None
+    # Bounded, so that an offset that does not advance fails instead of hanging
+    for _ in range(100):
+        chunks, offset = await store.get_document_chunks_page(doc_id, page_size, offset, ordered=ordered)
+        pages.append(chunks)
+        if offset is None:
+            return pages
+    raise AssertionError("Paging did not reach the last page")
+
+
+@pytest.mark.parametrize("ordered", [False, True])
+@pytest.mark.parametrize("chunk_indexes", [
+    # Chunk indexes repeat while an old and a new version coexist during a replacement
+    [0, 1, 1, 2, 3, 3, 4, 5, 5, 6],
+    # More points share an index than fit on a page
+    [0, 1, 1, 1, 2],
+    [0, 1, 1, 1, 1, 1, 2, 2, 2, 3],
+])
+async def test_paging_visits_every_chunk_once(store, ordered, chunk_indexes):
+    points = make_points("doc", chunk_indexes)
+    await store.upsert_points(points)
+    
+    pages = await collect_pages(store, "doc", 2, ordered)
+    chunks = [chunk for page in pages for chunk in page]
+    
+    assert all(len(page) <= 2 for page in pages)
+    assert len(chunks) == len(points)
+    assert {chunk["id"] for chunk in chunks} == {point.id for point in points}
+    if ordered:
+        indexes = [chunk["chunk_index"] for chunk in chunks]
+        assert indexes == sorted(indexes)
+
+
+def unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+async def test_upsert_and_count(store):
+    await store.upsert_points(make_points("a", range(5)))
+    await store.upsert_points(make_points("b", range(3), seed=1))
+    
+    assert await store.count_document_chunks("a") == 5
+    assert await store.count_document_chunks("b") == 3
+    assert await store.count_document_chunks("missing") == 0
+
+
+async def test_upsert_overwrites_points_with_the_same_id(store):
+    points = make_points("a", range(3))
+    await store.upsert_points(points)
+    
+    moved = PointStruct(id=points[0].id, vector=points[1].vector, payload={**points[0].payload, "chunk_index": 9})
+    await store.upsert_points([moved])
+    
+    assert await store.count_document_chunks("a") == 3
+    hits = await store.search(points[1].vector, limit=2, hydrate=False)
+    assert {hit["id"] for hit in hits} == {points[0].id, points[1].id}
+    assert next(hit for hit in hits if hit["id"] == points[0].id)["chunk_index"] == 9
+
+
+async def test_search_ranks_by_cosine_similarity(store):
+    points = make_points("a", range(20))
+    await store.upsert_points(points)
+    target = points[7]
+    
+    hits = await store.search(target.vector, limit=5, hydrate=False)
+    
+    assert len(hits) == 5
+    assert hits[0]["id"] == target.id
+    assert hits[0]["score"] == pytest.approx(1.0, abs=1e-4)
+    assert [hit["score"] for hit in hits] == sorted((hit["score"] for hit in hits), reverse=True)
+    assert hits[0]["doc_id"] == "a"
+    assert hits[0]["chunk_index"] == 7
+    
+    expected = sorted(
+        (float(unit(point.vector) @ unit(target.vector)) for point in points),
+        reverse=True
+    )[:5]
+    assert [hit["score"] for hit in hits] == pytest.approx(expected, abs=1e-4)
+
+
+async def test_search_filters_by_score_and_document(store):
+    a = make_points("a", range(10))
+    b = make_points("b", range(10), seed=1)
+    await store.upsert_points(a + b)
+    
+    hits = await store.search(a[0].vector, limit=20, score_threshold=0.99, hydrate=False)
+    assert [hit["id"] for hit in hits] == [a[0].id]
+    
+    hits = await store.search(a[0].vector, limit=20, score_threshold=-1.0, doc_id_filter="b", hydrate=False)
+    assert len(hits) == 10
+    assert {hit["doc_id"] for hit in hits} == {"b"}
+
+
+async def test_search_hydrates_from_the_chunk_store(store):
+    points = make_points("a", range(3))
+    await store.upsert_points(points)
+    chunk_store.put_many([
+        (point.id, "a", f"text {i}", {"doc_id": "a", "chunk_index": i})
+        for i, point in enumerate(points)
+    ])
+    
+    hits = await store.search(points[2].vector, limit=1)
+    
+    assert hits[0]["text"] == "text 2"
+    assert hits[0]["metadata"]["chunk_index"] == 2
+
+
+async def test_search_returns_vectors_on_request(store):
+    points = make_points("a", range(3))
+    await store.upsert_points(points)
+    
+    hits = await store.search(points[1].vector, limit=1, with_vectors=True, hydrate=False)
+    
+    assert unit(hits[0]["vector"]) == pytest.approx(unit(points[1].vector), abs=1e-3)
+
+
+async def test_search_batch_matches_single_searches(store):
+    a = make_points("a", range(10))
+    b = make_points("b", range(10), seed=1)
+    await store.upsert_points(a + b)
+    searches = [
+        {"query_vector": a[3].vector, "limit": 3},
+        {"query_vector": b[5].vector, "limit": 4, "doc_id_filter": "a"},
+        {"query_vector": a[0].vector, "limit": 10, "score_threshold": 0.99}
+    ]
+    
+    results = await store.search_batch(searches)
+    
+    assert len(results) == len(searches)
+    for search, hits in zip(searches, results):
+        single = await store.search(
+            search["query_vector"],
+            limit=search["limit"],
+            score_threshold=search.get("score_threshold", 0.0),
+            doc_id_filter=search.get("doc_id_filter")
+        )
+        assert [hit["id"] for hit in hits] == [hit["id"] for hit in single]
+    assert await store.search_batch([]) == []
+
+
+async def test_deletes(store):
+    a = make_points("a", range(4))
+    await store.upsert_points(a + make_points("b", range(4), seed=1) + make_points("c", range(4), seed=2))
+    
+    assert await store.delete_points([a[0].id, a[1].id])
+    assert await store.count_document_chunks("a") == 2
+    
+    assert await store.delete_document("b")
+    assert await store.count_document_chunks("b") == 0
+    hits = await store.search(a[2].vector, limit=20, score_threshold=-1.0, hydrate=False)
+    assert {hit["doc_id"] for hit in hits} == {"a", "c"}
+    
+    assert await store.delete_documents(["a", "c"])
+    assert await store.search(a[2].vector, limit=20, score_threshold=-1.0, hydrate=False) == []
+    
+    await store.upsert_points(make_points("d", range(2), seed=3))
+    assert await store.delete_all()
+    assert await store.count_document_chunks("d") == 0
+
+
+async def test_set_payloads_updates_only_the_given_keys(store):
+    points = make_points("a", range(3))
+    await store.upsert_points(points)
+    
+    assert await store.set_payloads([(points[0].id, {"chunk_index": 5}), (points[1].id, {"chunk_hash": "new"})])
+    
+    chunks = {chunk["id"]: chunk async for chunk in store.iter_document_chunks("a")}
+    assert chunks[points[0].id]["chunk_index"] == 5
+    assert chunks[points[0].id]["chunk_hash"] == "a-0"
+    assert chunks[points[1].id]["chunk_hash"] == "new"
+
+
+async def test_paging_selects_payload_fields(store):
+    await store.upsert_points(make_points("a", range(5)))
+    
+    chunks = [chunk async for chunk in store.iter_document_chunks("a", payload_fields=["chunk_hash"], page_size=2)]
+    
+    assert len(chunks) == 5
+    assert all(set(chunk) == {"id", "chunk_hash"} for chunk in chunks)
+
+
+async def test_writes_bump_generation(store):
+    points = make_points("a", range(2))
+    writes = [
+        lambda: store.upsert_points(points),
+        lambda: store.set_payloads([(points[0].id, {"chunk_index": 3})]),
+        lambda: store.delete_points([points[1].id]),
+        lambda: store.delete_document("a")
+    ]
+    
+    for write in writes:
+        generation = store.generation
+        await write()
+        assert store.generation == generation + 1
+
+
+async def test_search_errors_are_raised_on_request(store):
+    await store.upsert_points(make_points("a", range(3)))
+    wrong_size = [1.0] * (settings.embedding_dimension + 1)
+    
+    assert await store.search(wrong_size, hydrate=False) == []
+    with pytest.raises(Exception):
+        await store.search(wrong_size, hydrate=False, raise_errors=True)
+
+
+async def test_local_scan_blocks_follow_the_byte_budget(tmp_path, monkeypatch):
+    store = await local_store(tmp_path)
+    await store.start()
+    points = make_points("a", range(50))
+    await store.upsert_points(points)
+    queries = [point.vector for point in points[:3]]
+    expected = await store.search_batch([{"query_vector": query, "limit": 5} for query in queries])
+    
+    # Wider vectors get fewer rows per block
+    assert store._scan_block_rows(4096, 1) < store._scan_block_rows(256, 1)
+    
+    # A budget of a few rows scores the matrix in many blocks, with the same results
+    row_bytes = settings.embedding_dimension * 4 + len(queries) * 16
+    monkeypatch.setattr(local_vector_store, "SCAN_BLOCK_BYTES", 3 * row_bytes)
+    assert store._scan_block_rows(settings.embedding_dimension, len(queries)) == 3
+    
+    blocked = await store.search_batch([{"query_vector": query, "limit": 5} for query in queries])
+    
+    for hits, expected_hits in zip(blocked, expected):
+        assert [hit["id"] for hit in hits] == [hit["id"] for hit in expected_hits]
+        assert [hit["score"] for hit in hits] == pytest.approx([hit["score"] for hit in expected_hits])
+    await store.close()
@@ -35,6 +35,10 @@ async function uploadDocument(file) {
     return response.json();
 }
 
+async function getJobStatus(jobId) {
+    return apiRequest(`/api/documents/jobs/${jobId}`);
+}
+
 async function listDocuments() {
     return apiRequest('/api/documents');
 }
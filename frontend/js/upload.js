@@ -52,7 +52,8 @@ async function handleFiles(files) {
         uploadStatus.textContent = `Uploading ${file.name}...`;
 
         try {
-            await uploadDocument(file);
+            const job = await uploadDocument(file);
+            await waitForJob(job, file.name);
             showToast(`Document uploaded: ${file.name}`, 'success');
             loadDocuments();
         } catch (error) {
@@ -66,6 +67,21 @@ async function handleFiles(files) {
     fileInput.value = '';
 }
 
+async function waitForJob(job, filename) {
+    while (job.status !== 'completed') {
+        if (job.status === 'failed') {
+            throw new Error(job.error || 'Processing failed');
+        }
+
+        const progress = job.chunks_done > 0 ? ` (${job.chunks_done} chunks indexed)` : '';
+        uploadStatus.textContent = `Processing ${filename}: ${job.status}${progress}...`;
+
+        await new Promise(resolve => setTimeout(resolve, 1000));
+        job = await getJobStatus(job.job_id);
+    }
+    return job;
+}
+
 function showToast(message, type = 'success') {
     const toast = document.getElementById('toast');
     const toastMessage = document.getElementById('toast-message');